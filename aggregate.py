@@ -0,0 +1,320 @@
+"""Aggregation of the rows of a table, into new tables.
+
+The functions in this module build tables with the aggregated values of the
+columns of another table: by group, with subtotal rows, or as a pivot table.
+The new tables can be drawn with a TableStyle and a TableLayout like any
+other table:
+
+  totals = aggregate.group_by(sales, ['Region'], [('Units', 'sum'),
+                                                  ('Price', 'mean')])
+
+An aggregation is given by a tuple (column_name, function), or (column_name,
+function, output_name), where the function is one of FUNCTIONS. The None
+values are ignored, and the aggregations of a group without values are None,
+except for the count, which is 0. The NaN values are ignored by min and max,
+unless all the values of the group are NaN.
+
+The rows of the table are read once and in order, so a StreamingTable can be
+aggregated too. The groups are kept in the order in which they first appear.
+If NumPy is installed, the numeric columns of a ColumnarTable are aggregated
+with it.
+"""
+
+__author__ = 'jt@javiertordable.com'
+__copyright__ = "Copyright (C) 2014 Javier Tordable"
+
+
+import array
+
+from table import ColumnarTable, Table
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+
+# The aggregation functions.
+FUNCTIONS = ['sum', 'count', 'min', 'max', 'mean']
+
+# The number of rows read from the table at once.
+_BLOCK_ROWS = 1000
+
+
+def group_by(table, key_columns, aggregations, name=None):
+  """Builds a table with a row for each distinct value of the key columns.
+
+  The new table has the key columns, followed by a column for each
+  aggregation, named like 'Sum of Units' unless an output name is given.
+  """
+  key_indexes = [table.column_index(column_name)
+                 for column_name in key_columns]
+  specs = _parse_aggregations(table, aggregations)
+  (keys, results) = _aggregate(table, key_indexes, specs)
+
+  output = Table(name or table.name, list(key_columns) +
+                 [output_name for (_, _, output_name) in specs])
+  for (group_index, key) in enumerate(keys):
+    output.add_row(list(key) + [result[group_index] for result in results])
+  return output
+
+
+def subtotals(table, key_column, aggregations, label='%s Total',
+              grand_total_label='Total', name=None):
+  """Builds a table with the rows of each group followed by a subtotal row.
+
+  The new table has the same columns as the table, and the rows of each value
+  of the key column together, followed by a row with the aggregations of the
+  group in the aggregated columns, the label in the key column, and None in
+  the other columns. The label is formatted with the value of the key. If
+  grand_total_label isn't None, there is a last row with the aggregations of
+  all the rows.
+
+  Each column can only be aggregated once. Returns a tuple (table,
+  subtotal_rows), where subtotal_rows are the indexes of the subtotal and
+  grand total rows, which can be given to a style.MarkedRowsStyle.
+  """
+  key_index = table.column_index(key_column)
+  specs = _parse_aggregations(table, aggregations)
+  column_indexes = [column_index for (column_index, _, _) in specs]
+  if key_index in column_indexes:
+    raise ValueError('The key column %s can not be aggregated' % key_column)
+  if len(set(column_indexes)) != len(column_indexes):
+    raise ValueError('Each column can only be aggregated once')
+
+  groups = {}
+  for row in _read_rows(table):
+    groups.setdefault(row[key_index], []).append(row)
+
+  output = Table(name or table.name, list(table.column_names))
+  subtotal_rows = []
+  all_rows = []
+  for (key, rows) in groups.items():
+    for row in rows:
+      output.add_row(row)
+    subtotal_rows.append(output.num_rows)
+    output.add_row(_total_row(table, rows, key_index, label % (key,), specs))
+    all_rows.extend(rows)
+  if grand_total_label is not None:
+    subtotal_rows.append(output.num_rows)
+    output.add_row(_total_row(table, all_rows, key_index, grand_total_label,
+                              specs))
+  return (output, subtotal_rows)
+
+
+def pivot(table, row_column, column_column, value_column, function='sum',
+          name=None):
+  """Builds a table with the aggregations of a column, by two other columns.
+
+  The new table has a row for each value of the row column, and a column for
+  each value of the column column, after a first column with the values of
+  the row column. Each cell has the aggregation of the values of the value
+  column in the rows of the table with those values. The cells without rows
+  are None, or 0 for a count.
+  """
+  key_indexes = [table.column_index(row_column),
+                 table.column_index(column_column)]
+  specs = _parse_aggregations(table, [(value_column, function)])
+  (keys, results) = _aggregate(table, key_indexes, specs)
+
+  row_keys = []
+  column_keys = []
+  seen_column_keys = set()
+  cells = {}
+  for (group_index, (row_key, column_key)) in enumerate(keys):
+    if row_key not in cells:
+      row_keys.append(row_key)
+      cells[row_key] = {}
+    if column_key not in seen_column_keys:
+      column_keys.append(column_key)
+      seen_column_keys.add(column_key)
+    cells[row_key][column_key] = results[0][group_index]
+
+  empty_value = 0 if function == 'count' else None
+  output = Table(name or table.name, [row_column] + column_keys)
+  for row_key in row_keys:
+    row_cells = cells[row_key]
+    output.add_row([row_key] + [row_cells.get(column_key, empty_value)
+                                for column_key in column_keys])
+  return output
+
+
+def _parse_aggregations(table, aggregations):
+  """The aggregations as tuples (column_index, function, output_name)."""
+  specs = []
+  for aggregation in aggregations:
+    if len(aggregation) == 2:
+      (column_name, function) = aggregation
+      output_name = '%s of %s' % (function.capitalize(), column_name)
+    else:
+      (column_name, function, output_name) = aggregation
+    if function not in FUNCTIONS:
+      raise ValueError('Invalid aggregation function %s' % function)
+    specs.append((table.column_index(column_name), function, output_name))
+  return specs
+
+
+def _read_rows(table):
+  """Yields the rows of a table in order, reading them in blocks."""
+  num_rows = table.num_rows
+  for first_row in range(0, num_rows, _BLOCK_ROWS):
+    for row in table.get_block(0, first_row, table.num_columns,
+                               min(_BLOCK_ROWS, num_rows - first_row)):
+      yield row
+
+
+def _total_row(table, rows, key_index, label, specs):
+  """A row with the aggregations of some rows, and a label."""
+  (_, results) = _aggregate_rows(rows, [], specs)
+  total_row = [None] * table.num_columns
+  total_row[key_index] = label
+  for ((column_index, function, _), result) in zip(specs, results):
+    if result:
+      total_row[column_index] = result[0]
+    else:
+      total_row[column_index] = _result([0, 0, None, None], function)
+  return total_row
+
+
+def _aggregate(table, key_indexes, specs):
+  """Aggregates the rows of a table by the values of the key columns.
+
+  Returns a tuple (keys, results), with a tuple with the values of the key
+  columns for each group, and a list for each aggregation with its value in
+  each group.
+  """
+  if numpy is not None and _can_vectorize(table, specs):
+    return _aggregate_columns(table, key_indexes, specs)
+  return _aggregate_rows(_read_rows(table), key_indexes, specs)
+
+
+def _aggregate_rows(rows, key_indexes, specs):
+  """Aggregates rows one by one, keeping the state of each group in a dict."""
+  groups = {}
+  keys = []
+  # For each group, a list [count, total, minimum, maximum] per aggregation.
+  states = []
+  for row in rows:
+    key = tuple([row[key_index] for key_index in key_indexes])
+    group_index = groups.get(key)
+    if group_index is None:
+      group_index = len(keys)
+      groups[key] = group_index
+      keys.append(key)
+      states.append([[0, 0, None, None] for _ in specs])
+    state = states[group_index]
+    for (spec_index, (column_index, function, _)) in enumerate(specs):
+      value = row[column_index]
+      if value is None:
+        continue
+      accumulator = state[spec_index]
+      accumulator[0] += 1
+      if function == 'sum' or function == 'mean':
+        accumulator[1] += value
+      elif function == 'min':
+        # A NaN is replaced by any other value, which is never less than it.
+        if accumulator[2] is None or value < accumulator[2] or \
+              accumulator[2] != accumulator[2]:
+          accumulator[2] = value
+      elif function == 'max':
+        if accumulator[3] is None or value > accumulator[3] or \
+              accumulator[3] != accumulator[3]:
+          accumulator[3] = value
+
+  results = []
+  for (spec_index, (_, function, _)) in enumerate(specs):
+    results.append([_result(state[spec_index], function) for state in states])
+  return (keys, results)
+
+
+def _result(accumulator, function):
+  (count, total, minimum, maximum) = accumulator
+  if function == 'count':
+    return count
+  if count == 0:
+    return None
+  if function == 'sum':
+    return total
+  if function == 'mean':
+    return total / count
+  if function == 'min':
+    return minimum
+  return maximum
+
+
+def _can_vectorize(table, specs):
+  """Whether all the aggregated columns are numeric arrays of a table."""
+  if not isinstance(table, ColumnarTable) or table.num_rows == 0:
+    return False
+  for (column_index, _, _) in specs:
+    column = table.get_column(column_index)
+    if not isinstance(column, array.array) or column.typecode == 'u':
+      return False
+  return True
+
+
+def _aggregate_columns(table, key_indexes, specs):
+  """Aggregates the numeric columns of a ColumnarTable with NumPy.
+
+  Each row gets the index of its group, and the columns are aggregated by
+  these indexes, without a loop in Python.
+  """
+  groups = {}
+  keys = []
+  group_indexes = array.array('q')
+  key_columns = [table.get_column(key_index) for key_index in key_indexes]
+  for key in zip(*key_columns):
+    group_index = groups.get(key)
+    if group_index is None:
+      group_index = len(keys)
+      groups[key] = group_index
+      keys.append(key)
+    group_indexes.append(group_index)
+
+  num_groups = len(keys)
+  group_indexes = numpy.frombuffer(group_indexes, dtype=numpy.int64)
+  counts = numpy.bincount(group_indexes, minlength=num_groups)
+  # The rows sorted by group, and the first row of each group, for min and max.
+  order = None
+  group_starts = None
+  results = []
+  for (column_index, function, _) in specs:
+    column = table.get_column(column_index)
+    values = numpy.frombuffer(column, dtype=column.typecode)
+    if function == 'count':
+      result = counts
+    elif function == 'sum' or function == 'mean':
+      if values.dtype.kind == 'f':
+        result = numpy.bincount(group_indexes, weights=values,
+                                minlength=num_groups)
+      else:
+        result = numpy.zeros(num_groups, dtype=_sum_dtype(values))
+        numpy.add.at(result, group_indexes, values.astype(result.dtype))
+      if function == 'mean':
+        # The division of Python numbers, to give the same means as the rows.
+        result = [total / count
+                  for (total, count) in zip(result.tolist(), counts.tolist())]
+        results.append(result)
+        continue
+    else:
+      if order is None:
+        order = numpy.argsort(group_indexes, kind='stable')
+        group_starts = numpy.searchsorted(group_indexes[order],
+                                          numpy.arange(num_groups))
+      # fmin and fmax ignore the NaN values, unless all of them are NaN.
+      reduce_function = numpy.fmin if function == 'min' else numpy.fmax
+      result = reduce_function.reduceat(values[order], group_starts)
+    results.append(result.tolist())
+  return (keys, results)
+
+
+def _sum_dtype(values):
+  """The type to add integers with NumPy, which doesn't overflow.
+
+  The integers are added as int64 if no sum can overflow it, and otherwise as
+  Python integers.
+  """
+  bound = max(int(values.max()), -int(values.min()))
+  if bound * len(values) < 2 ** 63:
+    return numpy.int64
+  return object
@@ -0,0 +1,201 @@
+"""Tests for aggregate.py"""
+
+__author__ = 'jt@javiertordable.com'
+__copyright__ = "Copyright (C) 2014 Javier Tordable"
+
+
+import aggregate
+from layout import TableLayout
+from style import MarkedRowsStyle
+from table import CATEGORY, ColumnarTable, StreamingTable, Table
+from xls import MockWorkbook
+
+import unittest
+
+
+SALES_ROWS = [['East', 2014, 10, 1.5],
+              ['West', 2014, 5, 2.0],
+              ['East', 2015, 20, 3.5],
+              ['East', 2014, 30, None],
+              ['North', 2015, None, 1.0]]
+
+
+def build_table():
+  table = Table('Sales', ['Region', 'Year', 'Units', 'Price'])
+  for row in SALES_ROWS:
+    table.add_row(row)
+  return table
+
+
+class GroupByTest(unittest.TestCase):
+  """Tests for group_by."""
+
+  def test_group_by(self):
+    totals = aggregate.group_by(build_table(), ['Region'], [
+        ('Units', 'sum'), ('Units', 'count'), ('Price', 'mean'),
+        ('Units', 'min'), ('Units', 'max', 'Most units')])
+    self.assertEqual('Sales', totals.name)
+    self.assertEqual(['Region', 'Sum of Units', 'Count of Units',
+                      'Mean of Price', 'Min of Units', 'Most units'],
+                     totals.column_names)
+    self.assertEqual([['East', 60, 3, 2.5, 10, 30],
+                      ['West', 5, 1, 2.0, 5, 5],
+                      ['North', None, 0, 1.0, None, None]],
+                     totals.get_block(0, 0, 6, 3))
+
+  def test_several_keys(self):
+    totals = aggregate.group_by(build_table(), ['Region', 'Year'],
+                                [('Units', 'sum')], name='Totals')
+    self.assertEqual('Totals', totals.name)
+    self.assertEqual([['East', 2014, 40], ['West', 2014, 5],
+                      ['East', 2015, 20], ['North', 2015, None]],
+                     totals.get_block(0, 0, 3, 4))
+
+  def test_streaming_table(self):
+    table = StreamingTable('Sales', ['Region', 'Year', 'Units', 'Price'],
+                           iter(SALES_ROWS), len(SALES_ROWS))
+    totals = aggregate.group_by(table, ['Year'], [('Units', 'sum')])
+    self.assertEqual([[2014, 45], [2015, 20]], totals.get_block(0, 0, 2, 2))
+
+  def test_columnar_table(self):
+    table = ColumnarTable('Sales', ['Region', 'Units', 'Price'],
+                          [CATEGORY, 'q', 'd'])
+    for (region, units, price) in [('East', 1, 1.5), ('West', 2, 2.5),
+                                   ('East', 3, 0.5)]:
+      table.add_row([region, units, price])
+    totals = aggregate.group_by(table, ['Region'], [
+        ('Units', 'sum'), ('Units', 'count'), ('Price', 'min'),
+        ('Price', 'max'), ('Units', 'mean')])
+    self.assertEqual([['East', 4, 2, 0.5, 1.5, 2.0],
+                      ['West', 2, 1, 2.5, 2.5, 2.0]],
+                     totals.get_block(0, 0, 6, 2))
+
+  def assertSameWithoutNumpy(self, table):
+    aggregations = [('Value', function) for function in aggregate.FUNCTIONS]
+    with_numpy = aggregate.group_by(table, ['Key'], aggregations)
+    numpy = aggregate.numpy
+    aggregate.numpy = None
+    try:
+      without_numpy = aggregate.group_by(table, ['Key'], aggregations)
+    finally:
+      aggregate.numpy = numpy
+    # The NaN values are only equal in their strings.
+    self.assertEqual(str(without_numpy), str(with_numpy))
+    return with_numpy
+
+  @unittest.skipIf(aggregate.numpy is None, 'NumPy is not installed')
+  def test_same_without_numpy(self):
+    table = ColumnarTable('Table', ['Key', 'Value'], ['q', 'd'])
+    for row_index in range(5000):
+      table.add_row([row_index % 7, row_index * 0.5])
+    self.assertSameWithoutNumpy(table)
+
+  @unittest.skipIf(aggregate.numpy is None, 'NumPy is not installed')
+  def test_large_integers(self):
+    table = ColumnarTable('Table', ['Key', 'Value'], ['q', 'q'])
+    for (key, value) in [(1, 2 ** 62), (1, 2 ** 62), (2, -2 ** 63),
+                         (2, -2 ** 63), (3, 2 ** 53 + 1), (3, 2 ** 53 + 2)]:
+      table.add_row([key, value])
+    totals = self.assertSameWithoutNumpy(table)
+    self.assertEqual([2 ** 63, -2 ** 64, 2 ** 54 + 3],
+                     [totals.get('Sum of Value', row) for row in range(3)])
+
+  @unittest.skipIf(aggregate.numpy is None, 'NumPy is not installed')
+  def test_unsigned_integers(self):
+    table = ColumnarTable('Table', ['Key', 'Value'], ['q', 'Q'])
+    for (key, value) in [(1, 2 ** 64 - 1), (1, 2 ** 64 - 1), (2, 2 ** 63),
+                         (2, 1)]:
+      table.add_row([key, value])
+    totals = self.assertSameWithoutNumpy(table)
+    self.assertEqual([2 ** 65 - 2, 2 ** 63 + 1],
+                     [totals.get('Sum of Value', row) for row in range(2)])
+
+  @unittest.skipIf(aggregate.numpy is None, 'NumPy is not installed')
+  def test_nan(self):
+    nan = float('nan')
+    table = ColumnarTable('Table', ['Key', 'Value'], ['q', 'd'])
+    for (key, value) in [(1, nan), (1, 2.0), (1, 1.0), (2, 2.0), (2, nan),
+                         (2, 3.0), (3, nan), (3, nan)]:
+      table.add_row([key, value])
+    totals = self.assertSameWithoutNumpy(table)
+    self.assertEqual([1.0, 2.0], [totals.get('Min of Value', row)
+                                  for row in range(2)])
+    self.assertEqual([2.0, 3.0], [totals.get('Max of Value', row)
+                                  for row in range(2)])
+    self.assertEqual('nan', str(totals.get('Min of Value', 2)))
+
+  def test_invalid_aggregations(self):
+    table = build_table()
+    self.assertRaises(ValueError, aggregate.group_by, table, ['Region'],
+                      [('Units', 'median')])
+    self.assertRaises(ValueError, aggregate.group_by, table, ['Region'],
+                      [('Invalid', 'sum')])
+
+
+class SubtotalsTest(unittest.TestCase):
+  """Tests for subtotals."""
+
+  def test_subtotals(self):
+    (table, subtotal_rows) = aggregate.subtotals(
+        build_table(), 'Region', [('Units', 'sum'), ('Price', 'max')])
+    self.assertEqual([3, 5, 7, 8], subtotal_rows)
+    self.assertEqual(9, table.num_rows)
+    self.assertEqual(['Region', 'Year', 'Units', 'Price'], table.column_names)
+    self.assertEqual([['East', 2014, 10, 1.5],
+                      ['East', 2015, 20, 3.5],
+                      ['East', 2014, 30, None],
+                      ['East Total', None, 60, 3.5],
+                      ['West', 2014, 5, 2.0],
+                      ['West Total', None, 5, 2.0],
+                      ['North', 2015, None, 1.0],
+                      ['North Total', None, None, 1.0],
+                      ['Total', None, 65, 3.5]],
+                     table.get_block(0, 0, 4, 9))
+
+  def test_no_grand_total(self):
+    (table, subtotal_rows) = aggregate.subtotals(
+        build_table(), 'Year', [('Units', 'count')], label='Year %d',
+        grand_total_label=None)
+    self.assertEqual([3, 6], subtotal_rows)
+    self.assertEqual([None, 'Year 2015', 1, None],
+                     table.get_block(0, 6, 4, 1)[0])
+
+  def test_invalid_aggregations(self):
+    table = build_table()
+    self.assertRaises(ValueError, aggregate.subtotals, table, 'Region',
+                      [('Region', 'count')])
+    self.assertRaises(ValueError, aggregate.subtotals, table, 'Region',
+                      [('Units', 'sum'), ('Units', 'max')])
+
+  def test_draw_marked_rows(self):
+    (table, subtotal_rows) = aggregate.subtotals(build_table(), 'Region',
+                                                 [('Units', 'sum')])
+    workbook = MockWorkbook()
+    sheet = workbook.add_worksheet('Sheet')
+    style = MarkedRowsStyle(workbook, table, subtotal_rows, {'bold': True})
+    TableLayout(style, table).draw(sheet, (0, 0))
+    self.assertEqual('East Total', sheet.cell_contents[(4, 0)])
+    self.assertEqual({'bold': True}, sheet.cell_formats[(4, 2)].properties)
+    self.assertEqual({}, sheet.cell_formats[(3, 2)].properties)
+
+
+class PivotTest(unittest.TestCase):
+  """Tests for pivot."""
+
+  def test_pivot(self):
+    table = aggregate.pivot(build_table(), 'Region', 'Year', 'Units')
+    self.assertEqual(['Region', 2014, 2015], table.column_names)
+    self.assertEqual([['East', 40, 20], ['West', 5, None],
+                      ['North', None, None]], table.get_block(0, 0, 3, 3))
+
+  def test_pivot_count(self):
+    table = aggregate.pivot(build_table(), 'Year', 'Region', 'Price', 'count',
+                            name='Prices')
+    self.assertEqual('Prices', table.name)
+    self.assertEqual(['Year', 'East', 'West', 'North'], table.column_names)
+    self.assertEqual([[2014, 1, 1, 0], [2015, 1, 0, 1]],
+                     table.get_block(0, 0, 4, 2))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,229 @@
+"""Generation of reports from asyncio code, without blocking the event loop.
+
+A ReportRunner draws the layouts and saves the workbooks in the threads of an
+executor, and limits the number of reports generated at the same time, and the
+memory they use. The sheets are given as in the parallel module, by a tuple
+(sheet_name, layout_factory) or (sheet_name, layout_factory, start_position),
+but the layout factories are called in the executor threads:
+
+  runner = async_render.ReportRunner(max_jobs=4, memory_budget=2 * 10 ** 9)
+
+  async def handle_request(request):
+    table = async_render.streaming_table('Sales', column_names, fetch_sales(),
+                                         num_rows)
+    filename = await runner.render_workbook(
+        path, [('Sales', lambda workbook: build_layout(workbook, table))],
+        memory=500 * 10 ** 6)
+
+The rows of the tables can come from async iterators. A streaming_table reads
+them from the event loop as the sheet is drawn, and collect_table reads them
+all before the report is generated.
+
+If the coroutine of a report is cancelled, the drawing stops at the next write
+to a sheet or the next batch of rows of a streaming_table, and the partial file
+is removed.
+"""
+
+__author__ = 'jt@javiertordable.com'
+__copyright__ = "Copyright (C) 2014 Javier Tordable"
+
+
+import asyncio
+import concurrent.futures
+import os
+import threading
+
+import parallel
+from table import StreamingTable, Table
+import xls
+
+
+# How often, in seconds, a thread waiting for rows checks if it was cancelled.
+_POLL_INTERVAL = 0.1
+
+# The state of the report generated by each executor thread.
+_job_state = threading.local()
+
+
+class ReportCancelled(Exception):
+  """Raised in an executor thread to stop the generation of a report."""
+  pass
+
+
+class ReportRunner(object):
+  """Generates workbooks in an executor, for coroutines in an event loop.
+
+  At most max_jobs reports are generated at the same time. If a memory budget
+  is given, in bytes, the reports only start when the sum of the memory they
+  are expected to use is within the budget. A report which needs more than the
+  whole budget is generated when no other report is.
+  """
+
+  def __init__(self, max_jobs=2, memory_budget=None, executor=None):
+    if max_jobs < 1:
+      raise ValueError('Please give a positive number of jobs.')
+    self.max_jobs = max_jobs
+    self.memory_budget = memory_budget
+    self._executor = executor
+    self._num_jobs = 0
+    self._memory_used = 0
+    self._condition = None
+
+  async def render_workbook(self, filename, sheet_specs, memory=0,
+                            constant_memory=False):
+    """Generates a workbook with the given sheets. Returns the filename.
+
+    The memory is the number of bytes the report is expected to use. The
+    workbook is created with xls.new_workbook, in constant memory mode if
+    requested, so the filename can also be a writable file object.
+    """
+    loop = asyncio.get_running_loop()
+    await self._acquire(memory)
+    try:
+      cancelled = threading.Event()
+      job = loop.run_in_executor(self._executor, _render_workbook, filename,
+                                 sheet_specs, constant_memory, cancelled)
+      try:
+        return await asyncio.shield(job)
+      except asyncio.CancelledError:
+        # Wait for the thread to stop and remove the file, before the job
+        # releases its share of the budget.
+        cancelled.set()
+        try:
+          await job
+        except ReportCancelled:
+          pass
+        raise
+    finally:
+      await self._release(memory)
+
+  async def _acquire(self, memory):
+    """Waits until there is room for a report which uses the given memory."""
+    if self._condition is None:
+      self._condition = asyncio.Condition()
+    async with self._condition:
+      await self._condition.wait_for(lambda: self._has_room(memory))
+      self._num_jobs += 1
+      self._memory_used += memory
+
+  def _has_room(self, memory):
+    if self._num_jobs >= self.max_jobs:
+      return False
+    if self.memory_budget is None or self._num_jobs == 0:
+      return True
+    return self._memory_used + memory <= self.memory_budget
+
+  async def _release(self, memory):
+    async with self._condition:
+      self._num_jobs -= 1
+      self._memory_used -= memory
+      self._condition.notify_all()
+
+
+def streaming_table(name, column_names, rows, num_rows, cell_types=None,
+                    batch_size=1000):
+  """Builds a StreamingTable with the rows of an async iterator.
+
+  It must be called from a coroutine, and the table drawn in a report of a
+  ReportRunner. The rows are read from the event loop in batches of
+  batch_size, as they are needed.
+  """
+  loop = asyncio.get_running_loop()
+  return StreamingTable(name, column_names,
+                        _read_rows(rows, loop, batch_size), num_rows,
+                        cell_types)
+
+
+async def collect_table(name, column_names, rows, cell_types=None):
+  """Builds a Table with all the rows of an async iterator."""
+  table = Table(name, column_names, cell_types)
+  async for row in rows:
+    table.add_row(row)
+  return table
+
+
+def _read_rows(rows, loop, batch_size):
+  """Yields the rows of an async iterator, from a thread outside the loop."""
+  rows = rows.__aiter__()
+  while True:
+    future = asyncio.run_coroutine_threadsafe(_next_batch(rows, batch_size),
+                                              loop)
+    batch = _wait(future)
+    if not batch:
+      return
+    for row in batch:
+      yield row
+
+
+async def _next_batch(rows, batch_size):
+  batch = []
+  async for row in rows:
+    batch.append(row)
+    if len(batch) == batch_size:
+      break
+  return batch
+
+
+def _wait(future):
+  """The result of a future, or ReportCancelled if the report is cancelled."""
+  cancelled = getattr(_job_state, 'cancelled', None)
+  while True:
+    if cancelled is not None and cancelled.is_set():
+      future.cancel()
+      raise ReportCancelled()
+    try:
+      return future.result(_POLL_INTERVAL)
+    except concurrent.futures.TimeoutError:
+      pass
+
+
+def _render_workbook(filename, sheet_specs, constant_memory, cancelled):
+  """Generates a workbook, in an executor thread."""
+  _job_state.cancelled = cancelled
+  workbook = xls.new_workbook(filename, constant_memory)
+  try:
+    try:
+      for sheet_spec in sheet_specs:
+        (sheet_name, layout_factory,
+         start_position) = parallel._parse_spec(sheet_spec)
+        sheet = _CancellableSheet(workbook.add_worksheet(sheet_name),
+                                  cancelled)
+        parallel._draw(layout_factory(workbook), sheet, start_position)
+    finally:
+      # The workbook is closed even if the report failed, to remove the
+      # temporary files of the constant memory mode.
+      workbook.close()
+  except BaseException:
+    if isinstance(filename, (str, os.PathLike)) and os.path.exists(filename):
+      os.remove(filename)
+    raise
+  finally:
+    _job_state.cancelled = None
+  return filename
+
+
+class _CancellableSheet(object):
+  """A sheet which raises ReportCancelled when the report is cancelled."""
+
+  def __init__(self, sheet, cancelled):
+    self._sheet = sheet
+    self._cancelled = cancelled
+    self._methods = {}
+
+  def get_name(self):
+    return self._sheet.get_name()
+
+  def __getattr__(self, name):
+    attribute = getattr(self._sheet, name)
+    if name.startswith('_') or not callable(attribute):
+      return attribute
+    method = self._methods.get(name)
+    if method is None:
+      cancelled = self._cancelled
+
+      def method(*args, **kwargs):
+        if cancelled.is_set():
+          raise ReportCancelled()
+        return attribute(*args, **kwargs)
+      self._methods[name] = method
+    return method
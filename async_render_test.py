@@ -0,0 +1,151 @@
+"""Tests for async_render.py"""
+
+__author__ = 'jt@javiertordable.com'
+__copyright__ = "Copyright (C) 2014 Javier Tordable"
+
+
+import async_render
+from layout import TableLayout
+from style import TableStyle
+from table import Table
+
+import asyncio
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+
+def build_table_layout(workbook, table=None):
+  if table is None:
+    table = Table('Table', ['Col1', 'Col2'])
+    table.add_row(['a', 1])
+    table.add_row(['b', 2])
+  return TableLayout(TableStyle(workbook, table), table)
+
+
+async def generate_rows(num_rows, delay=0):
+  for row_index in range(num_rows):
+    if delay:
+      await asyncio.sleep(delay)
+    yield ['a%d' % row_index, row_index]
+
+
+class JobCounter(object):
+  """Counts the layouts built at the same time, in the executor threads."""
+
+  def __init__(self):
+    self.lock = threading.Lock()
+    self.num_running = 0
+    self.max_running = 0
+
+  def layout_factory(self, workbook):
+    with self.lock:
+      self.num_running += 1
+      self.max_running = max(self.max_running, self.num_running)
+    time.sleep(0.05)
+    with self.lock:
+      self.num_running -= 1
+    return build_table_layout(workbook)
+
+
+class ReportRunnerTest(unittest.TestCase):
+  """Tests for ReportRunner and the async tables."""
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def filename(self, index=0):
+    return os.path.join(self.directory, 'report%d.xlsx' % index)
+
+  def render_all(self, runner, sheet_specs, num_reports, memory=0):
+    async def render():
+      return await asyncio.gather(*[
+          runner.render_workbook(self.filename(index), sheet_specs, memory)
+          for index in range(num_reports)])
+    return asyncio.run(render())
+
+  def test_render_workbook(self):
+    runner = async_render.ReportRunner()
+    filenames = self.render_all(
+        runner, [('Table', build_table_layout, (1, 1))], 1)
+    self.assertEqual([self.filename()], filenames)
+    self.assertTrue(os.path.exists(self.filename()))
+
+  def test_render_to_stream(self):
+    runner = async_render.ReportRunner()
+    output = io.BytesIO()
+    result = asyncio.run(runner.render_workbook(
+        output, [('Table', build_table_layout)]))
+    self.assertIs(output, result)
+    self.assertEqual(b'PK', output.getvalue()[:2])
+
+  def test_max_jobs(self):
+    counter = JobCounter()
+    runner = async_render.ReportRunner(max_jobs=2)
+    self.render_all(runner, [('Table', counter.layout_factory)], 5)
+    self.assertEqual(2, counter.max_running)
+    for index in range(5):
+      self.assertTrue(os.path.exists(self.filename(index)))
+
+  def test_memory_budget(self):
+    counter = JobCounter()
+    runner = async_render.ReportRunner(max_jobs=4, memory_budget=100)
+    self.render_all(runner, [('Table', counter.layout_factory)], 3, memory=60)
+    self.assertEqual(1, counter.max_running)
+
+  def test_invalid_max_jobs(self):
+    self.assertRaises(ValueError, async_render.ReportRunner, 0)
+
+  def test_async_tables(self):
+    tables = []
+
+    async def render():
+      runner = async_render.ReportRunner()
+      streaming_table = async_render.streaming_table(
+          'Streaming', ['Col1', 'Col2'], generate_rows(25), 25, batch_size=10)
+      table = await async_render.collect_table('Collected', ['Col1', 'Col2'],
+                                               generate_rows(5))
+      tables.append(table)
+      await runner.render_workbook(self.filename(), [
+          ('Streaming', lambda workbook: build_table_layout(workbook,
+                                                            streaming_table)),
+          ('Collected', lambda workbook: build_table_layout(workbook, table))],
+          constant_memory=True)
+      return streaming_table
+
+    streaming_table = asyncio.run(render())
+    self.assertEqual(5, tables[0].num_rows)
+    self.assertEqual('a4', tables[0].get('Col1', 4))
+    self.assertEqual(['a24', 24], streaming_table.get_block(0, 24, 2, 1)[0])
+    self.assertTrue(os.path.exists(self.filename()))
+
+  def test_cancel(self):
+    async def render():
+      runner = async_render.ReportRunner()
+      table = async_render.streaming_table(
+          'Table', ['Col1', 'Col2'], generate_rows(1000, delay=0.01), 1000,
+          batch_size=1)
+      task = asyncio.ensure_future(runner.render_workbook(
+          self.filename(), [('Table', lambda workbook: build_table_layout(
+              workbook, table))]))
+      await asyncio.sleep(0.2)
+      task.cancel()
+      with self.assertRaises(asyncio.CancelledError):
+        await task
+      # The runner can generate other reports afterwards.
+      return await runner.render_workbook(self.filename(1),
+                                          [('Table', build_table_layout)])
+
+    self.assertEqual(self.filename(1), asyncio.run(render()))
+    self.assertFalse(os.path.exists(self.filename()))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,249 @@
+"""Automatic widths of the columns of a sheet, measured while it's drawn.
+
+An AutofitSheet wraps a sheet, and keeps the width of the widest cell written
+in each column. After the layouts are drawn, set_column_widths sets the width
+of each column with a single call to set_column:
+
+  sheet = autofit.AutofitSheet(workbook.add_worksheet('Report'))
+  render.draw_rows(layout, sheet, (0, 0))
+  sheet.set_column_widths()
+
+The cells are measured as they are written, in any order, so it works with the
+renderers which write the rows in order for constant memory sheets. The width
+of each distinct string is computed once, and the width of a number with a
+rule for its number format. In huge tables only a sample of the rows can be
+measured.
+"""
+
+__author__ = 'jt@javiertordable.com'
+__copyright__ = "Copyright (C) 2014 Javier Tordable"
+
+
+import datetime
+import math
+import numbers
+import unicodedata
+
+import xls
+
+
+# The widest column allowed by Excel, in characters.
+MAX_COLUMN_WIDTH = 255
+
+# The most strings whose widths are kept, to bound the memory of the cache.
+_MAX_CACHED_STRINGS = 100000
+
+# The width of a number in the General format, which shows at most 11
+# characters, and of booleans and dates without a number format.
+_GENERAL_NUMBER_WIDTH = 11
+_BOOLEAN_WIDTH = 5
+_DATE_WIDTH = 10
+
+
+def text_width(text):
+  """The width of a text in characters, of its longest line.
+
+  East Asian wide characters count as two.
+  """
+  if text.isascii():
+    return max(len(line) for line in text.split('\n'))
+  return max(sum(2 if unicodedata.east_asian_width(character) in 'WF' else 1
+                 for character in line)
+             for line in text.split('\n'))
+
+
+class AutofitSheet(xls.Sheet):
+  """A sheet which measures the cells written to another sheet.
+
+  All the calls are passed to the wrapped sheet. If sample_every is more than
+  1, only the first first_rows rows and one row in every sample_every rows
+  after them are measured.
+  """
+
+  def __init__(self, sheet, sample_every=1, first_rows=100, padding=1):
+    """Builds an AutofitSheet.
+
+    @param padding: The width added to the widest cell of each column.
+    """
+    if sample_every < 1:
+      raise ValueError('Please give a positive sampling interval.')
+    self._sheet = sheet
+    self._sample_every = sample_every
+    self._first_rows = first_rows
+    self._padding = padding
+    # The width of the widest cell of each column.
+    self._widths = {}
+    self._string_widths = {}
+    # The function which measures the numbers in each format.
+    self._number_rules = {}
+
+  def get_name(self):
+    return self._sheet.get_name()
+
+  def set_default_row(self, hide_unused_rows=False):
+    self._sheet.set_default_row(hide_unused_rows=hide_unused_rows)
+
+  def set_column(self, first_col, last_col, width=None, format=None,
+                 options=None):
+    self._sheet.set_column(first_col, last_col, width, format, options)
+
+  def conditional_format(self, first_row, first_column, last_row, last_column,
+                         options):
+    self._sheet.conditional_format(first_row, first_column, last_row,
+                                   last_column, options)
+
+  def remove_conditional_format(self, first_row, first_column, last_row,
+                                last_column, options):
+    self._sheet.remove_conditional_format(first_row, first_column, last_row,
+                                          last_column, options)
+
+  def insert_chart(self, row, column, chart, options=None):
+    self._sheet.insert_chart(row, column, chart, options)
+
+  def remove_chart(self, row, column, chart):
+    self._sheet.remove_chart(row, column, chart)
+
+  def write(self, row, column, value, format=None):
+    self._sheet.write(row, column, value, format)
+    if self._is_sampled(row):
+      self._measure(column, value, format)
+
+  def write_row(self, row, column, values, format=None, cell_types=None):
+    if cell_types is None:
+      self._sheet.write_row(row, column, values, format)
+    else:
+      self._sheet.write_row(row, column, values, format,
+                            cell_types=cell_types)
+    if not self._is_sampled(row):
+      return
+    widths = self._widths
+    string_widths = self._string_widths
+    number_rule = self._number_rule(format)
+    for (column, value) in enumerate(values, column):
+      # Most cells are numbers, or strings which have been measured already.
+      value_type = type(value)
+      if value_type is float or value_type is int:
+        width = number_rule(value)
+      elif value is None:
+        continue
+      else:
+        width = string_widths.get(value) if value_type is str else None
+        if width is None:
+          width = self._value_width(value, format)
+      if width > widths.get(column, 0):
+        widths[column] = width
+
+  def write_column(self, row, column, values, format=None):
+    self._sheet.write_column(row, column, values, format)
+    for (index, value) in enumerate(values):
+      if value is not None and self._is_sampled(row + index):
+        self._measure(column, value, format)
+
+  def fill_range(self, first_row, first_column, last_row, last_column, value,
+                 format=None):
+    self._sheet.fill_range(first_row, first_column, last_row, last_column,
+                           value, format)
+    if value is not None:
+      for column in range(first_column, last_column + 1):
+        self._measure(column, value, format)
+
+  def __getattr__(self, name):
+    # Other attributes of the sheet, like the cells of a MockSheet.
+    return getattr(self._sheet, name)
+
+  def column_widths(self):
+    """The width of each column with cells, as a dict keyed by column."""
+    return dict((column, min(width + self._padding, MAX_COLUMN_WIDTH))
+                for (column, width) in self._widths.items() if width > 0)
+
+  def set_column_widths(self):
+    """Sets the width of each column with cells. Returns the widths."""
+    column_widths = self.column_widths()
+    for column in sorted(column_widths):
+      self._sheet.set_column(column, column, column_widths[column])
+    return column_widths
+
+  def _is_sampled(self, row):
+    return row < self._first_rows or row % self._sample_every == 0
+
+  def _measure(self, column, value, format):
+    width = self._value_width(value, format)
+    if width > self._widths.get(column, 0):
+      self._widths[column] = width
+
+  def _value_width(self, value, format):
+    if isinstance(value, str):
+      width = self._string_widths.get(value)
+      if width is None:
+        if len(self._string_widths) >= _MAX_CACHED_STRINGS:
+          self._string_widths.clear()
+        # The width of the result of a formula is unknown.
+        width = 0 if value.startswith('=') else text_width(value)
+        self._string_widths[value] = width
+      return width
+    if isinstance(value, bool):
+      return _BOOLEAN_WIDTH
+    if isinstance(value, numbers.Number):
+      return self._number_rule(format)(value)
+    if isinstance(value, (datetime.date, datetime.time)):
+      num_format = _num_format(format)
+      return len(num_format) if num_format else _DATE_WIDTH
+    if value is None:
+      return 0
+    return text_width(str(value))
+
+  def _number_rule(self, format):
+    number_rule = self._number_rules.get(format)
+    if number_rule is None:
+      number_rule = _number_rule(_num_format(format))
+      self._number_rules[format] = number_rule
+    return number_rule
+
+
+def _num_format(format):
+  """The number format of a format, or None for the General format."""
+  if format is None:
+    return None
+  num_format = format.properties.get('num_format')
+  if num_format == 'General':
+    return None
+  return num_format
+
+
+def _number_rule(num_format):
+  """A function which gives the width of a number in a number format."""
+  if not isinstance(num_format, str):
+    return _general_number_width
+
+  # Only the part of the format for positive numbers is used.
+  section = num_format.split(';')[0]
+  if '.' in section:
+    decimals = len([character for character in section.split('.', 1)[1]
+                    if character in '0#?'])
+  else:
+    decimals = 0
+  thousands = ',' in section
+  scale = 100 if '%' in section else 1
+  # The symbols and other characters which are not digits.
+  extra = len([character for character in section
+               if character in '%$€£ ()'])
+  if decimals:
+    extra += decimals + 1
+
+  def number_width(value):
+    if not math.isfinite(value):
+      # NaN and the infinities have no digits to format.
+      return _general_number_width(value)
+    digits = len(str(int(abs(value) * scale)))
+    if thousands:
+      digits += (digits - 1) // 3
+    if value < 0:
+      digits += 1
+    return digits + extra
+  return number_width
+
+
+def _general_number_width(value):
+  if type(value) is float:
+    return min(len(repr(value)), _GENERAL_NUMBER_WIDTH)
+  return len(str(value))
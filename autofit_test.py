@@ -0,0 +1,130 @@
+"""Tests for autofit.py"""
+
+__author__ = 'jt@javiertordable.com'
+__copyright__ = "Copyright (C) 2014 Javier Tordable"
+
+
+import datetime
+import os
+import tempfile
+
+import autofit
+from layout import ColumnLayout, FixedSizeLayout, TableLayout
+import render
+from style import FixedStyle, TableStyle
+from table import Table
+import xls
+from xls import MockWorkbook
+
+import unittest
+
+
+def build_table():
+  table = Table('Sales', ['Region', 'Units'])
+  table.add_row(['North-East', 12])
+  table.add_row(['West', 123456])
+  return table
+
+
+class TextWidthTest(unittest.TestCase):
+  """Tests for text_width."""
+
+  def test_text_width(self):
+    self.assertEqual(5, autofit.text_width('Total'))
+    self.assertEqual(0, autofit.text_width(''))
+    self.assertEqual(6, autofit.text_width('First\nSecond\nTh'))
+    self.assertEqual(4, autofit.text_width('日本'))
+    self.assertEqual(4, autofit.text_width('Café'))
+
+
+class AutofitSheetTest(unittest.TestCase):
+  """Tests for AutofitSheet."""
+
+  def test_draw_table(self):
+    workbook = MockWorkbook()
+    output_sheet = workbook.add_worksheet('Sheet')
+    sheet = autofit.AutofitSheet(output_sheet)
+    table = build_table()
+    TableLayout(TableStyle(workbook, table), table).draw(sheet, (2, 1))
+    self.assertEqual('West', sheet.read(3, 2))
+    self.assertEqual({2: 11, 3: 7}, sheet.set_column_widths())
+    self.assertEqual({2: 11, 3: 7}, output_sheet.column_widths)
+
+  def test_draw_rows(self):
+    # The cells are measured in a constant memory sheet too.
+    workbook = MockWorkbook(constant_memory=True)
+    sheet = autofit.AutofitSheet(workbook.add_worksheet('Sheet'))
+    table = build_table()
+    layout = ColumnLayout(FixedStyle(workbook, None), [
+        TableLayout(TableStyle(workbook, table), table),
+        FixedSizeLayout(FixedStyle(workbook, 'A longer text'), 1, 1)])
+    render.draw_rows(layout, sheet, (0, 0))
+    self.assertEqual({0: 14, 1: 7}, sheet.column_widths())
+
+  def test_numbers(self):
+    workbook = MockWorkbook()
+    sheet = autofit.AutofitSheet(workbook.add_worksheet('Sheet'), padding=0)
+    money = workbook.get_format({'num_format': '#,##0.00'})
+    percent = workbook.get_format({'num_format': '0%'})
+    date = workbook.get_format({'num_format': 'dd/mm/yyyy hh:mm'})
+    sheet.write_row(0, 0, [1234567.891, -0.25, 1 / 3.0, True])
+    sheet.write(1, 0, 1234567.891, money)
+    sheet.write(1, 1, -0.25, percent)
+    sheet.write(1, 2, 12345678901234, None)
+    sheet.write(1, 3, datetime.date(2014, 1, 1))
+    sheet.write(1, 4, datetime.datetime(2014, 1, 1), date)
+    sheet.write(1, 5, '=SUM(A1:A2)')
+    self.assertEqual({0: 12, 1: 5, 2: 14, 3: 10, 4: 16},
+                     sheet.column_widths())
+
+  def test_non_finite_numbers(self):
+    workbook = MockWorkbook()
+    sheet = autofit.AutofitSheet(workbook.add_worksheet('Sheet'), padding=0)
+    money = workbook.get_format({'num_format': '#,##0.00'})
+    sheet.write_row(0, 0, [float('nan'), float('inf'), float('-inf')], money)
+    self.assertEqual({0: 3, 1: 3, 2: 4}, sheet.column_widths())
+
+  def test_sampled_rows(self):
+    workbook = MockWorkbook()
+    sheet = autofit.AutofitSheet(workbook.add_worksheet('Sheet'),
+                                 sample_every=10, first_rows=2)
+    sheet.write_row(1, 0, ['Header'])
+    sheet.write_row(5, 0, ['Not sampled'])
+    sheet.write_column(10, 1, ['Sampled', 'Not sampled'])
+    self.assertEqual({0: 7, 1: 8}, sheet.column_widths())
+    self.assertEqual('Not sampled', sheet.read(5, 0))
+    self.assertRaises(ValueError, autofit.AutofitSheet, sheet, 0)
+
+  def test_fill_range(self):
+    workbook = MockWorkbook()
+    sheet = autofit.AutofitSheet(workbook.add_worksheet('Sheet'),
+                                 sample_every=1000)
+    sheet.fill_range(0, 0, 999, 2, 'Value')
+    sheet.fill_range(0, 3, 999, 3, None)
+    self.assertEqual({0: 6, 1: 6, 2: 6}, sheet.column_widths())
+    self.assertEqual(2, len(sheet.filled_ranges))
+
+  def test_maximum_width(self):
+    workbook = MockWorkbook()
+    sheet = autofit.AutofitSheet(workbook.add_worksheet('Sheet'))
+    sheet.write(0, 0, 'x' * 1000)
+    self.assertEqual({0: autofit.MAX_COLUMN_WIDTH}, sheet.column_widths())
+
+  def test_write_file(self):
+    (handle, filename) = tempfile.mkstemp(suffix='.xlsx')
+    os.close(handle)
+    try:
+      workbook = xls.new_workbook(filename, constant_memory=True)
+      sheet = autofit.AutofitSheet(workbook.add_worksheet('Sheet'))
+      table = build_table()
+      render.draw_rows(TableLayout(TableStyle(workbook, table), table), sheet,
+                       (0, 0))
+      self.assertEqual({0: 11, 1: 7}, sheet.set_column_widths())
+      workbook.close()
+      self.assertTrue(os.path.getsize(filename) > 0)
+    finally:
+      os.remove(filename)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,8 @@
+"""Benchmarks for the XLS report library.
+
+Each benchmark is a small program, which should be run from the root directory
+of the library, for example: python -m benchmarks.layout_size
+
+The suite module runs the main scenarios, reports the time of each phase, and
+can compare the results with a saved baseline: python -m benchmarks.suite
+"""
@@ -0,0 +1,62 @@
+"""Benchmark for the aggregation of large tables.
+
+Aggregates a ColumnarTable with 1M rows by a column of regions, with each
+aggregation function, in Python and with NumPy if it's installed, and builds
+the subtotals and a pivot of the table.
+"""
+
+__author__ = 'jt@javiertordable.com'
+__copyright__ = "Copyright (C) 2014 Javier Tordable"
+
+
+import time
+
+import aggregate
+from table import CATEGORY, ColumnarTable
+
+
+NUM_ROWS = 1000000
+REGIONS = ['Region %d' % i for i in range(20)]
+
+
+def build_table():
+  table = ColumnarTable('Sales', ['Region', 'Year', 'Units', 'Price'],
+                        [CATEGORY, 'q', 'q', 'd'])
+  for row_index in range(NUM_ROWS):
+    table.add_row([REGIONS[row_index % len(REGIONS)], 2000 + row_index % 15,
+                   row_index % 100, row_index * 0.01])
+  return table
+
+
+def measure(function, *args):
+  start = time.time()
+  function(*args)
+  return time.time() - start
+
+
+def main():
+  table = build_table()
+  aggregations = [('Units', 'sum'), ('Units', 'count'), ('Price', 'mean'),
+                  ('Price', 'min'), ('Price', 'max')]
+  print('%d rows' % NUM_ROWS)
+
+  numpy = aggregate.numpy
+  aggregate.numpy = None
+  try:
+    print('group_by in Python:  %6.3f s' %
+          measure(aggregate.group_by, table, ['Region'], aggregations))
+  finally:
+    aggregate.numpy = numpy
+  if numpy is not None:
+    print('group_by with NumPy: %6.3f s' %
+          measure(aggregate.group_by, table, ['Region'], aggregations))
+
+  print('subtotals:           %6.3f s' %
+        measure(aggregate.subtotals, table, 'Region', aggregations[:1] +
+                aggregations[3:4]))
+  print('pivot:               %6.3f s' %
+        measure(aggregate.pivot, table, 'Region', 'Year', 'Units'))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,77 @@
+"""Benchmark for drawing a large table with bulk row writes.
+
+Draws a table with 500k cells on a XlsxWriter sheet, writing every cell with
+its own call to write, and with TableLayout.draw, which writes a whole row of
+the table with a single call to write_row.
+"""
+
+__author__ = 'jt@javiertordable.com'
+__copyright__ = "Copyright (C) 2014 Javier Tordable"
+
+
+import os
+import shutil
+import tempfile
+import time
+
+from layout import TableLayout
+from style import TableStyle
+from table import Table
+import xls
+
+
+NUM_ROWS = 50000
+NUM_COLUMNS = 10
+
+
+def draw_per_cell(layout, output_sheet, start_position):
+  """Draws a TableLayout with one call to write per cell."""
+  (start_column, start_row) = start_position
+  (width, height) = layout.size()
+  for output_row in range(start_row, start_row + height):
+    data_row_index = output_row - start_row
+    for output_column in range(start_column, start_column + width):
+      data_column_index = output_column - start_column
+      cell_value = layout.style.get_cell_content(data_column_index,
+                                                 data_row_index)
+      cell_format = layout.style.get_cell_format(data_column_index,
+                                                 data_row_index)
+      output_sheet.write(output_row, output_column, cell_value, cell_format)
+
+
+def measure(filename, table, draw):
+  workbook = xls.new_workbook(filename)
+  layout = TableLayout(TableStyle(workbook, table), table)
+  sheet = workbook.add_worksheet('Sheet')
+  start = time.time()
+  draw(layout, sheet, (0, 0))
+  elapsed = time.time() - start
+  workbook.close()
+  return elapsed
+
+
+def main():
+  table = Table('Table', ['Col%d' % i for i in range(NUM_COLUMNS)])
+  for row_index in range(NUM_ROWS):
+    table.add_row([row_index * NUM_COLUMNS + i for i in range(NUM_COLUMNS)])
+
+  directory = tempfile.mkdtemp()
+  try:
+    filename = os.path.join(directory, 'bench.xlsx')
+    per_cell = measure(filename, table, draw_per_cell)
+    per_row = measure(filename, table,
+                      lambda layout, sheet, position: layout.draw(sheet,
+                                                                  position))
+  finally:
+    shutil.rmtree(directory)
+
+  num_cells = NUM_COLUMNS * (NUM_ROWS + 1)
+  print('Cells:          %d' % num_cells)
+  print('Write per cell: %6.3f s (%9.0f cells/s)' % (per_cell,
+                                                     num_cells / per_cell))
+  print('Write per row:  %6.3f s (%9.0f cells/s)' % (per_row,
+                                                     num_cells / per_row))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,71 @@
+"""Benchmark for tables with columns of repeated strings.
+
+Builds a ColumnarTable with columns of countries, products and status names,
+stored as Python lists and as CATEGORY columns, and measures the memory of
+each table, and the time to draw it on a XlsxWriter sheet.
+"""
+
+__author__ = 'jt@javiertordable.com'
+__copyright__ = "Copyright (C) 2014 Javier Tordable"
+
+
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from layout import TableLayout
+from style import TableStyle
+from table import CATEGORY, ColumnarTable
+import xls
+
+
+NUM_ROWS = 200000
+COUNTRIES = ['Country %d' % i for i in range(50)]
+PRODUCTS = ['Product %d' % i for i in range(500)]
+STATUSES = ['Pending', 'Shipped', 'Delivered', 'Returned']
+
+
+def build_table(column_type):
+  table = ColumnarTable('Table', ['Country', 'Product', 'Status', 'Units'],
+                        [column_type, column_type, column_type, 'q'])
+  for row_index in range(NUM_ROWS):
+    # The values are built for each row, as if they were read from a file.
+    table.add_row(['Country %d' % (row_index % len(COUNTRIES)),
+                   'Product %d' % (row_index * 7 % len(PRODUCTS)),
+                   STATUSES[row_index % len(STATUSES)], row_index])
+  return table
+
+
+def measure(filename, column_type):
+  """Returns the memory used by the table, and the time to draw it."""
+  tracemalloc.start()
+  table = build_table(column_type)
+  (memory, _) = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+
+  workbook = xls.new_workbook(filename)
+  layout = TableLayout(TableStyle(workbook, table), table)
+  sheet = workbook.add_worksheet('Sheet')
+  start = time.time()
+  layout.draw(sheet, (0, 0))
+  elapsed = time.time() - start
+  workbook.close()
+  return (memory, elapsed)
+
+
+def main():
+  directory = tempfile.mkdtemp()
+  try:
+    filename = os.path.join(directory, 'bench.xlsx')
+    print('%-10s %10s %10s' % ('Columns', 'Table MB', 'Draw s'))
+    for (name, column_type) in [('Lists', None), ('Category', CATEGORY)]:
+      (memory, elapsed) = measure(filename, column_type)
+      print('%-10s %10.1f %10.3f' % (name, memory / 1e6, elapsed))
+  finally:
+    shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,56 @@
+"""Benchmark for the automatic widths of the columns.
+
+Draws a table with 200K rows on a compact constant memory sheet, with and
+without measuring the widths of the columns, and measuring only a sample of
+the rows.
+"""
+
+__author__ = 'jt@javiertordable.com'
+__copyright__ = "Copyright (C) 2014 Javier Tordable"
+
+
+import time
+
+import autofit
+from layout import TableLayout
+import render
+from style import TableStyle
+from table import Table
+from xls import MockWorkbook
+
+
+NUM_ROWS = 200000
+NAMES = ['Customer %d' % i for i in range(1000)]
+
+
+def build_table():
+  table = Table('Sales', ['Customer', 'Units', 'Price', 'Paid'])
+  for row_index in range(NUM_ROWS):
+    table.add_row([NAMES[row_index % len(NAMES)], row_index % 1000,
+                   row_index * 0.01, row_index % 3 == 0])
+  return table
+
+
+def draw(table, sample_every=None):
+  workbook = MockWorkbook(constant_memory=True, compact=True)
+  sheet = workbook.add_worksheet('Sheet')
+  if sample_every is not None:
+    sheet = autofit.AutofitSheet(sheet, sample_every=sample_every)
+  start = time.time()
+  render.draw_rows(TableLayout(TableStyle(workbook, table), table), sheet,
+                   (0, 0))
+  if sample_every is not None:
+    sheet.set_column_widths()
+  return time.time() - start
+
+
+def main():
+  table = build_table()
+  print('%d rows' % NUM_ROWS)
+  print('Without autofit:       %6.3f s' % draw(table))
+  print('Autofit:               %6.3f s' % draw(table, 1))
+  print('Autofit, 1 in 100 rows: %5.3f s' % draw(table, 100))
+
+
+if __name__ == '__main__':
+  main()
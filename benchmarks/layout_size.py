@@ -0,0 +1,98 @@
+"""Benchmark for the computation of layout sizes and positions.
+
+Builds a tree of nested RowLayouts and ColumnLayouts, 10 levels deep and with
+thousands of leaves, and measures the time to compute the sizes and positions
+of all layouts and to draw the tree, with and without the cached sizes.
+"""
+
+__author__ = 'jt@javiertordable.com'
+__copyright__ = "Copyright (C) 2014 Javier Tordable"
+
+
+import time
+
+from layout import ColumnLayout
+from layout import FixedSizeLayout
+from layout import Layout
+from layout import RowLayout
+from layout import TableLayout
+from render import walk
+from style import EmptyStyle, FixedStyle, TableStyle
+from table import Table
+import xls
+
+
+DEPTH = 10
+LEAVES_PER_NODE = 3
+
+
+def build_tree(workbook, depth):
+  """Builds a binary tree of layouts with LEAVES_PER_NODE leaves per node."""
+  empty_style = EmptyStyle(workbook)
+  fixed_style = FixedStyle(workbook, 'Fixed', '#00FF00')
+  table = Table('Table', ['Col1', 'Col2'])
+  table.add_row([1, 2])
+  table_style = TableStyle(workbook, table)
+
+  def build(level):
+    if level == depth:
+      leaves = [FixedSizeLayout(fixed_style, 1, 1)
+                for _ in range(LEAVES_PER_NODE - 1)]
+      leaves.append(TableLayout(table_style, table))
+      return ColumnLayout(empty_style, leaves)
+    children = [build(level + 1), build(level + 1)]
+    if level % 2 == 0:
+      return RowLayout(empty_style, children)
+    return ColumnLayout(empty_style, children)
+
+  return build(1)
+
+
+def clear_caches(layout):
+  for (node, _) in walk(layout, (0, 0)):
+    node._cached_size = None
+    node._layout_pass = None
+
+
+def all_sizes(layout):
+  """Asks every layout for its size, like draw does."""
+  for (node, _) in walk(layout, (0, 0)):
+    node.size()
+
+
+def timed(function, *args):
+  start = time.time()
+  function(*args)
+  return time.time() - start
+
+
+def main():
+  workbook = xls.MockWorkbook()
+  layout = build_tree(workbook, DEPTH)
+  num_layouts = len(walk(layout, (0, 0)))
+  print('Tree with %d levels and %d layouts' % (DEPTH, num_layouts))
+
+  # Without the cache, every call to size recurses over the whole subtree.
+  cached_size = Layout.size
+  Layout.size = lambda self: self.compute_size()
+  try:
+    uncached_sizes = timed(all_sizes, layout)
+    uncached_draw = timed(layout.draw, xls.MockSheet('Uncached'), (0, 0))
+  finally:
+    Layout.size = cached_size
+
+  clear_caches(layout)
+  cold_positions = timed(layout.compute_positions, (0, 0))
+  warm_sizes = timed(all_sizes, layout)
+  clear_caches(layout)
+  cached_draw = timed(layout.draw, xls.MockSheet('Cached'), (0, 0))
+
+  print('All sizes, uncached:        %8.4f s' % uncached_sizes)
+  print('All sizes and positions:    %8.4f s' % cold_positions)
+  print('All sizes, cached:          %8.4f s' % warm_sizes)
+  print('Draw, uncached sizes:       %8.4f s' % uncached_draw)
+  print('Draw, cached sizes:         %8.4f s' % cached_draw)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,77 @@
+"""Benchmark for the mock sheets used to test large reports.
+
+Draws a table with many cells on a MockSheet and on a CompactMockSheet, and
+measures the time and peak memory to draw it, to serialize the sheet as text,
+and to compare it with a second drawing of the same table.
+"""
+
+__author__ = 'jt@javiertordable.com'
+__copyright__ = "Copyright (C) 2014 Javier Tordable"
+
+
+import io
+import time
+import tracemalloc
+
+from layout import TableLayout
+from style import TableStyle
+from table import Table
+import xls
+
+
+NUM_COLUMNS = 10
+NUM_ROWS = 20000
+
+
+def build_table():
+  table = Table('Table', ['Col%d' % i for i in range(NUM_COLUMNS)])
+  for row_index in range(NUM_ROWS):
+    table.add_row([row_index * NUM_COLUMNS + i for i in range(NUM_COLUMNS)])
+  return table
+
+
+def draw(table, compact):
+  workbook = xls.MockWorkbook(compact=compact)
+  sheet = workbook.add_worksheet('Sheet')
+  TableLayout(TableStyle(workbook, table), table).draw(sheet, (0, 0))
+  return sheet
+
+
+def measure(table, compact):
+  """Returns the peak memory and time to draw, and the time to serialize."""
+  tracemalloc.start()
+  start = time.time()
+  sheet = draw(table, compact)
+  draw_time = time.time() - start
+  (_, peak) = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+
+  start = time.time()
+  if compact:
+    sheet.write_csv(io.StringIO())
+  else:
+    str(sheet)
+  text_time = time.time() - start
+  return (sheet, peak, draw_time, text_time)
+
+
+def main():
+  table = build_table()
+  print('%d cells' % (NUM_COLUMNS * (NUM_ROWS + 1)))
+  print('%-18s %10s %10s %10s' % ('Sheet', 'Peak MB', 'Draw s', 'Text s'))
+  (_, peak, draw_time, text_time) = measure(table, False)
+  print('%-18s %10.1f %10.3f %10.3f' % ('MockSheet', peak / 1e6, draw_time,
+                                        text_time))
+  (sheet, peak, draw_time, text_time) = measure(table, True)
+  print('%-18s %10.1f %10.3f %10.3f' % ('CompactMockSheet', peak / 1e6,
+                                        draw_time, text_time))
+
+  other_sheet = draw(table, True)
+  start = time.time()
+  differences = sheet.diff(other_sheet)
+  print('Diff of two drawings: %d differences in %.3f s' %
+        (len(differences), time.time() - start))
+
+
+if __name__ == '__main__':
+  main()
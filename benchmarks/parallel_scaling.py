@@ -0,0 +1,97 @@
+"""Benchmark for the generation of reports with a pool of processes.
+
+Generates a workbook with many sheets, each with a table which is computed
+when the layout is built, sequentially and with an increasing number of
+worker processes. Then generates several whole workbooks in parallel.
+"""
+
+__author__ = 'jt@javiertordable.com'
+__copyright__ = "Copyright (C) 2014 Javier Tordable"
+
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from layout import ColumnLayout
+from layout import FixedSizeLayout
+from layout import TableLayout
+import parallel
+from style import EmptyStyle, FixedStyle, TableStyle
+from table import Table
+import xls
+
+
+NUM_SHEETS = 16
+NUM_WORKBOOKS = 8
+NUM_ROWS = 2000
+NUM_COLUMNS = 10
+
+
+def build_sheet(workbook):
+  """Builds a layout with a table which is expensive to compute."""
+  table = Table('Table', ['Col%d' % i for i in range(NUM_COLUMNS)])
+  for row_index in range(NUM_ROWS):
+    table.add_row([sum(range(row_index % 100 + column_index))
+                   for column_index in range(NUM_COLUMNS)])
+  title = FixedSizeLayout(FixedStyle(workbook, 'Title', '#00FF00'),
+                          NUM_COLUMNS, 1)
+  return ColumnLayout(EmptyStyle(workbook), [
+      title, TableLayout(TableStyle(workbook, table), table)])
+
+
+SHEET_SPECS = [('Sheet%d' % i, build_sheet) for i in range(NUM_SHEETS)]
+
+
+def render_sequentially(filename):
+  parallel.render_workbook(filename, SHEET_SPECS)
+
+
+def render_in_parallel(filename, processes):
+  workbook = xls.new_workbook(filename)
+  parallel.render_sheets(workbook, SHEET_SPECS, processes)
+  workbook.close()
+
+
+def timed(function, *args):
+  start = time.time()
+  function(*args)
+  return time.time() - start
+
+
+def main():
+  max_processes = multiprocessing.cpu_count()
+  directory = tempfile.mkdtemp()
+  try:
+    filename = os.path.join(directory, 'bench.xlsx')
+    print('%d sheets of %d cells, %d CPUs' %
+          (NUM_SHEETS, NUM_ROWS * NUM_COLUMNS, max_processes))
+    sequential = timed(render_sequentially, filename)
+    print('Sheets, sequential:        %7.3f s' % sequential)
+    processes = 1
+    while processes <= max_processes:
+      elapsed = timed(render_in_parallel, filename, processes)
+      print('Sheets, %2d processes:      %7.3f s (%.2fx)' %
+            (processes, elapsed, sequential / elapsed))
+      processes *= 2
+
+    workbook_specs = [(os.path.join(directory, 'bench%d.xlsx' % i),
+                       SHEET_SPECS[:NUM_SHEETS // 4])
+                      for i in range(NUM_WORKBOOKS)]
+    sequential = timed(lambda: [parallel.render_workbook(*workbook_spec)
+                                for workbook_spec in workbook_specs])
+    print('Workbooks, sequential:     %7.3f s' % sequential)
+    processes = 1
+    while processes <= max_processes:
+      elapsed = timed(parallel.render_workbooks, workbook_specs, processes)
+      print('Workbooks, %2d processes:   %7.3f s (%.2fx)' %
+            (processes, elapsed, sequential / elapsed))
+      processes *= 2
+  finally:
+    shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+  main()
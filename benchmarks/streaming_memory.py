@@ -0,0 +1,74 @@
+"""Benchmark for the memory used to write sheets with many rows.
+
+Draws a table next to a fixed layout, with an increasing number of rows, in a
+normal workbook and in a constant memory workbook, and measures the peak
+memory allocated while drawing and closing the workbook. The memory used by
+the table data itself is not included.
+"""
+
+__author__ = 'jt@javiertordable.com'
+__copyright__ = "Copyright (C) 2014 Javier Tordable"
+
+
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from layout import FixedSizeLayout
+from layout import RowLayout
+from layout import TableLayout
+import render
+from style import EmptyStyle, FixedStyle, TableStyle
+from table import Table
+import xls
+
+
+ROW_COUNTS = [5000, 10000, 20000, 40000]
+NUM_COLUMNS = 5
+
+
+def build_table(num_rows):
+  table = Table('Table', ['Col%d' % i for i in range(NUM_COLUMNS)])
+  for row_index in range(num_rows):
+    table.add_row([row_index * NUM_COLUMNS + i for i in range(NUM_COLUMNS)])
+  return table
+
+
+def measure(filename, table, constant_memory):
+  """Returns the peak memory and time to draw the table and close the file."""
+  tracemalloc.start()
+  start = time.time()
+  workbook = xls.new_workbook(filename, constant_memory)
+  table_layout = TableLayout(TableStyle(workbook, table), table)
+  fixed_layout = FixedSizeLayout(FixedStyle(workbook, 'Fixed', '#00FF00'),
+                                 2, table.num_rows)
+  layout = RowLayout(EmptyStyle(workbook), [table_layout, fixed_layout])
+  render.draw_rows(layout, workbook.add_worksheet('Sheet'), (0, 0))
+  workbook.close()
+  elapsed = time.time() - start
+  (_, peak) = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  return (peak, elapsed)
+
+
+def main():
+  directory = tempfile.mkdtemp()
+  try:
+    print('%10s %22s %22s' % ('Rows', 'Peak MB (default)',
+                              'Peak MB (constant)'))
+    for num_rows in ROW_COUNTS:
+      table = build_table(num_rows)
+      filename = os.path.join(directory, 'bench.xlsx')
+      (default_peak, default_time) = measure(filename, table, False)
+      (constant_peak, constant_time) = measure(filename, table, True)
+      print('%10d %13.1f (%5.2f s) %13.1f (%5.2f s)' %
+            (num_rows, default_peak / 1e6, default_time,
+             constant_peak / 1e6, constant_time))
+  finally:
+    shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+  main()
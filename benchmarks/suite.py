@@ -0,0 +1,259 @@
+"""A suite of benchmarks of the layout, style and writer hot paths.
+
+Each scenario builds one or more sheets, and is run against the MockWorkbook
+and the XlsxWriter workbook, writing to a temporary directory. The time of
+each phase is measured separately:
+
+  layout: computing the sizes and positions of the layouts, and the plans
+  cells: generating the content and format of all cells from the styles
+  draw: drawing the plans on the sheets with RenderPlan.draw, which generates
+    the cells again and writes them with rows, ranges and typed writes
+  close: closing the workbook
+
+The cells phase is part of the draw phase, so it isn't added to the total
+time, which gives the cells per second.
+
+Each scenario runs in a new process, so the peak RSS is its own.
+
+Usage:
+  python -m benchmarks.suite [--scenario NAME] [--backend mock|xlsx]
+                             [--save FILE] [--baseline FILE] [--tolerance 0.1]
+
+With --baseline, the results are compared to a JSON file saved before with
+--save, and the exit status is 1 if any scenario is slower than the baseline
+by more than the tolerance.
+"""
+
+__author__ = 'jt@javiertordable.com'
+__copyright__ = "Copyright (C) 2014 Javier Tordable"
+
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.layout_size import build_tree
+from layout import ColumnLayout
+from layout import FixedSizeLayout
+from layout import HideOutsideLayout
+from layout import PaddingLayout
+from layout import RowLayout
+from layout import TableLayout
+import render
+from style import EmptyStyle, FixedStyle, TableStyle
+from table import Table
+import xls
+
+
+PHASES = ['layout', 'cells', 'draw', 'close']
+BACKENDS = ['mock', 'xlsx']
+
+
+def build_table(num_columns, num_rows):
+  table = Table('Table', ['Col%d' % i for i in range(num_columns)])
+  for row_index in range(num_rows):
+    table.add_row([row_index * num_columns + i for i in range(num_columns)])
+  return table
+
+
+def wide_table(workbook):
+  table = build_table(500, 200)
+  return [('Wide', TableLayout(TableStyle(workbook, table), table))]
+
+
+def tall_table(workbook):
+  table = build_table(5, 40000)
+  return [('Tall', TableLayout(TableStyle(workbook, table), table))]
+
+
+def deep_nest(workbook):
+  return [('Deep', build_tree(workbook, 10))]
+
+
+def padding_heavy(workbook):
+  """A hidden sheet with many nested paddings around rows of tables."""
+  table = build_table(4, 50)
+  table_style = TableStyle(workbook, table)
+  padding_styles = [FixedStyle(workbook, None, color)
+                    for color in ['#FF0000', '#00FF00', '#0000FF']]
+  columns = []
+  for column_index in range(10):
+    layout = TableLayout(table_style, table)
+    for level in range(8):
+      layout = PaddingLayout(padding_styles[level % 3], layout, 1, 1, 1, 1)
+    columns.append(layout)
+  layout = RowLayout(EmptyStyle(workbook), columns)
+  return [('Padding', HideOutsideLayout(EmptyStyle(workbook), layout))]
+
+
+def multi_sheet(workbook):
+  table = build_table(10, 2000)
+  title_style = FixedStyle(workbook, 'Title', '#00FF00')
+  sheets = []
+  for sheet_index in range(10):
+    layout = ColumnLayout(EmptyStyle(workbook), [
+        FixedSizeLayout(title_style, 10, 1),
+        TableLayout(TableStyle(workbook, table), table)])
+    sheets.append(('Sheet%d' % sheet_index, layout))
+  return sheets
+
+
+SCENARIOS = [
+    ('wide_table', wide_table),
+    ('tall_table', tall_table),
+    ('deep_nest', deep_nest),
+    ('padding_heavy', padding_heavy),
+    ('multi_sheet', multi_sheet),
+]
+
+
+def run_scenario(args):
+  """Runs a scenario on a backend. Returns a dict with the results."""
+  (scenario_name, backend, directory) = args
+  build = dict(SCENARIOS)[scenario_name]
+  if backend == 'mock':
+    workbook = xls.MockWorkbook()
+  else:
+    workbook = xls.new_workbook(os.path.join(directory,
+                                             scenario_name + '.xlsx'))
+  times = dict((phase, 0.0) for phase in PHASES)
+
+  start = time.time()
+  sheets = build(workbook)
+  build_time = time.time() - start
+
+  start = time.time()
+  plans = [(sheet_name, render.RenderPlan(layout, (0, 0)))
+           for (sheet_name, layout) in sheets]
+  times['layout'] = time.time() - start
+
+  num_cells = 0
+  for (sheet_name, plan) in plans:
+    # The cells are only counted, so they don't add to the peak RSS.
+    start = time.time()
+    for _ in plan.cells():
+      num_cells += 1
+    times['cells'] += time.time() - start
+
+    start = time.time()
+    plan.draw(workbook.add_worksheet(sheet_name))
+    times['draw'] += time.time() - start
+
+  start = time.time()
+  workbook.close()
+  times['close'] = time.time() - start
+
+  # The cells are generated again in the draw phase.
+  total_time = times['layout'] + times['draw'] + times['close']
+  registry = workbook.format_registry
+  return {
+      'scenario': scenario_name,
+      'backend': backend,
+      'cells': num_cells,
+      'build_seconds': build_time,
+      'phase_seconds': times,
+      'total_seconds': total_time,
+      'cells_per_second': num_cells / total_time if total_time else 0.0,
+      'formats_created': registry.num_created,
+      'formats_requested': registry.num_requested,
+      # The maximum resident set size is given in kilobytes on Linux.
+      'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+  }
+
+
+def run_suite(scenario_names, backends):
+  directory = tempfile.mkdtemp()
+  results = []
+  try:
+    for scenario_name in scenario_names:
+      for backend in backends:
+        # A new process per scenario, so that the peak RSS is its own.
+        pool = multiprocessing.Pool(1, maxtasksperchild=1)
+        try:
+          results.append(pool.apply(run_scenario,
+                                    ((scenario_name, backend, directory),)))
+        finally:
+          pool.close()
+          pool.join()
+  finally:
+    shutil.rmtree(directory)
+  return results
+
+
+def print_results(results):
+  print('%-14s %-5s %9s %12s %8s %8s %8s %8s %9s %8s' %
+        ('scenario', 'back', 'cells', 'cells/s', 'layout', 'cells',
+         'draw', 'close', 'formats', 'rss MB'))
+  for result in results:
+    phases = result['phase_seconds']
+    print('%-14s %-5s %9d %12.0f %8.3f %8.3f %8.3f %8.3f %4d/%-4d %8.1f' %
+          (result['scenario'], result['backend'], result['cells'],
+           result['cells_per_second'], phases['layout'], phases['cells'],
+           phases['draw'], phases['close'], result['formats_created'],
+           result['formats_requested'], result['peak_rss_mb']))
+
+
+def compare(results, baseline_results, tolerance):
+  """Prints the change against the baseline. Returns the regressions."""
+  baseline = dict(((result['scenario'], result['backend']), result)
+                  for result in baseline_results)
+  regressions = []
+  print('')
+  print('%-14s %-5s %12s %12s %8s' % ('scenario', 'back', 'baseline/s',
+                                      'cells/s', 'change'))
+  for result in results:
+    key = (result['scenario'], result['backend'])
+    if key not in baseline:
+      continue
+    old_speed = baseline[key]['cells_per_second']
+    new_speed = result['cells_per_second']
+    change = (new_speed - old_speed) / old_speed if old_speed else 0.0
+    marker = ''
+    if change < -tolerance:
+      marker = ' REGRESSION'
+      regressions.append(key)
+    print('%-14s %-5s %12.0f %12.0f %+7.1f%%%s' %
+          (key[0], key[1], old_speed, new_speed, change * 100, marker))
+  return regressions
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description='Benchmarks of XLS reports.')
+  parser.add_argument('--scenario', action='append',
+                      choices=[name for (name, _) in SCENARIOS],
+                      help='Scenario to run. All scenarios by default.')
+  parser.add_argument('--backend', action='append', choices=BACKENDS,
+                      help='Workbook to use. All workbooks by default.')
+  parser.add_argument('--save', help='Saves the results in this JSON file.')
+  parser.add_argument('--baseline',
+                      help='Compares the results to this JSON file.')
+  parser.add_argument('--tolerance', type=float, default=0.1,
+                      help='Maximum slowdown against the baseline.')
+  options = parser.parse_args(argv)
+
+  scenario_names = options.scenario or [name for (name, _) in SCENARIOS]
+  backends = options.backend or BACKENDS
+  results = run_suite(scenario_names, backends)
+  print_results(results)
+
+  if options.save:
+    with open(options.save, 'w') as output_file:
+      json.dump(results, output_file, indent=2, sort_keys=True)
+
+  if options.baseline:
+    with open(options.baseline) as baseline_file:
+      regressions = compare(results, json.load(baseline_file),
+                            options.tolerance)
+    if regressions:
+      return 1
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
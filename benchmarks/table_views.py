@@ -0,0 +1,81 @@
+"""Benchmark for drawing parts of a large table.
+
+Selects the rows of a region from a ColumnarTable, sorts them and takes the
+first rows and some of the columns, by copying the rows into a new Table and
+with a TableView. Measures the memory and time to build each one, and the
+time to draw it on a CompactMockSheet.
+"""
+
+__author__ = 'jt@javiertordable.com'
+__copyright__ = "Copyright (C) 2014 Javier Tordable"
+
+
+import time
+import tracemalloc
+
+from layout import TableLayout
+from style import TableStyle
+from table import CATEGORY, ColumnarTable, Table
+import xls
+
+
+NUM_ROWS = 500000
+NUM_SELECTED = 50000
+COLUMN_NAMES = ['Region', 'Product', 'Units', 'Price']
+SELECTED_COLUMNS = ['Product', 'Units', 'Price']
+
+
+def build_table():
+  table = ColumnarTable('Sales', COLUMN_NAMES, [CATEGORY, CATEGORY, 'q', 'd'])
+  for row_index in range(NUM_ROWS):
+    table.add_row(['Region %d' % (row_index % 4),
+                   'Product %d' % (row_index % 1000), row_index % 97,
+                   row_index * 0.01])
+  return table
+
+
+def build_copy(table):
+  rows = [row for row in table.get_block(0, 0, table.num_columns,
+                                         table.num_rows)
+          if row[0] == 'Region 1']
+  rows.sort(key=lambda row: row[2], reverse=True)
+  region_index = COLUMN_NAMES.index('Region')
+  copy = Table('Sales', SELECTED_COLUMNS)
+  for row in rows[:NUM_SELECTED]:
+    copy.add_row(row[:region_index] + row[region_index + 1:])
+  return copy
+
+
+def build_view(table):
+  view = table.filter(lambda row: row[0] == 'Region 1')
+  view = view.sort(['Units'], reverse=True).slice(0, NUM_SELECTED)
+  return view.project(SELECTED_COLUMNS)
+
+
+def measure(table, build):
+  tracemalloc.start()
+  start = time.time()
+  selected = build(table)
+  build_time = time.time() - start
+  (memory, _) = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+
+  workbook = xls.MockWorkbook(compact=True)
+  sheet = workbook.add_worksheet('Sheet')
+  start = time.time()
+  TableLayout(TableStyle(workbook, selected), selected).draw(sheet, (0, 0))
+  return (memory, build_time, time.time() - start)
+
+
+def main():
+  table = build_table()
+  print('%d of %d rows' % (NUM_SELECTED, NUM_ROWS))
+  print('%-6s %10s %10s %10s' % ('', 'Kept MB', 'Build s', 'Draw s'))
+  for (name, build) in [('Copy', build_copy), ('View', build_view)]:
+    (memory, build_time, draw_time) = measure(table, build)
+    print('%-6s %10.1f %10.3f %10.3f' % (name, memory / 1e6, build_time,
+                                         draw_time))
+
+
+if __name__ == '__main__':
+  main()
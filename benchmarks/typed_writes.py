@@ -0,0 +1,80 @@
+"""Benchmark for writing tables with declared cell types.
+
+Draws a table with 1M cells of numbers, strings, dates and booleans on a
+XlsxWriter sheet, without cell types, so XlsxWriter finds out the type of
+each value, and with cell types, so each column is written with the method of
+its type.
+"""
+
+__author__ = 'jt@javiertordable.com'
+__copyright__ = "Copyright (C) 2014 Javier Tordable"
+
+
+import datetime
+import os
+import shutil
+import tempfile
+import time
+
+from layout import TableLayout
+from style import TableStyle
+from table import Table
+import xls
+
+
+NUM_ROWS = 100000
+# The types of the columns, which are repeated to fill a row.
+COLUMN_TYPES = [xls.NUMBER, xls.STRING, xls.DATE, xls.NUMBER, xls.BOOLEAN]
+NUM_COLUMNS = 10
+
+
+def build_table(cell_types):
+  column_types = [COLUMN_TYPES[i % len(COLUMN_TYPES)]
+                  for i in range(NUM_COLUMNS)]
+  table = Table('Table', ['Col%d' % i for i in range(NUM_COLUMNS)],
+                column_types if cell_types else None)
+  first_date = datetime.date(2014, 1, 1)
+  values = {
+      xls.NUMBER: lambda row_index: row_index * 1.5,
+      xls.STRING: lambda row_index: 'Item %d' % (row_index % 1000),
+      xls.DATE: lambda row_index: first_date + datetime.timedelta(
+          days=row_index % 365),
+      xls.BOOLEAN: lambda row_index: row_index % 2 == 0,
+  }
+  for row_index in range(NUM_ROWS):
+    table.add_row([values[column_type](row_index)
+                   for column_type in column_types])
+  return table
+
+
+def measure(filename, table):
+  workbook = xls.new_workbook(filename)
+  layout = TableLayout(TableStyle(workbook, table), table)
+  sheet = workbook.add_worksheet('Sheet')
+  start = time.time()
+  layout.draw(sheet, (0, 0))
+  elapsed = time.time() - start
+  workbook.close()
+  return elapsed
+
+
+def main():
+  untyped_table = build_table(False)
+  typed_table = build_table(True)
+
+  directory = tempfile.mkdtemp()
+  try:
+    filename = os.path.join(directory, 'bench.xlsx')
+    untyped = measure(filename, untyped_table)
+    typed = measure(filename, typed_table)
+  finally:
+    shutil.rmtree(directory)
+
+  num_cells = NUM_COLUMNS * (NUM_ROWS + 1)
+  print('Cells:       %d' % num_cells)
+  print('Untyped:     %6.3f s (%9.0f cells/s)' % (untyped, num_cells / untyped))
+  print('Typed:       %6.3f s (%9.0f cells/s)' % (typed, num_cells / typed))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,215 @@
+"""Optional instrumentation to find where the time goes when drawing reports.
+
+A Profiler wraps a workbook, its sheets, and the layouts and styles of a tree
+while it's drawn, and records the number of calls and the time spent in each
+of them. The results can be exported as a JSON report, or as collapsed stacks
+which can be turned into a flame graph.
+
+A disabled profiler returns the workbook unchanged and draws the layouts
+directly, so it can be left in production code at almost no cost:
+
+  profiler = instrument.Profiler(enabled=options.profile)
+  workbook = profiler.wrap_workbook(xls.new_workbook(filename))
+  sheet = workbook.add_worksheet('Report')
+  profiler.draw(layout, sheet, (0, 0))
+  workbook.close()
+  profiler.write_collapsed_stacks(output_file)
+"""
+
+__author__ = 'jt@javiertordable.com'
+__copyright__ = "Copyright (C) 2014 Javier Tordable"
+
+
+import json
+import time
+
+import render
+
+
+# The most precise clock available.
+_timer = getattr(time, 'perf_counter', time.time)
+
+# The methods of the styles which are recorded.
+_STYLE_METHODS = ['get_cell_content', 'get_cell_format', 'get_cell_contents',
+                  'get_cell_formats']
+
+
+class Profiler(object):
+  """Records the calls and time spent in the workbook, sheets and layouts."""
+
+  def __init__(self, enabled=True):
+    self.enabled = enabled
+    # Statistics for each stack of frames, as [count, total time, self time].
+    self._stacks = {}
+    self._stack = []
+    self._child_times = []
+
+  def wrap_workbook(self, workbook):
+    """Returns a workbook which records the calls to it and its sheets."""
+    if not self.enabled:
+      return workbook
+    return _InstrumentedWorkbook(self, workbook)
+
+  def draw(self, layout, output_sheet, start_position, draw_function=None):
+    """Draws a layout, recording the time spent in each layout and style.
+
+    By default the layout is drawn with its draw method, but any function with
+    the same arguments as render.draw_rows can be given. The renderers which
+    don't call draw only record the time in the styles and the sheet.
+    """
+    if draw_function is None:
+      draw_function = lambda layout, sheet, position: layout.draw(sheet,
+                                                                  position)
+    if not self.enabled:
+      return draw_function(layout, output_sheet, start_position)
+
+    # The methods are replaced in the instances, only while drawing.
+    wrapped = []
+    for (index, (node, _)) in enumerate(render.walk(layout, start_position)):
+      if 'draw' not in vars(node):
+        label = '%s#%d' % (type(node).__name__, index)
+        node.draw = self._timed(label, node.draw)
+        wrapped.append((node, 'draw'))
+
+      style = node.style
+      if style is not None and 'get_cell_content' not in vars(style):
+        style_class = type(style).__name__
+        for method_name in _STYLE_METHODS:
+          setattr(style, method_name, self._timed(
+              style_class + '.' + method_name, getattr(style, method_name)))
+          wrapped.append((style, method_name))
+
+    try:
+      timed_draw = self._timed('draw:%s' % output_sheet.get_name(),
+                               draw_function)
+      return timed_draw(layout, output_sheet, start_position)
+    finally:
+      # Remove the instance attributes, to go back to the class methods.
+      for (instance, method_name) in wrapped:
+        delattr(instance, method_name)
+
+  def _timed(self, frame_name, function):
+    """Returns a function which records its calls under frame_name."""
+    stack = self._stack
+    child_times = self._child_times
+    stacks = self._stacks
+
+    def timed_function(*args, **kwargs):
+      stack.append(frame_name)
+      child_times.append(0.0)
+      start = _timer()
+      try:
+        return function(*args, **kwargs)
+      finally:
+        elapsed = _timer() - start
+        key = tuple(stack)
+        stack.pop()
+        self_time = elapsed - child_times.pop()
+        if child_times:
+          child_times[-1] += elapsed
+        statistics = stacks.get(key)
+        if statistics is None:
+          stacks[key] = [1, elapsed, self_time]
+        else:
+          statistics[0] += 1
+          statistics[1] += elapsed
+          statistics[2] += self_time
+    return timed_function
+
+  def report(self):
+    """Returns a dict with the statistics by frame, layout, style and sheet.
+
+    Each entry has the number of calls, the total time in seconds including
+    the calls inside of it, and the self time without them. Recursive calls
+    count only once in the total time.
+    """
+    frames = {}
+    for (stack, (count, total_time, self_time)) in self._stacks.items():
+      frame_name = stack[-1]
+      statistics = frames.setdefault(frame_name, {
+          'count': 0, 'total_seconds': 0.0, 'self_seconds': 0.0})
+      statistics['count'] += count
+      statistics['self_seconds'] += self_time
+      if frame_name not in stack[:-1]:
+        statistics['total_seconds'] += total_time
+
+    report = {'layouts': {}, 'styles': {}, 'sheets': {}, 'workbook': {},
+              'draws': {}}
+    for (frame_name, statistics) in frames.items():
+      if frame_name.startswith('draw:'):
+        report['draws'][frame_name[len('draw:'):]] = statistics
+      elif frame_name.startswith('Workbook.'):
+        report['workbook'][frame_name[len('Workbook.'):]] = statistics
+      elif frame_name.startswith('Sheet['):
+        (sheet_name, method_name) = frame_name[len('Sheet['):].split('].', 1)
+        report['sheets'].setdefault(sheet_name, {})[method_name] = statistics
+      elif '#' in frame_name:
+        report['layouts'][frame_name] = statistics
+      else:
+        report['styles'][frame_name] = statistics
+    return report
+
+  def to_json(self):
+    """The report, as a JSON string."""
+    return json.dumps(self.report(), indent=2, sort_keys=True)
+
+  def collapsed_stacks(self):
+    """Lines in the collapsed stack format, with the self time in microseconds.
+
+    This is the input format of flamegraph.pl and similar tools.
+    """
+    lines = []
+    for (stack, (_, _, self_time)) in sorted(self._stacks.items()):
+      lines.append('%s %d' % (';'.join(stack), int(self_time * 1e6)))
+    return lines
+
+  def write_collapsed_stacks(self, output_file):
+    """Writes the collapsed stacks to a file object."""
+    for line in self.collapsed_stacks():
+      output_file.write(line + '\n')
+
+
+class _InstrumentedWorkbook(object):
+  """A workbook which records the time spent in its methods."""
+
+  def __init__(self, profiler, workbook):
+    self._profiler = profiler
+    self._workbook = workbook
+
+  def add_worksheet(self, name):
+    add_worksheet = self._profiler._timed('Workbook.add_worksheet',
+                                          self._workbook.add_worksheet)
+    return _InstrumentedSheet(self._profiler, add_worksheet(name))
+
+  def get_worksheet(self, index):
+    return _InstrumentedSheet(self._profiler,
+                              self._workbook.get_worksheet(index))
+
+  def __getattr__(self, name):
+    attribute = getattr(self._workbook, name)
+    if name.startswith('_') or not callable(attribute):
+      return attribute
+    return self._profiler._timed('Workbook.' + name, attribute)
+
+
+class _InstrumentedSheet(object):
+  """A sheet which records the time spent in its methods."""
+
+  def __init__(self, profiler, sheet):
+    self._profiler = profiler
+    self._sheet = sheet
+    self._prefix = 'Sheet[%s].' % sheet.get_name()
+    self._methods = {}
+
+  def get_name(self):
+    return self._sheet.get_name()
+
+  def __getattr__(self, name):
+    attribute = getattr(self._sheet, name)
+    if name.startswith('_') or not callable(attribute):
+      return attribute
+    method = self._methods.get(name)
+    if method is None:
+      method = self._profiler._timed(self._prefix + name, attribute)
+      self._methods[name] = method
+    return method
@@ -0,0 +1,119 @@
+"""Tests for instrument.py"""
+
+__author__ = 'jt@javiertordable.com'
+__copyright__ = "Copyright (C) 2014 Javier Tordable"
+
+
+import instrument
+from layout import ColumnLayout
+from layout import FixedSizeLayout
+from layout import PaddingLayout
+from layout import TableLayout
+import render
+from style import EmptyStyle, FixedStyle, TableStyle
+from table import Table
+from xls import MockWorkbook
+
+import io
+import json
+import unittest
+
+
+class ProfilerTest(unittest.TestCase):
+  """Tests for Profiler."""
+
+  def setUp(self):
+    self.workbook = MockWorkbook()
+    self.table = Table('Table', ['Col1', 'Col2'])
+    self.table.add_row(['a', 1])
+    self.table.add_row(['b', 2])
+
+  def build_layout(self, workbook):
+    return PaddingLayout(FixedStyle(workbook, None, '#0000FF'), ColumnLayout(
+        EmptyStyle(workbook), [
+            FixedSizeLayout(FixedStyle(workbook, 'Title', '#00FF00'), 2, 1),
+            TableLayout(TableStyle(workbook, self.table), self.table)]),
+        1, 1, 1, 1)
+
+  def test_disabled(self):
+    profiler = instrument.Profiler(enabled=False)
+    self.assertIs(self.workbook, profiler.wrap_workbook(self.workbook))
+
+    sheet = self.workbook.add_worksheet('Sheet')
+    layout = self.build_layout(self.workbook)
+    profiler.draw(layout, sheet, (0, 0))
+    self.assertEqual('Title', sheet.cell_contents[(1, 1)])
+    self.assertEqual({'layouts': {}, 'styles': {}, 'sheets': {},
+                      'workbook': {}, 'draws': {}}, profiler.report())
+    self.assertEqual([], profiler.collapsed_stacks())
+
+  def test_report(self):
+    profiler = instrument.Profiler()
+    workbook = profiler.wrap_workbook(self.workbook)
+    sheet = workbook.add_worksheet('Sheet')
+    layout = self.build_layout(workbook)
+    profiler.draw(layout, sheet, (0, 0))
+    workbook.close()
+
+    # The sheet has the same cells as without the profiler.
+    expected_sheet = MockWorkbook().add_worksheet('Sheet')
+    self.build_layout(MockWorkbook()).draw(expected_sheet, (0, 0))
+    self.assertEqual(expected_sheet.cell_contents,
+                     self.workbook.sheets[0].cell_contents)
+
+    report = profiler.report()
+    self.assertEqual(['ColumnLayout#1', 'FixedSizeLayout#2', 'PaddingLayout#0',
+                      'TableLayout#3'], sorted(report['layouts']))
+    for statistics in report['layouts'].values():
+      self.assertEqual(1, statistics['count'])
+    padding = report['layouts']['PaddingLayout#0']
+    self.assertLessEqual(padding['self_seconds'], padding['total_seconds'])
+
+    # Each style is asked for the block of cells of each of its layouts. The
+    # padding, column and title layouts are filled at once, and the table is
+    # written one row at a time.
+    styles = report['styles']
+    self.assertEqual(2, styles['FixedStyle.get_cell_contents']['count'])
+    self.assertEqual(1, styles['EmptyStyle.get_cell_contents']['count'])
+    self.assertEqual(1, styles['TableStyle.get_cell_contents']['count'])
+    sheet_report = report['sheets']['Sheet']
+    self.assertEqual(3, sheet_report['fill_range']['count'])
+    self.assertEqual(3, sheet_report['write_row']['count'])
+    self.assertEqual(1, report['workbook']['close']['count'])
+    self.assertEqual(1, report['draws']['Sheet']['count'])
+    json.loads(profiler.to_json())
+
+    # The methods of the layouts and styles are restored after drawing.
+    self.assertNotIn('draw', vars(layout))
+    self.assertNotIn('get_cell_content', vars(layout.style))
+
+  def test_collapsed_stacks(self):
+    profiler = instrument.Profiler()
+    workbook = profiler.wrap_workbook(self.workbook)
+    sheet = workbook.add_worksheet('Sheet')
+    profiler.draw(TableLayout(TableStyle(workbook, self.table), self.table),
+                  sheet, (0, 0))
+
+    output_file = io.StringIO()
+    profiler.write_collapsed_stacks(output_file)
+    stacks = [line.rsplit(' ', 1)[0]
+              for line in output_file.getvalue().splitlines()]
+    self.assertIn('draw:Sheet;TableLayout#0', stacks)
+    self.assertIn('draw:Sheet;TableLayout#0;TableStyle.get_cell_contents',
+                  stacks)
+    self.assertIn('draw:Sheet;TableLayout#0;Sheet[Sheet].write_row', stacks)
+
+  def test_draw_function(self):
+    profiler = instrument.Profiler()
+    sheet = self.workbook.add_worksheet('Sheet')
+    profiler.draw(self.build_layout(self.workbook), sheet, (0, 0),
+                  render.draw_rows)
+    report = profiler.report()
+    # The layouts aren't drawn one by one, but the styles are still called.
+    self.assertEqual({}, report['layouts'])
+    styles = report['styles']
+    self.assertEqual(1, styles['TableStyle.get_cell_contents']['count'])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -9,10 +9,16 @@ __copyright__ = "Copyright (C) 2014 Javier Tordable"
 
 
 from style import TableStyle
+from style import Uniform
+from style import block_row
 
 
 MAX_EXCEL_COLUMN = 16383
 
+# The maximum number of rows of cells asked to a style at once. It limits the
+# memory used to draw the tables.
+MAX_BLOCK_ROWS = 1000
+
 
 class Layout(object):
   """A layout is a container for a group of report tables and other layouts.
@@ -33,19 +39,184 @@ class Layout(object):
     """A list with the child layouts of this layout."""
     return self.children
 
+  # The parent layout, if this layout is a child of another one.
+  _parent = None
+
+  # Cached results of size and compute_positions, cleared by invalidate.
+  _cached_size = None
+  _layout_pass = None
+  _position = None
+  _positioned_in = None
+
   def size(self):
-    """The size of the layout, in cells, given as (width, height)"""
+    """The size of the layout, in cells, given as (width, height)
+
+    The size is computed once and cached until the layout is invalidated.
+    """
+    if self._cached_size is None:
+      self._cached_size = self.compute_size()
+    return self._cached_size
+
+  def compute_size(self):
+    """Computes the size of the layout, without using the cached value."""
     return None
 
+  def invalidate(self):
+    """Discards the cached size and positions of this layout and its parents.
+
+    This is called automatically when a table used by the layout changes or
+    a child layout is added. Call it after changing a layout in any other way.
+    """
+    layout = self
+    while layout is not None:
+      layout._cached_size = None
+      layout._layout_pass = None
+      layout = layout._parent
+
+  def compute_positions(self, start_position):
+    """Computes the size and absolute position of all layouts in the tree.
+
+    The results are cached in each layout, and can be retrieved with size and
+    position, until the tree or one of its tables changes.
+    """
+    layout_pass = object()
+    self._layout_pass = layout_pass
+    pending = [(self, start_position)]
+    while pending:
+      (layout, position) = pending.pop()
+      layout._position = position
+      layout._positioned_in = (self, layout_pass)
+      pending.extend(layout.child_positions(position))
+
+  def position(self):
+    """The absolute position of the layout, given as (column, row)
+
+    Returns None if compute_positions has not been called on this layout or
+    one of its ancestors, or if the tree has changed since then.
+    """
+    if self._positioned_in is None:
+      return None
+    (top_layout, layout_pass) = self._positioned_in
+    if top_layout._layout_pass is not layout_pass:
+      return None
+    return self._position
+
+  def _set_children(self, child_layouts):
+    self.children = child_layouts
+    for child_layout in child_layouts:
+      child_layout._parent = self
+
+  def _add_child(self, child_layout):
+    if child_layout is None or not isinstance(child_layout, Layout):
+      raise ValueError('Please pass a valid child layout')
+    self.children.append(child_layout)
+    child_layout._parent = self
+    self.invalidate()
+
+  def child_positions(self, start_position):
+    """A list of (child_layout, start_position) pairs, in drawing order."""
+    return []
+
+  def draw_sheet_properties(self, output_sheet, start_position):
+    """Apply the sheet-wide properties of this layout, but not its children."""
+    pass
+
   def draw(self, output_sheet, start_position):
-    """Draw the layout on the output_table, starting at start_position."""
+    """Draw the layout on the output_table, starting at start_position.
+
+    The style of the layout is applied to all the cells first, and then the
+    child layouts are drawn on top. The contents and formats of the cells are
+    asked to the style in blocks of rows, and the blocks where all the cells
+    are the same are written with a single fill_range.
+    """
+    self.draw_sheet_properties(output_sheet, start_position)
+
     (start_column, start_row) = start_position
     (width, height) = self.size()
+    (style, column_offset, row_offset) = self.cell_owner(start_position)
+    for first_row in range(start_row, start_row + height, MAX_BLOCK_ROWS):
+      num_rows = min(MAX_BLOCK_ROWS, start_row + height - first_row)
+      (style_column, style_row) = (start_column - column_offset,
+                                   first_row - row_offset)
+      cell_values = style.get_cell_contents(style_column, style_row, width,
+                                            num_rows)
+      cell_formats = style.get_cell_formats(style_column, style_row, width,
+                                            num_rows)
+      if isinstance(cell_values, Uniform) and isinstance(cell_formats, Uniform):
+        output_sheet.fill_range(first_row, start_column,
+                                first_row + num_rows - 1,
+                                start_column + width - 1, cell_values.value,
+                                cell_formats.value)
+        continue
+      for row_index in range(num_rows):
+        _write_row(output_sheet, first_row + row_index, start_column,
+                   block_row(cell_values, row_index, width),
+                   _row_formats(cell_formats, row_index),
+                   style.get_cell_types(style_column, style_row + row_index,
+                                        width))
+
+    for (child_layout, child_position) in self.child_positions(start_position):
+      child_layout.draw(output_sheet, child_position)
+
+  def cell_owner(self, start_position):
+    """The style which gives the content and format of the layout cells.
+
+    Returns a tuple (style, column_offset, row_offset). The content and format
+    of the cell in a given row and column are given by the style at the
+    position (column - column_offset, row - row_offset).
+    """
+    return (self.style, 0, 0)
+
+  def resolve_cells(self, cell_owners, start_position):
+    """Resolve which style finally owns each cell, without drawing anything.
+
+    Stores in cell_owners, keyed by (row, column), the cell_owner of the
+    layout that draw would use last for that cell.
+
+    Returns the number of cell writes that draw would make.
+    """
+    (start_column, start_row) = start_position
+    (width, height) = self.size()
+    owner = self.cell_owner(start_position)
     for row in range(start_row, start_row + height):
       for column in range(start_column, start_column + width):
-        cell_value = self.style.get_cell_content(column, row)
-        cell_format = self.style.get_cell_format(column, row)
-        output_sheet.write(row, column, cell_value, cell_format)
+        cell_owners[(row, column)] = owner
+    num_writes = width * height
+
+    for (child_layout, child_position) in self.child_positions(start_position):
+      num_writes += child_layout.resolve_cells(cell_owners, child_position)
+    return num_writes
+
+
+def _row_formats(cell_formats, row_index):
+  """The formats of a row in a block, as a list or a Uniform."""
+  if isinstance(cell_formats, Uniform):
+    return cell_formats
+  return cell_formats[row_index]
+
+
+def _write_row(output_sheet, row, start_column, cell_values, cell_formats,
+               cell_types=None):
+  """Writes a row of cells, all at once if they have the same format.
+
+  The formats are given as a list, or as a Uniform. The cell types, if known,
+  are given to write_row.
+  """
+  if isinstance(cell_formats, Uniform):
+    row_format = cell_formats.value
+  elif cell_formats.count(cell_formats[0]) == len(cell_formats):
+    row_format = cell_formats[0]
+  else:
+    for (index, cell_value) in enumerate(cell_values):
+      output_sheet.write(row, start_column + index, cell_value,
+                         cell_formats[index])
+    return
+
+  if cell_types is None:
+    output_sheet.write_row(row, start_column, cell_values, row_format)
+  else:
+    output_sheet.write_row(row, start_column, cell_values, row_format,
+                           cell_types=cell_types)
 
 
 class FixedSizeLayout(Layout):
@@ -61,7 +232,7 @@ class FixedSizeLayout(Layout):
     self.width = width
     self.height = height
 
-  def size(self):
+  def compute_size(self):
     return (self.width, self.height)
 
 
@@ -76,24 +247,23 @@ class TableLayout(Layout):
 
     self.style = style
     self.table = table
+    table.add_observer(self)
 
-  def size(self):
+  def compute_size(self):
     return (self.table.num_columns,
             self.table.num_rows + 1) # Add one row for the header.
 
-  def draw(self, output_sheet, start_position):
-    (start_column, start_row) = start_position
-    (width, height) = self.size()
+  def draw_sheet_properties(self, output_sheet, start_position):
+    # The conditional formats of the style cover the rows of the table.
+    for (first_row, first_column, last_row, last_column,
+         options) in self.style.get_conditional_formats(start_position):
+      output_sheet.conditional_format(first_row, first_column, last_row,
+                                      last_column, options)
 
-    for output_row in range(start_row, start_row + height):
-      data_row_index = output_row - start_row
-      for output_column in range(start_column, start_column + width):
-        data_column_index = output_column - start_column
-        cell_value = self.style.get_cell_content(data_column_index,
-                                                 data_row_index)
-        cell_format = self.style.get_cell_format(data_column_index,
-                                                 data_row_index)
-        output_sheet.write(output_row, output_column, cell_value, cell_format)
+  def cell_owner(self, start_position):
+    # The table style is indexed relative to the top left cell of the table.
+    (start_column, start_row) = start_position
+    return (self.style, start_column, start_row)
 
 
 class PaddingLayout(Layout):
@@ -117,21 +287,18 @@ class PaddingLayout(Layout):
     self.right = right
     self.bottom = bottom
     self.left = left
-    self.children = [child_layout]
+    self._set_children([child_layout])
 
-  def size(self):
+  def compute_size(self):
     (child_width, child_height) = self.children[0].size()
     return (child_width + self.left + self.right,
             child_height + self.top + self.bottom)
 
-  def draw(self, output_sheet, start_position):
-    # First apply the style of the PaddingLayout.
-    super(PaddingLayout, self).draw(output_sheet, start_position)
-
-    # Now draw the child in the correct position, inside of the padding.
+  def child_positions(self, start_position):
+    # The child is in the correct position, inside of the padding.
     (start_column, start_row) = start_position
     (start_column, start_row) = (start_column + self.left, start_row + self.top)
-    self.children[0].draw(output_sheet, (start_column, start_row))
+    return [(self.children[0], (start_column, start_row))]
 
 
 class RowLayout(Layout):
@@ -145,9 +312,13 @@ class RowLayout(Layout):
       raise ValueError('Please pass a non-empty list of layouts')
 
     self.style = style
-    self.children = row_layouts
+    self._set_children(row_layouts)
 
-  def size(self):
+  def add_child(self, child_layout):
+    """Adds a layout at the end of the row."""
+    self._add_child(child_layout)
+
+  def compute_size(self):
     total_width = 0
     max_height = 0
     for layout in self.children:
@@ -156,18 +327,17 @@ class RowLayout(Layout):
       max_height = max(max_height, height)
     return (total_width, max_height)
 
-  def draw(self, output_sheet, start_position):
-    # First apply the style of the RowLayout.
-    super(RowLayout, self).draw(output_sheet, start_position)
-
-    # Draw all layouts, one at a time, from left to right.
+  def child_positions(self, start_position):
+    # All layouts are placed one at a time, from left to right.
     (start_column, start_row) = start_position
+    positions = []
     for child_layout in self.children:
-      child_layout.draw(output_sheet, (start_column, start_row))
+      positions.append((child_layout, (start_column, start_row)))
 
       # Move the start position for the next layout, but only horizontally.
       (added_width, added_height) = child_layout.size()
       (start_column, start_row) = (start_column + added_width, start_row)
+    return positions
 
 
 class ColumnLayout(Layout):
@@ -181,9 +351,13 @@ class ColumnLayout(Layout):
       raise ValueError('Please pass a non-empty list of layouts')
 
     self.style = style
-    self.children = column_layouts
+    self._set_children(column_layouts)
 
-  def size(self):
+  def add_child(self, child_layout):
+    """Adds a layout at the bottom of the column."""
+    self._add_child(child_layout)
+
+  def compute_size(self):
     max_width = 0
     total_height = 0
     for layout in self.children:
@@ -192,18 +366,17 @@ class ColumnLayout(Layout):
       total_height += height
     return (max_width, total_height)
 
-  def draw(self, output_sheet, start_position):
-    # First apply the style of the ColumnLayout.
-    super(ColumnLayout, self).draw(output_sheet, start_position)
-
-    # Draw all layouts, one at a time, from top to bottom.
+  def child_positions(self, start_position):
+    # All layouts are placed one at a time, from top to bottom.
     (start_column, start_row) = start_position
+    positions = []
     for child_layout in self.children:
-      child_layout.draw(output_sheet, (start_column, start_row))
+      positions.append((child_layout, (start_column, start_row)))
 
       # Move the start position for the next layout, but only vertically.
       (added_width, added_height) = child_layout.size()
       (start_column, start_row) = (start_column, start_row + added_height)
+    return positions
 
 
 class HideOutsideLayout(Layout):
@@ -220,15 +393,18 @@ class HideOutsideLayout(Layout):
       raise ValueError('Please pass a valid child layout')
 
     self.style = style
-    self.children = [child_layout]
+    self._set_children([child_layout])
 
-  def size(self):
+  def compute_size(self):
     return self.children[0].size()
 
-  def draw(self, output_sheet, start_position):
+  def child_positions(self, start_position):
+    return [(self.children[0], start_position)]
+
+  def draw_sheet_properties(self, output_sheet, start_position):
     # The start position has to be (0, 0)
     (start_column, start_row) = start_position
-    if start_column is not 0 or start_row is not 0:
+    if start_column != 0 or start_row != 0:
       raise ValueError('The start position for this layout must be (0, 0)')
 
     # Hide all rows without data (below the layout).
@@ -238,6 +414,101 @@ class HideOutsideLayout(Layout):
     output_sheet.set_column(first_col=self.size()[0], last_col=MAX_EXCEL_COLUMN,
                             width=None, format=None, options={'hidden': True})
 
-    # Apply the style of the HideOutsideLayout and then draw the child.
-    super(HideOutsideLayout, self).draw(output_sheet, start_position)
-    self.children[0].draw(output_sheet, start_position)
+
+# The size in pixels of the cells with the default width and height, used to
+# size the charts.
+_DEFAULT_COLUMN_PIXELS = 64
+_DEFAULT_ROW_PIXELS = 20
+
+
+class ChartLayout(FixedSizeLayout):
+  """A layout with a chart of the data of a TableLayout in the same tree.
+
+  The chart covers a fixed number of cells, which get the content and format
+  of the style below it. The series of the chart refer to the cells of the
+  table where it's drawn, so the data is not copied. The chart is only added
+  if the table has rows.
+  """
+
+  def __init__(self, style, workbook, table_layout, category_column,
+               value_columns, width, height, chart_options=None, title=None):
+    """Builds a ChartLayout.
+
+    @param category_column: The name of the column of the table with the
+    categories of the chart, or None.
+    @param value_columns: The names of the columns with the values of each
+    series of the chart. The headers of the columns name the series.
+    @param chart_options: The options of Workbook.add_chart. By default it's a
+    column chart.
+    """
+    super(ChartLayout, self).__init__(style, width, height)
+    if table_layout is None or not isinstance(table_layout, TableLayout):
+      raise ValueError('Please give the TableLayout with the chart data')
+    if not value_columns:
+      raise ValueError('Please give the columns with the chart values')
+    for column_name in list(value_columns) + [category_column]:
+      if column_name is not None:
+        # Raises a ValueError if the table doesn't have the column.
+        table_layout.table.column_index(column_name)
+
+    self.workbook = workbook
+    self.table_layout = table_layout
+    self.category_column = category_column
+    self.value_columns = list(value_columns)
+    self.chart_options = dict(chart_options or {'type': 'column'})
+    self.title = title
+
+  def draw_sheet_properties(self, output_sheet, start_position):
+    table = self.table_layout.table
+    if table.num_rows == 0:
+      return
+    (table_column, table_row) = self._table_position(start_position)
+    (first_row, last_row) = (table_row + 1, table_row + table.num_rows)
+    sheet_name = output_sheet.get_name()
+
+    chart = self.workbook.add_chart(self.chart_options)
+    for column_name in self.value_columns:
+      column = table_column + table.column_index(column_name)
+      series = {'name': [sheet_name, table_row, column],
+                'values': [sheet_name, first_row, column, last_row, column]}
+      if self.category_column is not None:
+        category_column = table_column + table.column_index(
+            self.category_column)
+        series['categories'] = [sheet_name, first_row, category_column,
+                                last_row, category_column]
+      chart.add_series(series)
+    if self.title is not None:
+      chart.set_title({'name': self.title})
+    chart.set_size({'width': self.width * _DEFAULT_COLUMN_PIXELS,
+                    'height': self.height * _DEFAULT_ROW_PIXELS})
+    (start_column, start_row) = start_position
+    output_sheet.insert_chart(start_row, start_column, chart)
+
+  def _table_position(self, start_position):
+    """The position of the table layout, when this layout is at a position.
+
+    The positions given by compute_positions are used if they are current.
+    Otherwise the tree is walked from its root, found with the parents.
+    """
+    table_position = self.table_layout.position()
+    if table_position is not None and self.position() == start_position and \
+          self.table_layout._positioned_in == self._positioned_in:
+      return table_position
+
+    root = self
+    while root._parent is not None:
+      root = root._parent
+    positions = {}
+    pending = [(root, (0, 0))]
+    while pending:
+      (layout, position) = pending.pop()
+      positions[id(layout)] = position
+      pending.extend(layout.child_positions(position))
+    if id(self.table_layout) not in positions:
+      raise ValueError('The table of the chart is not in the same layout tree')
+    # The offset between both layouts is the same from any start position.
+    (column, row) = positions[id(self)]
+    (table_column, table_row) = positions[id(self.table_layout)]
+    (start_column, start_row) = start_position
+    return (start_column + table_column - column,
+            start_row + table_row - row)
@@ -4,14 +4,16 @@ __author__ = 'jt@javiertordable.com'
 __copyright__ = "Copyright (C) 2014 Javier Tordable"
 
 
+from layout import ChartLayout
 from layout import ColumnLayout
 from layout import FixedSizeLayout
 from layout import HideOutsideLayout
 from layout import PaddingLayout
 from layout import TableLayout
 from layout import RowLayout
-from style import FixedStyle, TableStyle
-from table import Table
+import render
+from style import BandedRows, DataBar, FixedStyle, TableStyle
+from table import StreamingTable, Table
 from xls import MockSheet
 from xls import MockWorkbook
 
@@ -22,6 +24,38 @@ GREEN = '#00FF00'
 BLUE = '#0000FF'
 
 
+class RowCountingSheet(MockSheet):
+  """A sheet which counts the calls to write and write_row."""
+
+  def __init__(self, name):
+    super(RowCountingSheet, self).__init__(name)
+    self.num_writes = 0
+    self.num_row_writes = 0
+
+  def write(self, row, column, value, format=None):
+    self.num_writes += 1
+    super(RowCountingSheet, self).write(row, column, value, format)
+
+  def write_row(self, row, column, values, format=None):
+    self.num_row_writes += 1
+    for (index, value) in enumerate(values):
+      super(RowCountingSheet, self).write(row, column + index, value, format)
+
+
+class BlockCountingStyle(FixedStyle):
+  """A style which records the blocks of cells it's asked for."""
+
+  def __init__(self, workbook, content, background_color):
+    super(BlockCountingStyle, self).__init__(workbook, content,
+                                             background_color)
+    self.blocks = []
+
+  def get_cell_contents(self, first_column, first_row, width, height):
+    self.blocks.append((first_column, first_row, width, height))
+    return super(BlockCountingStyle, self).get_cell_contents(
+        first_column, first_row, width, height)
+
+
 class FixedSizeLayoutTest(unittest.TestCase):
   """Tests for FixedSizeLayout."""
 
@@ -57,6 +91,15 @@ class FixedSizeLayoutTest(unittest.TestCase):
     self.assertIsNone(sheet.read(3, 1))  # Out of boundaries.
     self.assertIsNone(sheet.read(3, 3))
 
+  def test_draw_asks_style_once(self):
+    style = BlockCountingStyle(self.workbook, 'FixedContent', GREEN)
+    sheet = RowCountingSheet('Sheet1')
+    FixedSizeLayout(style, 100, 1000).draw(sheet, (0, 0))
+    self.assertEqual([(0, 0, 100, 1000)], style.blocks)
+    self.assertEqual([(0, 0, 999, 99, 'FixedContent',
+                       style.get_cell_format(0, 0))], sheet.filled_ranges)
+    self.assertEqual('FixedContent', sheet.read(999, 99))
+
 
 class TableLayoutTest(unittest.TestCase):
   """Tests for TableLayout"""
@@ -81,6 +124,19 @@ class TableLayoutTest(unittest.TestCase):
     # The height of the layout includes 1 extra for the headers.
     self.assertEquals((3, 3), layout.size())
 
+  def test_draw_conditional_formats(self):
+    style = TableStyle(self.workbook, self.table, [
+        BandedRows({'bg_color': GREEN}), DataBar('Col2')])
+    sheet = MockSheet('Sheet1')
+    TableLayout(style, self.table).draw(sheet, (1, 2))
+    self.assertEqual([(3, 1, 4, 3), (3, 2, 4, 2)],
+                     [conditional_format[:4]
+                      for conditional_format in sheet.conditional_formats])
+    self.assertEqual('=MOD(ROW()-4,2)=1',
+                     sheet.conditional_formats[0][4]['criteria'])
+    # The cells are still written with the format of the style.
+    self.assertIs(style.get_cell_format(0, 2), sheet.cell_formats[(4, 1)])
+
   def test_draw(self):
     sheet = MockSheet('Sheet1')
     start_position = (0, 0)
@@ -106,6 +162,34 @@ class TableLayoutTest(unittest.TestCase):
     self.assertIsNone(sheet.read(3, 3))
 
 
+  def test_draw_writes_rows(self):
+    sheet = RowCountingSheet('Sheet1')
+    layout = TableLayout(self.style, self.table)
+    layout.draw(sheet, (1, 1))
+
+    # The header and the two rows of data.
+    self.assertEqual(3, sheet.num_row_writes)
+    self.assertEqual(0, sheet.num_writes)
+    self.assertEqual('Col1', sheet.read(1, 1))
+    self.assertEqual('f', sheet.read(3, 3))
+
+
+  def test_draw_streaming_table(self):
+    rows = iter([['a', 'b', 'c'], ['d', 'e', 'f']])
+    table = StreamingTable('Table', ['Col1', 'Col2', 'Col3'], rows, 2)
+    sheet = MockSheet('Sheet1')
+    layout = TableLayout(TableStyle(self.workbook, table), table)
+    self.assertEqual((3, 3), layout.size())
+    layout.draw(sheet, (0, 0))
+
+    self.assertEqual('Col3', sheet.read(0, 2))
+    self.assertEqual('a', sheet.read(1, 0))
+    self.assertEqual('f', sheet.read(2, 2))
+
+    # The rows of the table can only be drawn once.
+    self.assertRaises(ValueError, layout.draw, MockSheet('Sheet2'), (0, 0))
+
+
 class PaddingLayoutTest(unittest.TestCase):
   """Tests for PaddingLayout."""
 
@@ -267,6 +351,65 @@ class ColumnLayoutTest(unittest.TestCase):
     self.assertIsNone(sheet.read(7, 4))
 
 
+class LayoutCacheTest(unittest.TestCase):
+  """Tests for the cached sizes and positions of layouts."""
+
+  def setUp(self):
+    self.table = Table('Table', ['Col1', 'Col2'])
+    self.table.add_row(['a', 'b'])
+
+    self.workbook = MockWorkbook()
+    self.style = FixedStyle(self.workbook, 'Fixed', GREEN)
+    self.table_layout = TableLayout(TableStyle(self.workbook, self.table),
+                                    self.table)
+    self.fixed_layout = FixedSizeLayout(self.style, 3, 1)
+    self.column = ColumnLayout(self.style,
+                               [self.table_layout, self.fixed_layout])
+    self.layout = PaddingLayout(self.style, self.column, 1, 1, 1, 1)
+
+  def test_size_is_cached(self):
+    self.assertEqual((5, 5), self.layout.size())
+    self.fixed_layout.width = 4
+    self.assertEqual((5, 5), self.layout.size())
+    self.fixed_layout.invalidate()
+    self.assertEqual((6, 5), self.layout.size())
+
+  def test_invalidate_on_add_row(self):
+    self.assertEqual((5, 5), self.layout.size())
+    self.table.add_row(['c', 'd'])
+    self.assertEqual((2, 3), self.table_layout.size())
+    self.assertEqual((5, 6), self.layout.size())
+
+  def test_invalidate_on_add_child(self):
+    self.assertEqual((5, 5), self.layout.size())
+    self.column.add_child(FixedSizeLayout(self.style, 1, 2))
+    self.assertEqual((5, 7), self.layout.size())
+    self.assertRaises(ValueError, self.column.add_child, None)
+
+  def test_compute_positions(self):
+    self.assertIsNone(self.fixed_layout.position())
+    self.layout.compute_positions((2, 1))
+    self.assertEqual((2, 1), self.layout.position())
+    self.assertEqual((3, 2), self.column.position())
+    self.assertEqual((3, 2), self.table_layout.position())
+    self.assertEqual((3, 4), self.fixed_layout.position())
+
+  def test_positions_invalidated(self):
+    self.layout.compute_positions((0, 0))
+    self.table.add_row(['c', 'd'])
+    self.assertIsNone(self.layout.position())
+    self.assertIsNone(self.fixed_layout.position())
+    self.layout.compute_positions((0, 0))
+    self.assertEqual((1, 4), self.fixed_layout.position())
+
+  def test_positions_of_subtree(self):
+    self.column.compute_positions((0, 0))
+    self.assertIsNone(self.layout.position())
+    self.assertEqual((0, 2), self.fixed_layout.position())
+    self.layout.compute_positions((0, 0))
+    self.assertEqual((1, 3), self.fixed_layout.position())
+
+
 class HideOutsideLayoutTest(unittest.TestCase):
   """Tests for HideOutsideLayout."""
 
@@ -327,5 +470,101 @@ class HideOutsideLayoutTest(unittest.TestCase):
     self.assertRaises(ValueError, self.layout.draw, sheet, start_position)
 
 
+class ChartLayoutTest(unittest.TestCase):
+  """Tests for ChartLayout."""
+
+  def setUp(self):
+    self.workbook = MockWorkbook()
+    self.style = FixedStyle(self.workbook, None)
+    self.table = Table('Sales', ['Region', 'Units', 'Price'])
+    for row in [['East', 10, 1.5], ['West', 5, 2.0], ['North', 7, 0.5]]:
+      self.table.add_row(row)
+    self.table_layout = TableLayout(TableStyle(self.workbook, self.table),
+                                    self.table)
+    self.chart_layout = ChartLayout(
+        FixedStyle(self.workbook, 'Chart'), self.workbook, self.table_layout,
+        'Region', ['Units', 'Price'], 5, 10, {'type': 'line'}, 'Sales')
+    # The table is below a fixed layout, and the chart to its right.
+    self.layout = RowLayout(self.style, [
+        ColumnLayout(self.style, [FixedSizeLayout(self.style, 1, 2),
+                                  self.table_layout]),
+        self.chart_layout])
+
+  def assertChart(self, sheet):
+    self.assertEqual(1, len(self.workbook.charts))
+    chart = self.workbook.charts[0]
+    self.assertEqual({'type': 'line'}, chart.options)
+    self.assertEqual({'name': 'Sales'}, chart.title)
+    self.assertEqual({'width': 320, 'height': 200}, chart.size)
+    self.assertEqual([{'name': ['Sheet1', 3, 2],
+                       'values': ['Sheet1', 4, 2, 6, 2],
+                       'categories': ['Sheet1', 4, 1, 6, 1]},
+                      {'name': ['Sheet1', 3, 3],
+                       'values': ['Sheet1', 4, 3, 6, 3],
+                       'categories': ['Sheet1', 4, 1, 6, 1]}], chart.series)
+    self.assertEqual([(1, 4, chart, None)], sheet.charts)
+
+  def test_size(self):
+    self.assertEqual((5, 10), self.chart_layout.size())
+    self.assertEqual((8, 10), self.layout.size())
+
+  def test_draw(self):
+    sheet = MockSheet('Sheet1')
+    self.layout.draw(sheet, (1, 1))
+    self.assertChart(sheet)
+    # The cells below the chart have the content of its style.
+    self.assertEqual('Chart', sheet.read(1, 4))
+    self.assertEqual('Chart', sheet.read(10, 8))
+    self.assertEqual('East', sheet.read(4, 1))
+
+  def test_draw_rows(self):
+    # The positions computed by the render plan are used.
+    sheet = MockSheet('Sheet1', constant_memory=True)
+    render.draw_rows(self.layout, sheet, (1, 1))
+    self.assertChart(sheet)
+
+  def test_chart_before_table(self):
+    chart_layout = ChartLayout(self.style, self.workbook, self.table_layout,
+                               None, ['Units'], 4, 4)
+    layout = PaddingLayout(self.style,
+                           RowLayout(self.style,
+                                     [chart_layout, self.table_layout]),
+                           1, 0, 0, 0)
+    sheet = MockSheet('Sheet1')
+    layout.draw(sheet, (0, 0))
+    chart = self.workbook.charts[0]
+    self.assertEqual({'type': 'column'}, chart.options)
+    self.assertIsNone(chart.title)
+    self.assertEqual([{'name': ['Sheet1', 1, 5],
+                       'values': ['Sheet1', 2, 5, 4, 5]}], chart.series)
+    self.assertEqual([(1, 0, chart, None)], sheet.charts)
+
+  def test_empty_table(self):
+    table = Table('Empty', ['Units'])
+    table_layout = TableLayout(TableStyle(self.workbook, table), table)
+    chart_layout = ChartLayout(self.style, self.workbook, table_layout, None,
+                               ['Units'], 2, 2)
+    sheet = MockSheet('Sheet1')
+    RowLayout(self.style, [table_layout, chart_layout]).draw(sheet, (0, 0))
+    self.assertEqual([], self.workbook.charts)
+    self.assertEqual([], sheet.charts)
+
+  def test_invalid(self):
+    self.assertRaises(ValueError, ChartLayout, self.style, self.workbook, None,
+                      None, ['Units'], 2, 2)
+    self.assertRaises(ValueError, ChartLayout, self.style, self.workbook,
+                      self.table_layout, None, [], 2, 2)
+    self.assertRaises(ValueError, ChartLayout, self.style, self.workbook,
+                      self.table_layout, 'Invalid', ['Units'], 2, 2)
+    self.assertRaises(ValueError, ChartLayout, self.style, self.workbook,
+                      self.table_layout, None, ['Invalid'], 2, 2)
+
+  def test_table_outside_tree(self):
+    chart_layout = ChartLayout(self.style, self.workbook, self.table_layout,
+                               None, ['Units'], 2, 2)
+    self.assertRaises(ValueError, chart_layout.draw, MockSheet('Sheet1'),
+                      (0, 0))
+
+
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,197 @@
+"""Generation of reports in parallel, with a pool of worker processes.
+
+The layouts of the sheets are built and drawn in the worker processes, on a
+sheet which records the operations, and the operations are replayed on the
+real workbook in the parent process. Whole workbooks can also be generated in
+parallel, one in each worker.
+
+A sheet is given by a tuple (sheet_name, layout_factory), or (sheet_name,
+layout_factory, start_position) to draw the layout in a position other than
+(0, 0). The layout factory is called with a workbook, to create the styles,
+and returns the layout of the sheet. As it's sent to the worker processes it
+must be a function defined at the top level of a module.
+"""
+
+__author__ = 'jt@javiertordable.com'
+__copyright__ = "Copyright (C) 2014 Javier Tordable"
+
+
+import multiprocessing
+
+import render
+import xls
+
+
+def render_sheets(workbook, sheet_specs, processes=None):
+  """Draws the sheets in worker processes and adds them to the workbook.
+
+  The sheets are added in the same order as the specs. By default there is a
+  worker process per CPU.
+  """
+  pool = multiprocessing.Pool(processes)
+  try:
+    for (sheet_name, operations) in pool.imap(_record_sheet, sheet_specs):
+      _replay(workbook, workbook.add_worksheet(sheet_name), operations)
+  finally:
+    pool.close()
+    pool.join()
+
+
+def render_workbook(filename, sheet_specs):
+  """Generates a workbook with the given sheets, in the current process."""
+  workbook = xls.new_workbook(filename)
+  for sheet_spec in sheet_specs:
+    (sheet_name, layout_factory, start_position) = _parse_spec(sheet_spec)
+    sheet = workbook.add_worksheet(sheet_name)
+    _draw(layout_factory(workbook), sheet, start_position)
+  workbook.close()
+  return filename
+
+
+def render_workbooks(workbook_specs, processes=None):
+  """Generates whole workbooks in worker processes.
+
+  Each workbook spec is a tuple (filename, sheet_specs), and each workbook is
+  generated by a single worker. Returns the list of filenames.
+  """
+  pool = multiprocessing.Pool(processes)
+  try:
+    return pool.map(_render_workbook_spec, workbook_specs)
+  finally:
+    pool.close()
+    pool.join()
+
+
+def _render_workbook_spec(workbook_spec):
+  (filename, sheet_specs) = workbook_spec
+  return render_workbook(filename, sheet_specs)
+
+
+def _parse_spec(sheet_spec):
+  if len(sheet_spec) == 2:
+    (sheet_name, layout_factory) = sheet_spec
+    return (sheet_name, layout_factory, (0, 0))
+  return sheet_spec
+
+
+def _draw(layout, sheet, start_position):
+  """Draws the layout writing each cell once, if possible."""
+  try:
+    render.check_resolvable(layout)
+  except ValueError:
+    layout.draw(sheet, start_position)
+  else:
+    render.draw_rows(layout, sheet, start_position)
+
+
+def _record_sheet(sheet_spec):
+  """Draws a sheet on a _RecordingSheet. Runs in the worker processes."""
+  (sheet_name, layout_factory, start_position) = _parse_spec(sheet_spec)
+  sheet = _RecordingSheet(sheet_name)
+  _draw(layout_factory(xls.MockWorkbook()), sheet, start_position)
+  return (sheet_name, sheet.operations)
+
+
+def _replay(workbook, sheet, operations):
+  """Applies the operations recorded by a _RecordingSheet to a sheet."""
+  formats = {}
+  write = sheet.write
+  for (method_name, args, kwargs) in operations:
+    if method_name == 'write':
+      # Cell writes are the most common operation, and their format is the
+      # only argument which may have to be decoded.
+      (row, column, value, format_key) = args
+      if format_key is not None and format_key not in formats:
+        formats[format_key] = workbook.get_format(dict(format_key))
+      write(row, column, value, formats.get(format_key))
+      continue
+    args = [_decode(workbook, formats, arg) for arg in args]
+    kwargs = dict((key, _decode(workbook, formats, value))
+                  for (key, value) in kwargs.items())
+    getattr(sheet, method_name)(*args, **kwargs)
+
+
+class _FormatKey(tuple):
+  """The properties of a format, which replace it in recorded operations."""
+  pass
+
+
+class _ChartSpec(object):
+  """The options of a chart, which replace it in recorded operations.
+
+  The chart is recorded when it's inserted, so it must not be changed after.
+  """
+
+  def __init__(self, chart):
+    self.options = chart.options
+    self.series = [_encode(series) for series in chart.series]
+    self.title = chart.title
+    self.size = chart.size
+
+
+def _encode(value):
+  """Replaces the formats and charts in an argument of a sheet method."""
+  if isinstance(value, xls.Format):
+    return _FormatKey(sorted(value.properties.items()))
+  if isinstance(value, xls.MockChart):
+    return _ChartSpec(value)
+  if isinstance(value, dict):
+    return dict((key, _encode(item)) for (key, item) in value.items())
+  return value
+
+
+def _decode(workbook, formats, value):
+  """Replaces the format keys and chart specs in an argument by formats and
+  charts of the workbook.
+  """
+  if isinstance(value, _FormatKey):
+    if value not in formats:
+      formats[value] = workbook.get_format(dict(value))
+    return formats[value]
+  if isinstance(value, _ChartSpec):
+    chart = workbook.add_chart(value.options)
+    for series in value.series:
+      chart.add_series(_decode(workbook, formats, series))
+    if value.title is not None:
+      chart.set_title(value.title)
+    if value.size is not None:
+      chart.set_size(value.size)
+    return chart
+  if isinstance(value, dict):
+    return dict((key, _decode(workbook, formats, item))
+                for (key, item) in value.items())
+  return value
+
+
+class _RecordingSheet(object):
+  """A sheet which records the calls to its methods, to replay them later.
+
+  The formats in the arguments are recorded by their properties, and the
+  charts by their options, so the operations can be sent to another process.
+  """
+
+  def __init__(self, name):
+    self.name = name
+    self.operations = []
+    self._format_keys = {}
+
+  def get_name(self):
+    return self.name
+
+  def write(self, row, column, value, format=None):
+    format_key = self._format_keys.get(format)
+    if format_key is None and format is not None:
+      format_key = _encode(format)
+      self._format_keys[format] = format_key
+    self.operations.append(('write', (row, column, value, format_key), None))
+
+  def __getattr__(self, method_name):
+    if method_name.startswith('_'):
+      raise AttributeError(method_name)
+
+    def record(*args, **kwargs):
+      encoded_args = tuple(_encode(arg) for arg in args)
+      encoded_kwargs = dict((key, _encode(value))
+                            for (key, value) in kwargs.items())
+      self.operations.append((method_name, encoded_args, encoded_kwargs))
+    return record
@@ -0,0 +1,134 @@
+"""Tests for parallel.py"""
+
+__author__ = 'jt@javiertordable.com'
+__copyright__ = "Copyright (C) 2014 Javier Tordable"
+
+
+from layout import ChartLayout
+from layout import ColumnLayout
+from layout import FixedSizeLayout
+from layout import HideOutsideLayout
+from layout import PaddingLayout
+from layout import RowLayout
+from layout import TableLayout
+import parallel
+from style import EmptyStyle, FixedStyle, TableStyle
+from table import Table
+import xls
+from xls import MockWorkbook
+
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+
+GREEN = '#00FF00'
+BLUE = '#0000FF'
+
+
+def build_table_layout(workbook):
+  table = Table('Table', ['Col1', 'Col2'])
+  table.add_row(['a', 1])
+  table.add_row(['b', 2])
+  return TableLayout(TableStyle(workbook, table), table)
+
+
+def build_hidden_layout(workbook):
+  child_layout = ColumnLayout(EmptyStyle(workbook), [
+      FixedSizeLayout(FixedStyle(workbook, 'Green', GREEN), 3, 2),
+      build_table_layout(workbook)])
+  padding_layout = PaddingLayout(FixedStyle(workbook, 'Blue', BLUE),
+                                 child_layout, 1, 1, 1, 1)
+  return HideOutsideLayout(EmptyStyle(workbook), padding_layout)
+
+
+def build_chart_layout(workbook):
+  table_layout = build_table_layout(workbook)
+  return RowLayout(EmptyStyle(workbook), [
+      table_layout,
+      ChartLayout(EmptyStyle(workbook), workbook, table_layout, 'Col1',
+                  ['Col2'], 4, 6, {'type': 'line'}, 'Chart')])
+
+
+SHEET_SPECS = [('Table', build_table_layout, (1, 1)),
+               ('Hidden', build_hidden_layout)]
+
+
+class RenderSheetsTest(unittest.TestCase):
+  """Tests for render_sheets."""
+
+  def test_same_as_draw(self):
+    expected_workbook = MockWorkbook()
+    expected_sheet = expected_workbook.add_worksheet('Table')
+    build_table_layout(expected_workbook).draw(expected_sheet, (1, 1))
+    expected_sheet = expected_workbook.add_worksheet('Hidden')
+    build_hidden_layout(expected_workbook).draw(expected_sheet, (0, 0))
+
+    workbook = MockWorkbook()
+    parallel.render_sheets(workbook, SHEET_SPECS, processes=2)
+
+    self.assertEqual(2, len(workbook.sheets))
+    for (expected_sheet, sheet) in zip(expected_workbook.sheets,
+                                       workbook.sheets):
+      self.assertEqual(expected_sheet.get_name(), sheet.get_name())
+      self.assertEqual(expected_sheet.cell_contents, sheet.cell_contents)
+      self.assertEqual(expected_sheet.properties, sheet.properties)
+      for (position, expected_format) in expected_sheet.cell_formats.items():
+        self.assertEqual(expected_format.properties,
+                         sheet.cell_formats[position].properties)
+
+    # The formats of all the sheets are shared in the parent workbook.
+    self.assertEqual(3, workbook.format_registry.num_created)
+
+
+  def test_charts(self):
+    workbook = MockWorkbook()
+    parallel.render_sheets(workbook, [('Chart', build_chart_layout)],
+                           processes=1)
+    [chart] = workbook.charts
+    self.assertEqual([(0, 2, chart, None)], workbook.sheets[0].charts)
+    self.assertEqual({'type': 'line'}, chart.options)
+    self.assertEqual([{'name': ['Chart', 0, 1],
+                       'values': ['Chart', 1, 1, 2, 1],
+                       'categories': ['Chart', 1, 0, 2, 0]}], chart.series)
+    self.assertEqual({'name': 'Chart'}, chart.title)
+    self.assertEqual({'width': 256, 'height': 120}, chart.size)
+
+  def test_charts_in_file(self):
+    directory = tempfile.mkdtemp()
+    try:
+      filename = os.path.join(directory, 'chart.xlsx')
+      workbook = xls.new_workbook(filename)
+      parallel.render_sheets(workbook, [('Chart', build_chart_layout)],
+                             processes=1)
+      workbook.close()
+      with zipfile.ZipFile(filename) as xlsx:
+        chart_xml = xlsx.read('xl/charts/chart1.xml').decode('utf-8')
+      self.assertIn('Chart!$B$2:$B$3', chart_xml)
+    finally:
+      shutil.rmtree(directory)
+
+
+class RenderWorkbooksTest(unittest.TestCase):
+  """Tests for render_workbooks."""
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def test_render_workbooks(self):
+    filenames = [os.path.join(self.directory, 'report%d.xlsx' % i)
+                 for i in range(3)]
+    workbook_specs = [(filename, SHEET_SPECS) for filename in filenames]
+    self.assertEqual(filenames,
+                     parallel.render_workbooks(workbook_specs, processes=2))
+    for filename in filenames:
+      self.assertTrue(os.path.exists(filename))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,486 @@
+"""Alternative ways of rendering a layout on a sheet.
+
+The draw method of a layout paints the whole rectangle of every layout in the
+tree, and lets the children overwrite the cells of their parents. The renderers
+in this module produce the same cells, but avoid some of that work.
+"""
+
+__author__ = 'jt@javiertordable.com'
+__copyright__ = "Copyright (C) 2014 Javier Tordable"
+
+
+from layout import MAX_BLOCK_ROWS
+from layout import _row_formats
+from layout import _write_row
+from style import Uniform
+from style import block_row
+
+
+class RenderStats(object):
+  """Statistics about the cells written when rendering a layout."""
+
+  def __init__(self, cells_written, writes_saved):
+    self.cells_written = cells_written
+    self.writes_saved = writes_saved
+
+  def __str__(self):
+    return '%d cells written, %d writes saved' % (self.cells_written,
+                                                  self.writes_saved)
+
+
+def walk(layout, start_position):
+  """Returns a list with all (layout, start_position) pairs in a layout tree.
+
+  The layouts are given in drawing order, parents before their children.
+  """
+  positions = []
+  pending = [(layout, start_position)]
+  while pending:
+    (node, node_position) = pending.pop()
+    positions.append((node, node_position))
+    pending.extend(reversed(node.child_positions(node_position)))
+  return positions
+
+
+def check_resolvable(layout):
+  """Raises a ValueError if the cells of a layout tree can't be resolved.
+
+  A layout can only be rendered without calling its draw method if it doesn't
+  override draw, or if it also overrides cell_owner or resolve_cells
+  accordingly.
+  """
+  for (node, _) in walk(layout, (0, 0)):
+    for cls in type(node).__mro__:
+      if 'cell_owner' in vars(cls) or 'resolve_cells' in vars(cls):
+        break
+      if 'draw' in vars(cls):
+        raise ValueError(
+            'The layout %s overrides draw but not cell_owner, so its cells '
+            'can only be written by draw' % type(node).__name__)
+
+
+def draw_once(layout, output_sheet, start_position):
+  """Draws the layout on the output sheet, writing each cell exactly once.
+
+  The result is the same as layout.draw, but the owner of each cell is
+  resolved before writing, so the cells covered by child layouts are not
+  written once per nesting level. The cells are written in row-major order.
+
+  Returns the RenderStats of the drawing.
+  """
+  check_resolvable(layout)
+
+  for (node, node_position) in walk(layout, start_position):
+    node.draw_sheet_properties(output_sheet, node_position)
+
+  cell_owners = {}
+  num_draw_writes = layout.resolve_cells(cell_owners, start_position)
+  cells_written = _write_cells(output_sheet, cell_owners)
+
+  return RenderStats(cells_written, num_draw_writes - cells_written)
+
+
+def draw_rows(layout, output_sheet, start_position):
+  """Draws the layout on the output sheet, in strict row-major order.
+
+  The cells of all the layouts in a row, including siblings in a RowLayout,
+  are written before moving to the next row, so the layout can be drawn on a
+  constant memory sheet.
+
+  Raises a ValueError if the layout can't be drawn in row-major order.
+  Returns the RenderStats of the drawing.
+  """
+  try:
+    plan = RenderPlan(layout, start_position)
+  except ValueError as e:
+    raise ValueError('The layout can not be streamed: %s' % e)
+  return plan.draw(output_sheet)
+
+
+class RenderPlan(object):
+  """A layout tree flattened into spans of cells, to draw it row by row.
+
+  The rows of the layout are grouped in bands of consecutive rows which have
+  the same spans. Each span is a tuple (first_column, last_column, style,
+  column_offset, row_offset), where the style is the source of the content
+  and format of the cells as given by Layout.cell_owner.
+
+  The plan only depends on the sizes of the layouts, so it can be drawn again
+  after the data in the tables changes. If a layout in the tree changes size,
+  the plan is rebuilt the next time it's drawn.
+  """
+
+  def __init__(self, layout, start_position):
+    check_resolvable(layout)
+    self.layout = layout
+    self.start_position = start_position
+    self._build()
+
+  def _build(self):
+    self.layout.compute_positions(self.start_position)
+    self._nodes = walk(self.layout, self.start_position)
+    self.bands = _plan_bands(self.layout, self.start_position)
+    self.num_draw_writes = 0
+    for (node, _) in self._nodes:
+      (width, height) = node.size()
+      self.num_draw_writes += width * height
+
+  def is_current(self):
+    """Whether the plan still matches the sizes of the layouts in the tree."""
+    return self.layout.position() == self.start_position
+
+  def num_cells(self):
+    """The number of cells covered by the plan."""
+    num_cells = 0
+    for (first_row, last_row, spans) in self.bands:
+      band_width = 0
+      for span in spans:
+        band_width += span[1] - span[0] + 1
+      num_cells += band_width * (last_row - first_row + 1)
+    return num_cells
+
+  def draw(self, output_sheet):
+    """Draws the layout on the output sheet, one row at a time.
+
+    Returns the RenderStats of the drawing.
+    """
+    if not self.is_current():
+      self._build()
+
+    self.draw_sheet_properties(output_sheet)
+
+    cells_written = 0
+    for (first_row, num_rows, blocks) in self._blocks():
+      (first_column, width, cell_values, cell_formats) = blocks[0][:4]
+      if len(blocks) == 1 and isinstance(cell_values, Uniform) and \
+            isinstance(cell_formats, Uniform):
+        # A single span keeps the rows in order, so it can be filled at once.
+        output_sheet.fill_range(first_row, first_column,
+                                first_row + num_rows - 1,
+                                first_column + width - 1, cell_values.value,
+                                cell_formats.value)
+        cells_written += width * num_rows
+        continue
+      for row_index in range(num_rows):
+        for (first_column, width, cell_values, cell_formats, style,
+             style_column, style_row) in blocks:
+          _write_row(output_sheet, first_row + row_index, first_column,
+                     block_row(cell_values, row_index, width),
+                     _row_formats(cell_formats, row_index),
+                     style.get_cell_types(style_column, style_row + row_index,
+                                          width))
+          cells_written += width
+
+    return RenderStats(cells_written, self.num_draw_writes - cells_written)
+
+  def draw_sheet_properties(self, output_sheet):
+    """Applies the sheet-wide properties of all the layouts in the tree."""
+    for (node, node_position) in self._nodes:
+      node.draw_sheet_properties(output_sheet, node_position)
+
+  def cells(self):
+    """Yields (row, column, value, format) for all the cells, row by row."""
+    if not self.is_current():
+      self._build()
+
+    for (first_row, num_rows, blocks) in self._blocks():
+      for row_index in range(num_rows):
+        row = first_row + row_index
+        for (first_column, width, cell_values, cell_formats, _, _,
+             _) in blocks:
+          row_values = block_row(cell_values, row_index, width)
+          row_formats = block_row(cell_formats, row_index, width)
+          for column_index in range(width):
+            yield (row, first_column + column_index, row_values[column_index],
+                   row_formats[column_index])
+
+  def _blocks(self):
+    """Yields the cells of the bands, in blocks of at most MAX_BLOCK_ROWS rows.
+
+    Each block is given as (first_row, num_rows, span_blocks), with a tuple
+    (first_column, width, cell_values, cell_formats, style, style_column,
+    style_row) for each span, where the values and formats are given by the
+    block methods of the style, at the given position in the style.
+    """
+    for (first_row, last_row, spans) in self.bands:
+      for block_first_row in range(first_row, last_row + 1, MAX_BLOCK_ROWS):
+        num_rows = min(MAX_BLOCK_ROWS, last_row + 1 - block_first_row)
+        span_blocks = []
+        for (first_column, last_column, style, column_offset,
+             row_offset) in spans:
+          width = last_column - first_column + 1
+          (style_column, style_row) = (first_column - column_offset,
+                                       block_first_row - row_offset)
+          span_blocks.append((
+              first_column, width,
+              style.get_cell_contents(style_column, style_row, width, num_rows),
+              style.get_cell_formats(style_column, style_row, width,
+                                     num_rows),
+              style, style_column, style_row))
+        yield (block_first_row, num_rows, span_blocks)
+
+
+class IncrementalRenderer(object):
+  """Draws a layout on a sheet again and again, rewriting only what changed.
+
+  The renderer keeps the content and format of all the cells it has written.
+  When it draws the layout again, it only asks the styles for the cells of the
+  spans which are new, or which show rows of a table changed since the last
+  drawing, and only writes the cells which are different. The cells which are
+  no longer covered by the layout are cleared.
+  """
+
+  def __init__(self, layout, output_sheet, start_position):
+    self.layout = layout
+    self.output_sheet = output_sheet
+    self.start_position = start_position
+    self._plan = None
+    # The content and format of the cells written, keyed by (row, column).
+    self._cells = {}
+    self._bands = []
+    # The version of each table at the last drawing.
+    self._table_versions = {}
+    # The arguments of the conditional formats and the charts added to the
+    # sheet.
+    self._conditional_formats = []
+    self._charts = []
+
+  def render(self):
+    """Draws the changes since the last drawing on the sheet.
+
+    Returns the RenderStats of the drawing, where the writes saved are those
+    of drawing all the cells of the layout.
+    """
+    if self._plan is None:
+      self._plan = RenderPlan(self.layout, self.start_position)
+      self._draw_sheet_properties()
+    elif not self._plan.is_current():
+      self._plan._build()
+      self._draw_sheet_properties()
+
+    cells_written = 0
+    for (first_row, last_row, spans, old_spans) in _band_segments(
+        self._plan.bands, self._bands):
+      for span in spans or []:
+        for (span_first_row, span_last_row) in self._rows_to_check(
+            span, old_spans, first_row, last_row):
+          cells_written += self._update_span(span, span_first_row,
+                                             span_last_row)
+      cells_written += self._clear_uncovered(first_row, last_row, spans,
+                                             old_spans)
+
+    self._bands = self._plan.bands
+    for (_, _, spans) in self._bands:
+      for span in spans:
+        table = getattr(span[2], 'table', None)
+        if table is not None:
+          self._table_versions[table] = table.version
+          table.clear_dirty_rows()
+
+    return RenderStats(cells_written, self._plan.num_cells() - cells_written)
+
+  def _draw_sheet_properties(self):
+    """Applies the sheet properties, replacing those of the last drawing.
+
+    The conditional formats and the charts are added to a sheet and not
+    replaced, so the old ones are removed first.
+    """
+    for arguments in self._conditional_formats:
+      self.output_sheet.remove_conditional_format(*arguments)
+    for (row, column, chart) in self._charts:
+      self.output_sheet.remove_chart(row, column, chart)
+    recorder = _PropertyRecorder(self.output_sheet)
+    self._plan.draw_sheet_properties(recorder)
+    self._conditional_formats = recorder.conditional_formats
+    self._charts = recorder.charts
+
+  def _rows_to_check(self, span, old_spans, first_row, last_row):
+    """The ranges of rows of a span which may have changed."""
+    if old_spans is None or span not in old_spans:
+      return [(first_row, last_row)]
+    table = getattr(span[2], 'table', None)
+    if table is None:
+      return []
+    if table not in self._table_versions:
+      return [(first_row, last_row)]
+    changed_rows = table.changed_rows(self._table_versions[table])
+    if changed_rows is None:
+      return []
+    # The rows of the table are below the header in the style.
+    row_offset = span[4]
+    (first_changed, last_changed) = (changed_rows[0] + 1 + row_offset,
+                                     changed_rows[1] + 1 + row_offset)
+    (first_row, last_row) = (max(first_row, first_changed),
+                             min(last_row, last_changed))
+    if first_row > last_row:
+      return []
+    return [(first_row, last_row)]
+
+  def _update_span(self, span, first_row, last_row):
+    """Writes the cells of a span which changed. Returns how many."""
+    (first_column, last_column, style, column_offset, row_offset) = span
+    width = last_column - first_column + 1
+    cells = self._cells
+    write = self.output_sheet.write
+    cells_written = 0
+    for block_first_row in range(first_row, last_row + 1, MAX_BLOCK_ROWS):
+      num_rows = min(MAX_BLOCK_ROWS, last_row + 1 - block_first_row)
+      (style_column, style_row) = (first_column - column_offset,
+                                   block_first_row - row_offset)
+      cell_values = style.get_cell_contents(style_column, style_row, width,
+                                            num_rows)
+      cell_formats = style.get_cell_formats(style_column, style_row, width,
+                                            num_rows)
+      for row_index in range(num_rows):
+        row = block_first_row + row_index
+        row_values = block_row(cell_values, row_index, width)
+        row_formats = block_row(cell_formats, row_index, width)
+        for column_index in range(width):
+          cell = (row_values[column_index], row_formats[column_index])
+          position = (row, first_column + column_index)
+          if cells.get(position) != cell:
+            cells[position] = cell
+            write(position[0], position[1], cell[0], cell[1])
+            cells_written += 1
+    return cells_written
+
+  def _clear_uncovered(self, first_row, last_row, spans, old_spans):
+    """Clears the cells of the old spans not covered by the new ones."""
+    if old_spans is None:
+      return 0
+    columns = set()
+    for span in old_spans:
+      columns.update(range(span[0], span[1] + 1))
+    for span in spans or []:
+      columns.difference_update(range(span[0], span[1] + 1))
+    cells_written = 0
+    for row in range(first_row, last_row + 1):
+      for column in sorted(columns):
+        del self._cells[(row, column)]
+        self.output_sheet.write(row, column, None, None)
+        cells_written += 1
+    return cells_written
+
+
+class _PropertyRecorder(object):
+  """A sheet which records the conditional formats and charts added to
+  another sheet.
+  """
+
+  def __init__(self, sheet):
+    self._sheet = sheet
+    self.conditional_formats = []
+    self.charts = []
+
+  def conditional_format(self, *arguments):
+    self._sheet.conditional_format(*arguments)
+    self.conditional_formats.append(arguments)
+
+  def insert_chart(self, row, column, chart, options=None):
+    self._sheet.insert_chart(row, column, chart, options)
+    self.charts.append((row, column, chart))
+
+  def __getattr__(self, name):
+    return getattr(self._sheet, name)
+
+
+def _band_segments(bands, old_bands):
+  """Yields the rows of two lists of bands, split where either one changes.
+
+  Each segment is a tuple (first_row, last_row, spans, old_spans), where the
+  spans are None if the rows are not in the bands.
+  """
+  boundaries = set()
+  for (first_row, last_row, _) in bands + old_bands:
+    boundaries.add(first_row)
+    boundaries.add(last_row + 1)
+  boundaries = sorted(boundaries)
+
+  indexes = [0, 0]
+  for (first_row, next_row) in zip(boundaries, boundaries[1:]):
+    segment_spans = []
+    for (list_index, band_list) in enumerate([bands, old_bands]):
+      while indexes[list_index] < len(band_list) and \
+            band_list[indexes[list_index]][1] < first_row:
+        indexes[list_index] += 1
+      spans = None
+      if indexes[list_index] < len(band_list) and \
+            band_list[indexes[list_index]][0] <= first_row:
+        spans = band_list[indexes[list_index]][2]
+      segment_spans.append(spans)
+    if segment_spans != [None, None]:
+      yield (first_row, next_row - 1, segment_spans[0], segment_spans[1])
+
+
+def _plan_bands(layout, start_position):
+  """Returns the bands of rows of a layout, with its children on top."""
+  (start_column, start_row) = start_position
+  (width, height) = layout.size()
+  span = (start_column, start_column + width - 1) + \
+      layout.cell_owner(start_position)
+  bands = [(start_row, start_row + height - 1, [span])]
+  for (child_layout, child_position) in layout.child_positions(start_position):
+    bands = _overlay_bands(bands, _plan_bands(child_layout, child_position))
+  return bands
+
+
+def _overlay_bands(bands, top_bands):
+  """Returns the bands that result from drawing top_bands over bands.
+
+  The rows of the top bands must be covered by the bottom bands. Consecutive
+  rows with the same spans are merged in a single band.
+  """
+  boundaries = set()
+  for (first_row, last_row, _) in bands + top_bands:
+    boundaries.add(first_row)
+    boundaries.add(last_row + 1)
+  boundaries = sorted(boundaries)
+
+  result = []
+  bottom_index = 0
+  top_index = 0
+  for (first_row, next_row) in zip(boundaries, boundaries[1:]):
+    while bands[bottom_index][1] < first_row:
+      bottom_index += 1
+    while top_index < len(top_bands) and top_bands[top_index][1] < first_row:
+      top_index += 1
+
+    spans = bands[bottom_index][2]
+    if top_index < len(top_bands) and top_bands[top_index][0] <= first_row:
+      spans = _overlay_spans(spans, top_bands[top_index][2])
+
+    if result and result[-1][1] == first_row - 1 and result[-1][2] == spans:
+      result[-1] = (result[-1][0], next_row - 1, spans)
+    else:
+      result.append((first_row, next_row - 1, spans))
+  return result
+
+
+def _overlay_spans(spans, top_spans):
+  """Returns the spans that result from drawing top_spans over spans."""
+  result = list(top_spans)
+  for span in spans:
+    first_column = span[0]
+    for top_span in top_spans:
+      if top_span[1] < first_column or top_span[0] > span[1]:
+        continue
+      if top_span[0] > first_column:
+        result.append((first_column, top_span[0] - 1) + span[2:])
+      first_column = top_span[1] + 1
+    if first_column <= span[1]:
+      result.append((first_column, span[1]) + span[2:])
+  result.sort(key=lambda span: span[0])
+  return result
+
+
+def _write_cells(output_sheet, cell_owners):
+  """Writes the resolved cells in row-major order. Returns how many."""
+  for position in sorted(cell_owners):
+    (row, column) = position
+    (style, column_offset, row_offset) = cell_owners[position]
+    style_column = column - column_offset
+    style_row = row - row_offset
+    cell_value = style.get_cell_content(style_column, style_row)
+    cell_format = style.get_cell_format(style_column, style_row)
+    output_sheet.write(row, column, cell_value, cell_format)
+  return len(cell_owners)
@@ -0,0 +1,447 @@
+"""Tests for render.py"""
+
+__author__ = 'jt@javiertordable.com'
+__copyright__ = "Copyright (C) 2014 Javier Tordable"
+
+
+from layout import ChartLayout
+from layout import ColumnLayout
+from layout import FixedSizeLayout
+from layout import HideOutsideLayout
+from layout import PaddingLayout
+from layout import RowLayout
+from layout import TableLayout
+import render
+from style import BandedRows, EmptyStyle, FixedStyle, TableStyle
+from table import Table
+from xls import MockSheet
+from xls import MockWorkbook
+
+import unittest
+
+
+RED = '#FF0000'
+GREEN = '#00FF00'
+BLUE = '#0000FF'
+
+
+class CustomLayout(FixedSizeLayout):
+  """A layout which draws itself in a way that can't be resolved."""
+
+  def draw(self, output_sheet, start_position):
+    output_sheet.write(0, 0, 'Custom')
+
+
+class StripedTableStyle(TableStyle):
+  """A table style which only overrides the methods for a cell."""
+
+  def __init__(self, workbook, table):
+    super(StripedTableStyle, self).__init__(workbook, table)
+    self._striped_format = workbook.get_format({'bg_color': GREEN})
+
+  def get_cell_content(self, column_index, row_index):
+    content = super(StripedTableStyle, self).get_cell_content(column_index,
+                                                              row_index)
+    return content.upper()
+
+  def get_cell_format(self, column_index, row_index):
+    if row_index % 2 == 0:
+      return self._striped_format
+    return self._format
+
+
+class CheckeredStyle(FixedStyle):
+  """A fixed style which gives a different content to every other cell."""
+
+  def get_cell_content(self, column_index, row_index):
+    if (column_index + row_index) % 2 == 0:
+      return None
+    return self.content
+
+
+class DrawOnceTest(unittest.TestCase):
+  """Tests for draw_once."""
+
+  def setUp(self):
+    self.workbook = MockWorkbook()
+    self.empty_style = EmptyStyle(self.workbook)
+    self.red_style = FixedStyle(self.workbook, 'Red', RED)
+    self.green_style = FixedStyle(self.workbook, 'Green', GREEN)
+    self.blue_style = FixedStyle(self.workbook, 'Blue', BLUE)
+
+    self.table = Table('Table', ['Col1', 'Col2', 'Col3'])
+    self.table.add_row(['a', 'b', 'c'])
+    self.table.add_row(['d', 'e', 'f'])
+    self.table_style = TableStyle(self.workbook, self.table)
+
+  def build_layout(self):
+    # Row 1 has three fixed layouts.
+    layout_1 = RowLayout(self.empty_style, [
+        FixedSizeLayout(self.red_style, 2, 2),
+        FixedSizeLayout(self.red_style, 2, 3),
+        TableLayout(self.table_style, self.table)])
+
+    # Row 2 has a padded layout and a column layout.
+    layout_2_1 = PaddingLayout(self.blue_style,
+                               FixedSizeLayout(self.green_style, 3, 3),
+                               1, 0, 2, 1)
+    layout_2_2 = ColumnLayout(self.empty_style, [
+        FixedSizeLayout(self.blue_style, 1, 1),
+        FixedSizeLayout(self.blue_style, 4, 1)])
+    layout_2 = RowLayout(self.empty_style, [layout_2_1, layout_2_2])
+
+    return HideOutsideLayout(self.red_style,
+                             ColumnLayout(self.empty_style,
+                                          [layout_1, layout_2]))
+
+  def test_same_cells_as_draw(self):
+    expected_sheet = MockSheet('Expected')
+    self.build_layout().draw(expected_sheet, (0, 0))
+    sheet = MockSheet('Actual')
+    render.draw_once(self.build_layout(), sheet, (0, 0))
+
+    self.assertEqual(expected_sheet.cell_contents, sheet.cell_contents)
+    self.assertEqual(expected_sheet.cell_formats, sheet.cell_formats)
+    self.assertEqual(expected_sheet.properties, sheet.properties)
+
+  def test_overridden_cell_methods(self):
+    layout = RowLayout(self.empty_style, [
+        PaddingLayout(CheckeredStyle(self.workbook, 'x'),
+                      TableLayout(StripedTableStyle(self.workbook, self.table),
+                                  self.table), 1, 1, 1, 1),
+        FixedSizeLayout(CheckeredStyle(self.workbook, 'y', RED), 2, 3)])
+    draw_sheet = MockSheet('Draw')
+    layout.draw(draw_sheet, (0, 0))
+    self.assertEqual('COL1', draw_sheet.read(1, 1))
+    self.assertEqual('D', draw_sheet.read(3, 1))
+    self.assertEqual({'bg_color': GREEN},
+                     draw_sheet.cell_formats[(1, 1)].properties)
+    self.assertEqual({}, draw_sheet.cell_formats[(2, 1)].properties)
+    self.assertIsNone(draw_sheet.read(0, 0))
+    self.assertEqual('x', draw_sheet.read(0, 1))
+    self.assertEqual('y', draw_sheet.read(0, 5))
+
+    once_sheet = MockSheet('Once')
+    render.draw_once(layout, once_sheet, (0, 0))
+    rows_sheet = MockSheet('Rows', constant_memory=True)
+    render.draw_rows(layout, rows_sheet, (0, 0))
+    for sheet in [once_sheet, rows_sheet]:
+      self.assertEqual(draw_sheet.cell_contents, sheet.cell_contents)
+      self.assertEqual(draw_sheet.cell_formats, sheet.cell_formats)
+
+  def test_stats(self):
+    sheet = MockSheet('Sheet1')
+    stats = render.draw_once(self.build_layout(), sheet, (0, 0))
+
+    # The layout is 8 columns wide and 9 rows high.
+    self.assertEqual(8 * 9, stats.cells_written)
+    self.assertEqual(len(sheet.cell_contents), stats.cells_written)
+
+    # Every layout in the tree would have drawn its whole area.
+    draw_writes = (8 * 9 + 8 * 9 +  # HideOutsideLayout and ColumnLayout.
+                   7 * 3 + 2 * 2 + 2 * 3 + 3 * 3 +  # First row.
+                   8 * 6 + 4 * 6 + 3 * 3 +  # Second row and padding.
+                   4 * 2 + 1 * 1 + 4 * 1)  # Inner ColumnLayout.
+    self.assertEqual(draw_writes - 8 * 9, stats.writes_saved)
+
+  def test_single_layout_saves_nothing(self):
+    sheet = MockSheet('Sheet1')
+    layout = TableLayout(self.table_style, self.table)
+    stats = render.draw_once(layout, sheet, (1, 1))
+    self.assertEqual(9, stats.cells_written)
+    self.assertEqual(0, stats.writes_saved)
+    self.assertEqual('Col1', sheet.read(1, 1))
+    self.assertEqual('f', sheet.read(3, 3))
+
+  def test_custom_draw(self):
+    sheet = MockSheet('Sheet1')
+    layout = RowLayout(self.empty_style,
+                       [CustomLayout(self.red_style, 1, 1)])
+    self.assertRaises(ValueError, render.draw_once, layout, sheet, (0, 0))
+
+
+class DrawRowsTest(DrawOnceTest):
+  """Tests for draw_rows."""
+
+  def test_same_cells_as_draw(self):
+    expected_sheet = MockSheet('Expected')
+    self.build_layout().draw(expected_sheet, (0, 0))
+    sheet = MockSheet('Actual', constant_memory=True)
+    render.draw_rows(self.build_layout(), sheet, (0, 0))
+
+    self.assertEqual(expected_sheet.cell_contents, sheet.cell_contents)
+    self.assertEqual(expected_sheet.cell_formats, sheet.cell_formats)
+    self.assertEqual(expected_sheet.properties, sheet.properties)
+
+  def test_stats(self):
+    sheet = MockSheet('Sheet1', constant_memory=True)
+    stats = render.draw_rows(self.build_layout(), sheet, (0, 0))
+    expected_stats = render.draw_once(self.build_layout(), MockSheet('Once'),
+                                      (0, 0))
+    self.assertEqual(expected_stats.cells_written, stats.cells_written)
+    self.assertEqual(expected_stats.writes_saved, stats.writes_saved)
+
+  def test_draw_not_in_row_order(self):
+    sheet = MockSheet('Sheet1', constant_memory=True)
+    self.assertRaises(ValueError, self.build_layout().draw, sheet, (0, 0))
+
+  def test_custom_draw(self):
+    sheet = MockSheet('Sheet1', constant_memory=True)
+    layout = RowLayout(self.empty_style,
+                       [CustomLayout(self.red_style, 1, 1)])
+    self.assertRaises(ValueError, render.draw_rows, layout, sheet, (0, 0))
+
+
+class RenderPlanTest(unittest.TestCase):
+  """Tests for RenderPlan."""
+
+  def setUp(self):
+    self.workbook = MockWorkbook()
+    self.empty_style = EmptyStyle(self.workbook)
+    self.red_style = FixedStyle(self.workbook, 'Red', RED)
+
+    self.table = Table('Table', ['Col1', 'Col2'])
+    self.table.add_row(['a', 'b'])
+    self.table.add_row(['c', 'd'])
+    self.table.add_row(['e', 'f'])
+    self.table_style = TableStyle(self.workbook, self.table)
+
+    # A table and a fixed layout side by side, and another one below.
+    self.fixed_layout = FixedSizeLayout(self.red_style, 1, 2)
+    self.layout = ColumnLayout(self.empty_style, [
+        RowLayout(self.empty_style, [
+            TableLayout(self.table_style, self.table),
+            self.fixed_layout]),
+        FixedSizeLayout(self.red_style, 2, 1)])
+
+  def test_bands(self):
+    plan = render.RenderPlan(self.layout, (1, 0))
+    table_span = (1, 2, self.table_style, 1, 0)
+    self.assertEqual([
+        (0, 1, [table_span, (3, 3, self.red_style, 0, 0)]),
+        (2, 3, [table_span, (3, 3, self.empty_style, 0, 0)]),
+        (4, 4, [(1, 2, self.red_style, 0, 0),
+                (3, 3, self.empty_style, 0, 0)])],
+                     plan.bands)
+    self.assertEqual(3 * 5, plan.num_cells())
+
+  def test_draw(self):
+    expected_sheet = MockSheet('Expected')
+    self.layout.draw(expected_sheet, (1, 0))
+    sheet = MockSheet('Actual', constant_memory=True)
+    stats = render.RenderPlan(self.layout, (1, 0)).draw(sheet)
+
+    self.assertEqual(expected_sheet.cell_contents, sheet.cell_contents)
+    self.assertEqual(expected_sheet.cell_formats, sheet.cell_formats)
+    self.assertEqual(15, stats.cells_written)
+    self.assertEqual(12 + 8 + 2 + 2, stats.writes_saved)
+
+  def test_draw_fills_single_spans(self):
+    layout = ColumnLayout(self.empty_style, [
+        FixedSizeLayout(self.red_style, 2, 3),
+        TableLayout(self.table_style, self.table)])
+    sheet = MockSheet('Sheet1', constant_memory=True)
+    render.RenderPlan(layout, (0, 0)).draw(sheet)
+    # The rows of the fixed layout are filled at once, but not the table.
+    red_format = self.red_style.get_cell_format(0, 0)
+    self.assertEqual([(0, 0, 2, 1, 'Red', red_format)], sheet.filled_ranges)
+    self.assertEqual('f', sheet.read(6, 1))
+
+  def test_cells(self):
+    plan = render.RenderPlan(self.layout, (0, 0))
+    cells = list(plan.cells())
+    self.assertEqual(15, len(cells))
+    self.assertEqual((0, 0, 'Col1', self.table_style.get_cell_format(0, 0)),
+                     cells[0])
+    self.assertEqual((1, 2, 'Red', self.red_style.get_cell_format(0, 0)),
+                     cells[5])
+    self.assertEqual(sorted(cells, key=lambda cell: cell[:2]), cells)
+
+  def test_draw_new_data(self):
+    plan = render.RenderPlan(self.layout, (0, 0))
+    bands = plan.bands
+    self.table._rows[0] = ['x', 'y']
+    sheet = MockSheet('Sheet1')
+    plan.draw(sheet)
+    self.assertIs(bands, plan.bands)
+    self.assertEqual('x', sheet.read(1, 0))
+
+  def test_draw_after_changed_row(self):
+    plan = render.RenderPlan(self.layout, (0, 0))
+    bands = plan.bands
+    self.table.set_row(0, ['x', 'y'])
+    # The size of the table doesn't change, so the plan is still current.
+    self.assertTrue(plan.is_current())
+    sheet = MockSheet('Sheet1')
+    plan.draw(sheet)
+    self.assertIs(bands, plan.bands)
+    self.assertEqual('x', sheet.read(1, 0))
+
+  def test_draw_after_change(self):
+    plan = render.RenderPlan(self.layout, (0, 0))
+    self.assertTrue(plan.is_current())
+    self.table.add_row(['g', 'h'])
+    self.assertFalse(plan.is_current())
+
+    expected_sheet = MockSheet('Expected')
+    self.layout.draw(expected_sheet, (0, 0))
+    sheet = MockSheet('Actual')
+    plan.draw(sheet)
+    self.assertTrue(plan.is_current())
+    self.assertEqual(expected_sheet.cell_contents, sheet.cell_contents)
+    self.assertEqual('g', sheet.read(4, 0))
+
+  def test_custom_draw(self):
+    layout = RowLayout(self.empty_style,
+                       [CustomLayout(self.red_style, 1, 1)])
+    self.assertRaises(ValueError, render.RenderPlan, layout, (0, 0))
+
+
+class WalkTest(unittest.TestCase):
+  """Tests for walk."""
+
+  def test_walk(self):
+    workbook = MockWorkbook()
+    style = EmptyStyle(workbook)
+    leaf_1 = FixedSizeLayout(style, 2, 1)
+    leaf_2 = FixedSizeLayout(style, 1, 3)
+    leaf_3 = FixedSizeLayout(style, 1, 1)
+    row = RowLayout(style, [leaf_1, leaf_2])
+    root = ColumnLayout(style, [row, leaf_3])
+
+    self.assertEqual([(root, (1, 2)),
+                      (row, (1, 2)),
+                      (leaf_1, (1, 2)),
+                      (leaf_2, (3, 2)),
+                      (leaf_3, (1, 5))],
+                     render.walk(root, (1, 2)))
+
+
+class IncrementalRendererTest(unittest.TestCase):
+  """Tests for IncrementalRenderer."""
+
+  def setUp(self):
+    self.workbook = MockWorkbook()
+    self.empty_style = EmptyStyle(self.workbook)
+    self.red_style = FixedStyle(self.workbook, 'Red', RED)
+
+    self.table = Table('Table', ['Col1', 'Col2'])
+    self.table.add_row(['a', 'b'])
+    self.table.add_row(['c', 'd'])
+    self.other_table = Table('Other', ['Col1'])
+    self.other_table.add_row(['x'])
+
+    # Two tables in a column, with a fixed layout between them.
+    self.fixed_layout = FixedSizeLayout(self.red_style, 3, 1)
+    self.layout = ColumnLayout(self.empty_style, [
+        TableLayout(TableStyle(self.workbook, self.table), self.table),
+        self.fixed_layout,
+        TableLayout(TableStyle(self.workbook, self.other_table),
+                    self.other_table)])
+    self.sheet = MockSheet('Sheet')
+    self.renderer = render.IncrementalRenderer(self.layout, self.sheet, (0, 0))
+
+  def assertSameAsDraw(self):
+    expected_sheet = MockSheet('Expected')
+    self.layout.draw(expected_sheet, (0, 0))
+    self.assertEqual(expected_sheet.cell_contents, self.sheet.cell_contents)
+    self.assertEqual(expected_sheet.cell_formats, self.sheet.cell_formats)
+
+  def test_first_render(self):
+    stats = self.renderer.render()
+    self.assertSameAsDraw()
+    # The layout is 3 columns wide and 3 + 1 + 2 rows tall.
+    self.assertEqual(3 * 6, stats.cells_written)
+    self.assertEqual(0, stats.writes_saved)
+
+  def test_no_changes(self):
+    self.renderer.render()
+    stats = self.renderer.render()
+    self.assertEqual(0, stats.cells_written)
+    self.assertEqual(3 * 6, stats.writes_saved)
+
+  def test_changed_row(self):
+    self.renderer.render()
+    self.table.set_row(1, ['c', 'e'])
+    stats = self.renderer.render()
+    self.assertSameAsDraw()
+    self.assertEqual(1, stats.cells_written)
+
+  def test_added_row(self):
+    self.renderer.render()
+    self.table.add_row(['e', 'f'])
+    stats = self.renderer.render()
+    self.assertSameAsDraw()
+    # The new row of the table and the empty cell at its right, the fixed
+    # layout which moved down, and the table below it. The empty cells at the
+    # right of that table are not written again in the rows they were before.
+    self.assertEqual(2 + 1 + 3 + 1 + 3, stats.cells_written)
+    self.assertEqual(3 * 7 - stats.cells_written, stats.writes_saved)
+
+  def test_changes_in_two_tables(self):
+    self.renderer.render()
+    self.table.set_row(0, ['a', 'g'])
+    self.other_table.add_row(['y'])
+    self.other_table.add_row(['z'])
+    stats = self.renderer.render()
+    self.assertSameAsDraw()
+    self.assertEqual(1 + 2 * 3, stats.cells_written)
+
+  def test_conditional_formats(self):
+    table = Table('Banded', ['Col1'])
+    table.add_row(['a'])
+    style = TableStyle(self.workbook, table, [BandedRows({'bold': True})])
+    sheet = MockSheet('Sheet')
+    renderer = render.IncrementalRenderer(TableLayout(style, table), sheet,
+                                          (0, 0))
+    renderer.render()
+    for row in ['b', 'c', 'd']:
+      table.add_row([row])
+      renderer.render()
+    table.set_row(0, ['e'])
+    renderer.render()
+    renderer.render()
+    # The conditional format is replaced when the table grows.
+    self.assertEqual(style.get_conditional_formats((0, 0)),
+                     sheet.conditional_formats)
+    self.assertEqual(4, sheet.conditional_formats[0][2])
+
+  def test_charts(self):
+    table_layout = TableLayout(TableStyle(self.workbook, self.table),
+                               self.table)
+    layout = RowLayout(self.empty_style, [
+        table_layout,
+        ChartLayout(self.empty_style, self.workbook, table_layout, 'Col1',
+                    ['Col2'], 3, 3)])
+    sheet = MockSheet('Sheet')
+    renderer = render.IncrementalRenderer(layout, sheet, (0, 0))
+    renderer.render()
+    for row in [['e', 'f'], ['g', 'h']]:
+      self.table.add_row(row)
+      renderer.render()
+    self.table.set_row(0, ['a', 'i'])
+    renderer.render()
+    # The chart is replaced when the table grows.
+    [(row, column, chart, _)] = sheet.charts
+    self.assertEqual((0, 2), (row, column))
+    self.assertIs(self.workbook.charts[-1], chart)
+    self.assertEqual(['Sheet', 1, 1, 4, 1], chart.series[0]['values'])
+
+  def test_smaller_layout(self):
+    self.renderer.render()
+    self.fixed_layout.width = 1
+    self.fixed_layout.invalidate()
+    stats = self.renderer.render()
+    # The layout is now 2 columns wide, so the cells of the third column are
+    # cleared, and the second cell of the fixed layout is empty again.
+    expected_sheet = MockSheet('Expected')
+    self.layout.draw(expected_sheet, (0, 0))
+    for row in range(6):
+      expected_sheet.write(row, 2, None, None)
+    self.assertEqual(expected_sheet.cell_contents, self.sheet.cell_contents)
+    self.assertEqual(expected_sheet.cell_formats, self.sheet.cell_formats)
+    self.assertEqual(6 + 1, stats.cells_written)
+
+
+if __name__ == '__main__':
+  unittest.main()
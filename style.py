@@ -1,17 +1,67 @@
 """A style is a set of configuration to draw a layout.
 
 This module contains the base style as well as a variety of example styles.
+
+The styles which are built with format properties get a shared format from
+the workbook, see xls.FormatRegistry, which can't be changed. A style built
+without them gets its own format, which its subclass can still change after
+calling Style.__init__, like in earlier versions, although it isn't shared
+with the other styles with the same properties.
 """
 
 __author__ = 'jt@javiertordable.com'
 __copyright__ = "Copyright (C) 2014 Javier Tordable"
 
 
+class Uniform(object):
+  """A block of cells which all have the same value.
+
+  It's returned by the block methods of a style instead of a list of rows.
+  """
+
+  def __init__(self, value):
+    self.value = value
+
+  def __eq__(self, other):
+    return isinstance(other, Uniform) and self.value == other.value
+
+  def __ne__(self, other):
+    return not self == other
+
+  def __repr__(self):
+    return 'Uniform(%r)' % (self.value,)
+
+
+def block_row(block, row_index, width):
+  """The values of a row in a block returned by the block methods, as a list.
+  """
+  if isinstance(block, Uniform):
+    return [block.value] * width
+  return block[row_index]
+
+
 class Style(object):
-  """A style contains configuration for drawing a layout."""
+  """A style contains configuration for drawing a layout.
 
-  def __init__(self, workbook):
-    self._format = workbook.add_format()
+  The content and format of the cells can be given one by one, or for a block
+  of cells at once. The block methods return a list of rows, each one a list of
+  values, or a Uniform if all the cells have the same value. Styles which
+  override the block methods must give the same values as the methods for a
+  cell. The styles in this module ask the methods for a cell in their block
+  methods when a subclass overrides them.
+  """
+
+  def __init__(self, workbook, format_properties=None):
+    """Builds a Style with the format of its cells.
+
+    @param format_properties: A dict of format properties, such as 'bg_color',
+    for a shared format. If None, the style gets its own format, which can be
+    changed.
+    """
+    if format_properties is None:
+      self._format = workbook.add_format()
+    else:
+      self._format = workbook.get_format(format_properties)
 
   def get_cell_content(self, column_index, row_index):
     pass
@@ -19,12 +69,59 @@ class Style(object):
   def get_cell_format(self, column_index, row_index):
     return self._format
 
+  def get_cell_contents(self, first_column, first_row, width, height):
+    """The contents of a block of width x height cells."""
+    return [[self.get_cell_content(column_index, row_index)
+             for column_index in range(first_column, first_column + width)]
+            for row_index in range(first_row, first_row + height)]
+
+  def get_cell_formats(self, first_column, first_row, width, height):
+    """The formats of a block of width x height cells."""
+    return [[self.get_cell_format(column_index, row_index)
+             for column_index in range(first_column, first_column + width)]
+            for row_index in range(first_row, first_row + height)]
+
+  def get_conditional_formats(self, start_position):
+    """The conditional formats of a layout drawn at the given position.
+
+    The spreadsheet applies them to the cells when it's opened, so they don't
+    have to be computed for each cell. They are given as a list of tuples
+    (first_row, first_column, last_row, last_column, options), where the
+    options are those of Sheet.conditional_format.
+    """
+    return []
+
+  def get_cell_types(self, first_column, row_index, width):
+    """The types of the values of a row of cells, or None if not known.
+
+    The types are given as a list of xls.CELL_TYPES, which may be None for
+    some of the cells.
+    """
+    return None
+
+
+def _overrides(style, cls, method_name):
+  """Whether the class of a style overrides a method of one of its bases."""
+  return getattr(type(style), method_name) is not getattr(cls, method_name)
+
 
 class EmptyStyle(Style):
   """A style which doesn't have any content or format data."""
 
   def __init__(self, workbook):
-    super(EmptyStyle, self).__init__(workbook)
+    super(EmptyStyle, self).__init__(workbook, {})
+
+  def get_cell_contents(self, first_column, first_row, width, height):
+    if _overrides(self, EmptyStyle, 'get_cell_content'):
+      return super(EmptyStyle, self).get_cell_contents(first_column, first_row,
+                                                       width, height)
+    return Uniform(None)
+
+  def get_cell_formats(self, first_column, first_row, width, height):
+    if _overrides(self, EmptyStyle, 'get_cell_format'):
+      return super(EmptyStyle, self).get_cell_formats(first_column, first_row,
+                                                      width, height)
+    return Uniform(self._format)
 
 
 class FixedStyle(Style):
@@ -36,24 +133,43 @@ class FixedStyle(Style):
     @param background_color: The background color of the cell in #RRGGBB
     format.
     """
-    super(FixedStyle, self).__init__(workbook)
+    format_properties = {}
+    if background_color:
+      format_properties['bg_color'] = background_color
+    super(FixedStyle, self).__init__(workbook, format_properties)
 
     self.content = content
 
-    if background_color:
-      self._format.set_bg_color(background_color)
-
   def get_cell_content(self, column_index, row_index):
     return self.content
 
+  def get_cell_contents(self, first_column, first_row, width, height):
+    if _overrides(self, FixedStyle, 'get_cell_content'):
+      return super(FixedStyle, self).get_cell_contents(first_column, first_row,
+                                                       width, height)
+    return Uniform(self.content)
+
+  def get_cell_formats(self, first_column, first_row, width, height):
+    if _overrides(self, FixedStyle, 'get_cell_format'):
+      return super(FixedStyle, self).get_cell_formats(first_column, first_row,
+                                                      width, height)
+    return Uniform(self._format)
+
 
 class TableStyle(Style):
   """A style with configuration for drawing a table in a layout."""
 
-  def __init__(self, workbook, table):
+  def __init__(self, workbook, table, rules=None):
+    """Builds a TableStyle.
+
+    @param rules: An optional list of ConditionalRules, like BandedRows or
+    ColorScale, which format the rows of the table.
+    """
     super(TableStyle, self).__init__(workbook)
 
     self.table = table
+    self.rules = list(rules or [])
+    self._workbook = workbook
 
   def get_cell_content(self, column_index, row_index):
     if row_index == 0:
@@ -61,3 +177,177 @@ class TableStyle(Style):
       return self.table.column_names[column_index]
     else:
       return self.table.get_by_index(column_index, row_index - 1)
+
+  def get_cell_contents(self, first_column, first_row, width, height):
+    if _overrides(self, TableStyle, 'get_cell_content'):
+      return super(TableStyle, self).get_cell_contents(first_column, first_row,
+                                                       width, height)
+    last_column = first_column + width
+    rows = []
+    if first_row == 0:
+      # Add the header values.
+      rows.append(list(self.table.column_names[first_column:last_column]))
+      first_row = 1
+      height -= 1
+    if height > 0:
+      rows.extend(self.table.get_block(first_column, first_row - 1, width,
+                                       height))
+    return rows
+
+  def get_cell_formats(self, first_column, first_row, width, height):
+    if _overrides(self, TableStyle, 'get_cell_format'):
+      return super(TableStyle, self).get_cell_formats(first_column, first_row,
+                                                      width, height)
+    return Uniform(self._format)
+
+  def get_conditional_formats(self, start_position):
+    (start_column, start_row) = start_position
+    if not self.rules or self.table.num_rows == 0:
+      return []
+    # The rules apply to the rows of the table, below the header.
+    (first_row, last_row) = (start_row + 1, start_row + self.table.num_rows)
+    conditional_formats = []
+    for rule in self.rules:
+      if rule.column_name is None:
+        first_column = start_column
+        last_column = start_column + self.table.num_columns - 1
+      else:
+        first_column = start_column + self.table.column_index(rule.column_name)
+        last_column = first_column
+      conditional_formats.append(
+          (first_row, first_column, last_row, last_column,
+           rule.get_options(self._workbook, first_row)))
+    return conditional_formats
+
+  def get_cell_types(self, first_column, row_index, width):
+    cell_types = self.table.cell_types
+    if row_index == 0 or cell_types is None:
+      # The header has the names of the columns.
+      return None
+    if _overrides(self, TableStyle, 'get_cell_content'):
+      # The contents may not have the types of the columns.
+      return None
+    if first_column == 0 and width == len(cell_types):
+      return cell_types
+    return cell_types[first_column:first_column + width]
+
+
+class MarkedRowsStyle(TableStyle):
+  """A table style which gives a different format to some rows of the table.
+
+  It can be used for example to show in bold the subtotal rows given by
+  aggregate.subtotals.
+  """
+
+  def __init__(self, workbook, table, marked_rows, marked_format_properties,
+               rules=None):
+    """Builds a MarkedRowsStyle.
+
+    @param marked_rows: The indexes of the marked rows in the table, without
+    counting the header.
+    @param marked_format_properties: A dict of format properties for the
+    cells of the marked rows, such as 'bold'.
+    """
+    super(MarkedRowsStyle, self).__init__(workbook, table, rules)
+    self.marked_rows = frozenset(marked_rows)
+    self._marked_format = workbook.get_format(marked_format_properties)
+
+  def get_cell_format(self, column_index, row_index):
+    if row_index - 1 in self.marked_rows:
+      return self._marked_format
+    return self._format
+
+  def get_cell_formats(self, first_column, first_row, width, height):
+    if _overrides(self, MarkedRowsStyle, 'get_cell_format'):
+      return Style.get_cell_formats(self, first_column, first_row, width,
+                                    height)
+    table_rows = range(first_row - 1, first_row - 1 + height)
+    if self.marked_rows.isdisjoint(table_rows):
+      return Uniform(self._format)
+    return [[self._marked_format if table_row in self.marked_rows
+             else self._format] * width for table_row in table_rows]
+
+
+class ConditionalRule(object):
+  """A rule of a TableStyle, which the spreadsheet applies to the table.
+
+  The rule applies to the cells of a column of the table, or of all the
+  columns if the column name is None, in all the rows below the header.
+  """
+
+  column_name = None
+
+  def get_options(self, workbook, first_row):
+    """The options of Sheet.conditional_format for the rule.
+
+    @param first_row: The first row of the cells of the rule in the sheet.
+    """
+    pass
+
+
+class BandedRows(ConditionalRule):
+  """A rule which gives a format to every other row of the table.
+
+  The first row below the header keeps the format of the style, and the
+  second one gets the format of the rule.
+  """
+
+  def __init__(self, format_properties):
+    self.format_properties = format_properties
+
+  def get_options(self, workbook, first_row):
+    # The rows of the formulas are counted from 1.
+    return {'type': 'formula',
+            'criteria': '=MOD(ROW()-%d,2)=1' % (first_row + 1),
+            'format': workbook.get_format(self.format_properties)}
+
+
+class Threshold(ConditionalRule):
+  """A rule which gives a format to the cells of a column over a threshold.
+
+  The criteria is a comparison like '>', '>=', '<', '<=', '==' or '!=' with
+  the value.
+  """
+
+  def __init__(self, column_name, criteria, value, format_properties):
+    self.column_name = column_name
+    self.criteria = criteria
+    self.value = value
+    self.format_properties = format_properties
+
+  def get_options(self, workbook, first_row):
+    return {'type': 'cell', 'criteria': self.criteria, 'value': self.value,
+            'format': workbook.get_format(self.format_properties)}
+
+
+class ColorScale(ConditionalRule):
+  """A rule which colors the cells of a column by their value.
+
+  The colors go from the minimum color for the lowest value to the maximum
+  color for the highest, through the middle color if it's given.
+  """
+
+  def __init__(self, column_name, min_color, max_color, mid_color=None):
+    self.column_name = column_name
+    self.min_color = min_color
+    self.max_color = max_color
+    self.mid_color = mid_color
+
+  def get_options(self, workbook, first_row):
+    if self.mid_color is None:
+      return {'type': '2_color_scale', 'min_color': self.min_color,
+              'max_color': self.max_color}
+    return {'type': '3_color_scale', 'min_color': self.min_color,
+            'mid_color': self.mid_color, 'max_color': self.max_color}
+
+
+class DataBar(ConditionalRule):
+  """A rule which draws a bar in the cells of a column, as long as the value.
+  """
+
+  def __init__(self, column_name, bar_color='#638EC6'):
+    self.column_name = column_name
+    self.bar_color = bar_color
+
+  def get_options(self, workbook, first_row):
+    return {'type': 'data_bar', 'bar_color': self.bar_color}
@@ -4,9 +4,11 @@ __author__ = 'jt@javiertordable.com'
 __copyright__ = "Copyright (C) 2014 Javier Tordable"
 
 
-from style import EmptyStyle, FixedStyle, TableStyle
-from table import Table
+from style import EmptyStyle, FixedStyle, MarkedRowsStyle, Style, TableStyle
+from style import BandedRows, ColorScale, DataBar, Threshold, Uniform
+from table import ColumnarTable, Table
 from xls import MockWorkbook
+import xls
 
 import unittest
 
@@ -27,6 +29,11 @@ class EmptyStyleTest(unittest.TestCase):
   def test_get_cell_format(self):
     self.assertEquals(0, self.style.get_cell_format(0, 0).num_properties())
 
+  def test_get_cell_blocks(self):
+    self.assertEqual(Uniform(None), self.style.get_cell_contents(0, 0, 10, 10))
+    self.assertEqual(Uniform(self.style.get_cell_format(0, 0)),
+                     self.style.get_cell_formats(0, 0, 10, 10))
+
 
 class FixedStyleTest(unittest.TestCase):
   """Tests for FixedStyle."""
@@ -45,6 +52,34 @@ class FixedStyleTest(unittest.TestCase):
     self.assertEquals(BLUE,
                       style.get_cell_format(0, 0).get_property('bg_color'))
 
+  def test_get_cell_blocks(self):
+    style = FixedStyle(self.workbook, 'Blue', BLUE)
+    self.assertEqual(Uniform('Blue'), style.get_cell_contents(5, 5, 100, 1000))
+    self.assertEqual(Uniform(style.get_cell_format(0, 0)),
+                     style.get_cell_formats(5, 5, 100, 1000))
+
+  def test_shared_format(self):
+    styles = [FixedStyle(self.workbook, i, BLUE) for i in range(10)]
+    self.assertIs(styles[0].get_cell_format(0, 0),
+                  styles[9].get_cell_format(0, 0))
+    self.assertEqual(1, self.workbook.format_registry.num_created)
+    self.assertEqual(10, self.workbook.format_registry.num_requested)
+
+  def test_changed_format(self):
+    # A subclass which changes the format, like the styles of earlier versions.
+    class BlueStyle(Style):
+      def __init__(self, workbook):
+        super(BlueStyle, self).__init__(workbook)
+        self._format.set_bg_color(BLUE)
+
+    style = BlueStyle(self.workbook)
+    self.assertEqual(BLUE, style.get_cell_format(0, 0).get_property('bg_color'))
+    empty_format = EmptyStyle(self.workbook).get_cell_format(0, 0)
+    self.assertEqual({}, empty_format.properties)
+    # The shared formats can't be changed.
+    shared_format = FixedStyle(self.workbook, None).get_cell_format(0, 0)
+    self.assertRaises(ValueError, shared_format.set_bg_color, BLUE)
+
 
 class TableStyleTest(unittest.TestCase):
   """Tests for TableStyle."""
@@ -65,6 +100,118 @@ class TableStyleTest(unittest.TestCase):
     self.assertEqual('b', self.style.get_cell_content(1, 1))
     self.assertEqual(1, self.style.get_cell_content(1, 2))
 
+  def test_get_cell_contents(self):
+    self.assertEqual([['Column1', 'Column2'], ['a', 'b'], ['c', 1]],
+                     self.style.get_cell_contents(0, 0, 2, 3))
+    self.assertEqual([['b'], [1]], self.style.get_cell_contents(1, 1, 1, 2))
+    self.assertEqual(Uniform(self.style.get_cell_format(0, 0)),
+                     self.style.get_cell_formats(0, 0, 2, 3))
+
+  def test_get_cell_content_columnar(self):
+    table = ColumnarTable('Table', ['Column1', 'Column2'], [None, 'd'])
+    table.add_row(['a', 1.5])
+    style = TableStyle(self.workbook, table)
+    self.assertEqual('Column2', style.get_cell_content(1, 0))
+    self.assertEqual('a', style.get_cell_content(0, 1))
+    self.assertEqual(1.5, style.get_cell_content(1, 1))
+    self.assertEqual([['Column1', 'Column2'], ['a', 1.5]],
+                     style.get_cell_contents(0, 0, 2, 2))
+
+  def test_get_cell_contents_view(self):
+    table = Table('Table', ['Column1', 'Column2'])
+    for row_index in range(5):
+      table.add_row(['a%d' % row_index, row_index])
+    view = table.sort(['Column2'], reverse=True).slice(0, 2)
+    style = TableStyle(self.workbook, view)
+    self.assertEqual([['Column1', 'Column2'], ['a4', 4], ['a3', 3]],
+                     style.get_cell_contents(0, 0, 2, 3))
+    self.assertEqual([[3]], style.get_cell_contents(1, 2, 1, 1))
+
+  def test_get_conditional_formats(self):
+    self.assertEqual([], self.style.get_conditional_formats((0, 0)))
+    style = TableStyle(self.workbook, self.table, [
+        BandedRows({'bg_color': BLUE}),
+        Threshold('Column2', '>', 10, {'bold': True}),
+        ColorScale('Column1', '#FF0000', '#00FF00'),
+        ColorScale('Column2', '#FF0000', '#00FF00', '#FFFF00'),
+        DataBar('Column2', '#0000FF')])
+    conditional_formats = style.get_conditional_formats((2, 1))
+    self.assertEqual([(2, 2, 3, 3), (2, 3, 3, 3), (2, 2, 3, 2), (2, 3, 3, 3),
+                      (2, 3, 3, 3)],
+                     [conditional_format[:4]
+                      for conditional_format in conditional_formats])
+    options = [conditional_format[4]
+               for conditional_format in conditional_formats]
+    self.assertEqual({'type': 'formula', 'criteria': '=MOD(ROW()-3,2)=1',
+                      'format': self.workbook.get_format({'bg_color': BLUE})},
+                     options[0])
+    self.assertEqual({'type': 'cell', 'criteria': '>', 'value': 10,
+                      'format': self.workbook.get_format({'bold': True})},
+                     options[1])
+    self.assertEqual('2_color_scale', options[2]['type'])
+    self.assertEqual({'type': '3_color_scale', 'min_color': '#FF0000',
+                      'mid_color': '#FFFF00', 'max_color': '#00FF00'},
+                     options[3])
+    self.assertEqual({'type': 'data_bar', 'bar_color': '#0000FF'}, options[4])
+
+    # An empty table has no rows to format.
+    style = TableStyle(self.workbook, Table('Table', ['Column1']),
+                       [BandedRows({'bg_color': BLUE})])
+    self.assertEqual([], style.get_conditional_formats((0, 0)))
+
+  def test_get_cell_types(self):
+    self.assertIsNone(self.style.get_cell_types(0, 1, 2))
+    table = Table('Table', ['Column1', 'Column2'], [xls.STRING, xls.NUMBER])
+    style = TableStyle(self.workbook, table)
+    self.assertIsNone(style.get_cell_types(0, 0, 2))
+    self.assertEqual([xls.STRING, xls.NUMBER], style.get_cell_types(0, 1, 2))
+    self.assertEqual([xls.NUMBER], style.get_cell_types(1, 5, 1))
+    self.assertIsNone(EmptyStyle(self.workbook).get_cell_types(0, 1, 2))
+
+
+class MarkedRowsStyleTest(unittest.TestCase):
+  """Tests for MarkedRowsStyle."""
+
+  def setUp(self):
+    self.table = Table('Table', ['Column1'])
+    for row_index in range(4):
+      self.table.add_row([row_index])
+    self.workbook = MockWorkbook()
+    self.style = MarkedRowsStyle(self.workbook, self.table, [1, 3],
+                                 {'bold': True})
+
+  def test_get_cell_format(self):
+    marked_format = self.workbook.get_format({'bold': True})
+    self.assertIs(marked_format, self.style.get_cell_format(0, 2))
+    self.assertIsNot(marked_format, self.style.get_cell_format(0, 1))
+    self.assertIsNot(marked_format, self.style.get_cell_format(0, 0))
+
+  def test_get_cell_formats(self):
+    cell_format = self.style.get_cell_format(0, 0)
+    marked_format = self.style.get_cell_format(0, 2)
+    self.assertEqual(Uniform(cell_format),
+                     self.style.get_cell_formats(0, 0, 1, 2))
+    self.assertEqual([[marked_format] * 2, [cell_format] * 2,
+                      [marked_format] * 2],
+                     self.style.get_cell_formats(0, 2, 2, 3))
+
+
+class StyleTest(unittest.TestCase):
+  """Tests for the block methods of Style."""
+
+  def test_get_cell_blocks(self):
+    class DiagonalStyle(Style):
+      def get_cell_content(self, column_index, row_index):
+        return column_index == row_index
+
+    workbook = MockWorkbook()
+    style = DiagonalStyle(workbook)
+    self.assertEqual([[False, False], [True, False]],
+                     style.get_cell_contents(1, 0, 2, 2))
+    cell_format = style.get_cell_format(0, 0)
+    self.assertEqual([[cell_format] * 2] * 2,
+                     style.get_cell_formats(1, 0, 2, 2))
+
 
 if __name__ == '__main__':
   unittest.main()
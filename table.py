@@ -4,6 +4,24 @@ __author__ = 'jt@javiertordable.com'
 __copyright__ = "Copyright (C) 2014 Javier Tordable"
 
 
+import array
+import datetime
+import decimal
+import itertools
+import math
+import numbers
+import weakref
+
+import xls
+
+
+# The number of rows read at once by the methods which build views.
+_BLOCK_ROWS = 1000
+
+# The column type of a ColumnarTable column with repeated strings, which are
+# stored once, with an integer code for each cell.
+CATEGORY = 'category'
+
 class Table(object):
   """A table which holds the data of the report.
 
@@ -11,13 +29,39 @@ class Table(object):
   construction and the rows can be added one at a time.
   """
 
-  def __init__(self, name, column_names):
+  def __init__(self, name, column_names, cell_types=None):
+    """Builds an empty table.
+
+    @param cell_types: An optional list with the type of the values of each
+    column, one of xls.CELL_TYPES or None for any value. The rows are checked
+    when they are added, and the sheets can write the values faster.
+    """
     if len(column_names) < 1:
       raise ValueError('Table needs at least one column name.')
+    if cell_types is not None:
+      if len(cell_types) != len(column_names):
+        raise ValueError('Please give one cell type for each column.')
+      for cell_type in cell_types:
+        if cell_type is not None and cell_type not in _CELL_TYPE_CHECKS:
+          raise ValueError('Invalid cell type %s' % cell_type)
 
     self._name = name
     self._column_names = column_names
+    self._column_indexes = dict(
+        (column_name, index) for (index, column_name) in enumerate(column_names))
     self._rows = []
+    self._cell_types = cell_types
+    # The checks of the values of the columns with a cell type.
+    self._value_checks = []
+    for (column_index, cell_type) in enumerate(cell_types or []):
+      if cell_type is not None:
+        self._value_checks.append(
+            (column_index, cell_type, _CELL_TYPE_CHECKS[cell_type]))
+    self._observers = weakref.WeakSet()
+    self._version = 0
+    # The rows changed since clear_dirty_rows, and the version at that time.
+    self._dirty_rows = None
+    self._clean_version = 0
 
   @property
   def name(self):
@@ -31,12 +75,101 @@ class Table(object):
   def num_columns(self):
     return len(self._column_names)
 
+  @property
+  def cell_types(self):
+    """The cell types of the columns, or None if they are not known."""
+    return self._cell_types
+
+  def column_index(self, column_name):
+    """The index of the column with the given name."""
+    if column_name not in self._column_indexes:
+      raise ValueError('There is no column named %s' % column_name)
+    return self._column_indexes[column_name]
+
   def add_row(self, row):
+    self._check_row(row)
+    self._rows.append(row)
+    self._notify_changed(len(self._rows) - 1, len(self._rows) - 1)
+
+  def set_row(self, row_index, row):
+    """Replaces the values of an existing row."""
+    self._check_row(row)
+    self._rows[row_index] = row
+    self._notify_changed(row_index, row_index, resized=False)
+
+  def _check_row(self, row):
     if len(row) != len(self._column_names):
       raise ValueError(
-        'Invalid number of arguments in row. Has %d, should have %d'
-        .format(len(row, len(column_names))))
-    self._rows.append(row)
+        'Invalid number of arguments in row. Has %d, should have %d' %
+        (len(row), len(self._column_names)))
+    for (column_index, cell_type, check) in self._value_checks:
+      value = row[column_index]
+      if value is not None and not check(value):
+        raise ValueError('Invalid value %r for the %s column %s' %
+                         (value, cell_type, self._column_names[column_index]))
+
+  def add_observer(self, observer):
+    """Registers an object to be invalidated whenever the table changes size.
+
+    The invalidate method of the observer is called after every row is added.
+    The changes of the values of a row are only recorded in the version and
+    the dirty rows. The table only keeps a weak reference to the observer.
+    """
+    self._observers.add(observer)
+
+  def __getstate__(self):
+    # The observers are not pickled, as they are only weakly referenced.
+    state = dict(self.__dict__)
+    del state['_observers']
+    return state
+
+  def __setstate__(self, state):
+    self.__dict__.update(state)
+    self._observers = weakref.WeakSet()
+
+  def _notify_changed(self, first_row, last_row, resized=True):
+    """Records a change in a range of rows, and invalidates the observers if
+    the number of rows changed.
+    """
+    self._version += 1
+    if self._dirty_rows is None:
+      self._dirty_rows = (first_row, last_row)
+    else:
+      self._dirty_rows = (min(first_row, self._dirty_rows[0]),
+                          max(last_row, self._dirty_rows[1]))
+    if resized and self._observers:
+      for observer in list(self._observers):
+        observer.invalidate()
+
+  @property
+  def version(self):
+    """A number which is increased every time the table changes."""
+    return self._version
+
+  @property
+  def dirty_rows(self):
+    """The rows changed since clear_dirty_rows, as (first_row, last_row).
+
+    It's None if no row has changed.
+    """
+    return self._dirty_rows
+
+  def clear_dirty_rows(self):
+    """Starts a new range of dirty rows."""
+    self._dirty_rows = None
+    self._clean_version = self._version
+
+  def changed_rows(self, since_version):
+    """The rows changed after the given version, as (first_row, last_row).
+
+    Returns None if the table hasn't changed. The range may include rows which
+    haven't changed, if the dirty rows were cleared after the given version.
+    """
+    if since_version >= self._version:
+      return None
+    if since_version >= self._clean_version:
+      return self._dirty_rows
+    return (0, self.num_rows - 1)
 
   @property
   def num_rows(self):
@@ -46,13 +179,538 @@ class Table(object):
     return self._rows[row_index][column_index]
 
   def get(self, column_name, row_index):
-    column_index = self._column_names.index(column_name)
-    return self._rows[row_index][column_index]
+    return self.get_by_index(self.column_index(column_name), row_index)
+
+  def get_block(self, first_column, first_row, num_columns, num_rows):
+    """The values of a block of cells, as a list of rows.
+
+    Each row is a list with the values of num_columns columns, starting at
+    first_column.
+    """
+    last_column = first_column + num_columns
+    return [list(row[first_column:last_column])
+            for row in self._rows[first_row:first_row + num_rows]]
+
+  def get_rows(self, row_indexes, column_indexes):
+    """The values of the given rows and columns, as a list of rows.
+
+    The rows and columns are given as sequences of indexes, in any order.
+    """
+    rows = self._rows
+    return [[row[column_index] for column_index in column_indexes]
+            for row in map(rows.__getitem__, row_indexes)]
+
+  def _iter_rows(self):
+    """Iterates over the rows in place, as sequences which must not change."""
+    return iter(self._rows)
+
+  def slice(self, first_row, num_rows=None):
+    """A TableView of num_rows rows from first_row, or all the rows after it.
+    """
+    if num_rows is None:
+      last_row = None
+    else:
+      last_row = first_row + num_rows
+    return self._view(range(self.num_rows)[first_row:last_row], None)
+
+  def project(self, column_names):
+    """A TableView with only the given columns, in the given order."""
+    return self._view(None, [self.column_index(column_name)
+                             for column_name in column_names])
+
+  def filter(self, predicate):
+    """A TableView with only the rows for which the predicate is true.
+
+    The predicate is called with each row, as a sequence of values which it
+    must not change.
+    """
+    self._check_read_again('filtered')
+    # Only the indexes of the matching rows are stored.
+    row_indexes = array.array('q', itertools.compress(
+        itertools.count(), map(predicate, self._iter_rows())))
+    return self._view(row_indexes, None)
+
+  def sort(self, column_names, reverse=False):
+    """A TableView with the rows sorted by the values of the given columns.
+
+    The sort is stable. The None values are greater than all the others, so
+    they go last, or first in a reverse sort.
+    """
+    self._check_read_again('sorted')
+    column_indexes = [self.column_index(column_name)
+                      for column_name in column_names]
+    keys = []
+    num_rows = self.num_rows
+    for first_row in range(0, num_rows, _BLOCK_ROWS):
+      rows = self.get_rows(range(first_row,
+                                 min(first_row + _BLOCK_ROWS, num_rows)),
+                           column_indexes)
+      keys.extend([tuple([(value is None, value) for value in row])
+                   for row in rows])
+    order = sorted(range(num_rows), key=keys.__getitem__, reverse=reverse)
+    return self._view(array.array('q', order), None)
+
+  # Whether the rows can only be read once, in order.
+  _read_once = False
+
+  def _check_read_again(self, operation):
+    """Raises a ValueError if the rows of the table can only be read once.
+
+    Filtering or sorting reads all the rows, so they couldn't be drawn after.
+    """
+    if self._read_once:
+      raise ValueError('The rows of the table %s can only be read once, so '
+                       'it can not be %s.' % (self.name, operation))
+
+  def _view(self, row_indexes, column_indexes):
+    """A TableView of some rows and columns, or all of them if None."""
+    if row_indexes is None:
+      row_indexes = range(self.num_rows)
+    if column_indexes is None:
+      column_indexes = list(range(self.num_columns))
+    return TableView(self, row_indexes, column_indexes)
 
   def __str__(self):
-    ret = ','.join(self._column_names)
-    for row in self._rows:
-      ret += '\n'
-      row_values = [str(item) for item in row]
-      ret += ','.join(row_values)
-    return ret
+    lines = [','.join(self._column_names)]
+    for row_index in range(self.num_rows):
+      row_values = [str(self.get_by_index(column_index, row_index))
+                    for column_index in range(self.num_columns)]
+      lines.append(','.join(row_values))
+    return '\n'.join(lines)
+
+
+class ColumnarTable(Table):
+  """A table which stores the data by columns, in typed arrays.
+
+  The type of each column is given by an array.array typecode, for example 'd'
+  for floating point numbers or 'q' for integers, which use 8 bytes per cell.
+  Columns with a type of CATEGORY hold strings with many repeated values, like
+  countries or status names, which are stored once. Columns with a type of
+  None hold any Python value. The table has the same interface as a Table, so
+  it can be used with a TableStyle and TableLayout.
+  """
+
+  def __init__(self, name, column_names, column_types=None, cell_types=None):
+    super(ColumnarTable, self).__init__(name, column_names, cell_types)
+    if column_types is None:
+      column_types = [None] * len(column_names)
+    if len(column_types) != len(column_names):
+      raise ValueError('Please give one type for each column.')
+
+    self._rows = None
+    self._column_types = column_types
+    self._columns = []
+    for column_type in column_types:
+      if column_type is None:
+        self._columns.append([])
+      elif column_type == CATEGORY:
+        self._columns.append(_CategoryColumn())
+      else:
+        self._columns.append(array.array(column_type))
+    self._num_rows = 0
+
+  @property
+  def column_types(self):
+    return self._column_types
+
+  def add_row(self, row):
+    self._check_row(row)
+    for (column_index, value) in enumerate(row):
+      try:
+        self._columns[column_index].append(value)
+      except (TypeError, OverflowError):
+        # Remove the values already added, to keep all columns the same length.
+        for column in self._columns[:column_index]:
+          column.pop()
+        raise ValueError('Invalid value %r for column %s' %
+                         (value, self._column_names[column_index]))
+    self._num_rows += 1
+    self._notify_changed(self._num_rows - 1, self._num_rows - 1)
+
+  def set_row(self, row_index, row):
+    self._check_row(row)
+    old_row = [column[row_index] for column in self._columns]
+    for (column_index, value) in enumerate(row):
+      try:
+        self._columns[column_index][row_index] = value
+      except (TypeError, OverflowError):
+        # Restore the values already changed.
+        for (index, old_value) in enumerate(old_row[:column_index]):
+          self._columns[index][row_index] = old_value
+        raise ValueError('Invalid value %r for column %s' %
+                         (value, self._column_names[column_index]))
+    self._notify_changed(row_index, row_index, resized=False)
+
+  @property
+  def num_rows(self):
+    return self._num_rows
+
+  def get_by_index(self, column_index, row_index):
+    return self._columns[column_index][row_index]
+
+  def get_column(self, column_index):
+    """The values of a column, as a sequence which must not be changed.
+
+    The sequence is an array, a list, or for the CATEGORY columns an object
+    which can be indexed and sliced like a list.
+    """
+    return self._columns[column_index]
+
+  def get_categories(self, column_index):
+    """The distinct values and the codes of the cells of a CATEGORY column.
+
+    Returns a tuple (values, codes), where values is a list with each value
+    once, and codes an array with the index in values of each cell. Neither
+    must be changed.
+    """
+    column = self._columns[column_index]
+    if not isinstance(column, _CategoryColumn):
+      raise ValueError('The column %s is not a category column' %
+                       self._column_names[column_index])
+    return (column.values, column.codes)
+
+  def get_block(self, first_column, first_row, num_columns, num_rows):
+    # Slice the columns, and transpose the slices into rows.
+    last_row = first_row + num_rows
+    column_slices = [column[first_row:last_row] for column in
+                     self._columns[first_column:first_column + num_columns]]
+    return [list(row) for row in zip(*column_slices)]
+
+  def get_rows(self, row_indexes, column_indexes):
+    # Gather the values of each column, and transpose them into rows.
+    column_values = []
+    for column_index in column_indexes:
+      column = self._columns[column_index]
+      column_values.append([column[row_index] for row_index in row_indexes])
+    return [list(row) for row in zip(*column_values)]
+
+  def _iter_rows(self):
+    return zip(*self._columns)
+
+
+class TableView(Table):
+  """A view of some of the rows and columns of a table, without copying them.
+
+  Views are built with the slice, project, filter and sort methods of a table
+  or another view, and can be drawn like any table. A view only holds the
+  indexes of its rows and columns in the source table, and a view of a view
+  maps its indexes directly to the source table. The rows of a slice are kept
+  in a range, which takes constant memory.
+
+  The view shows the current values of the rows of the source table, but it
+  doesn't include the rows added after it was built. The rows of a view of a
+  StreamingTable can only be read once and in order, like the source table.
+  """
+
+  def __init__(self, source, row_indexes, column_indexes):
+    column_names = [source.column_names[column_index]
+                    for column_index in column_indexes]
+    cell_types = source.cell_types
+    if cell_types is not None:
+      cell_types = [cell_types[column_index]
+                    for column_index in column_indexes]
+    super(TableView, self).__init__(source.name, column_names, cell_types)
+    self._rows = None
+    self._source = source
+    self._row_indexes = row_indexes
+    self._source_columns = column_indexes
+
+  @property
+  def source(self):
+    """The table with the values of the view, which is never a view."""
+    return self._source
+
+  @property
+  def row_indexes(self):
+    """The indexes of the rows of the view in the source table."""
+    return self._row_indexes
+
+  @property
+  def column_indexes(self):
+    """The indexes of the columns of the view in the source table."""
+    return self._source_columns
+
+  def add_row(self, row):
+    raise ValueError('Rows can not be added to a TableView.')
+
+  def set_row(self, row_index, row):
+    raise ValueError('Rows can not be changed in a TableView.')
+
+  def add_observer(self, observer):
+    """Registers an object to be invalidated whenever the source changes."""
+    self._source.add_observer(observer)
+
+  @property
+  def version(self):
+    return self._source.version
+
+  @property
+  def dirty_rows(self):
+    """All the rows of the view if the source has dirty rows, or None."""
+    if self._source.dirty_rows is None or not self.num_rows:
+      return None
+    return (0, self.num_rows - 1)
+
+  def clear_dirty_rows(self):
+    # The dirty rows belong to the source, which may have other users.
+    pass
+
+  def changed_rows(self, since_version):
+    if since_version >= self._source.version or not self.num_rows:
+      return None
+    return (0, self.num_rows - 1)
+
+  @property
+  def num_rows(self):
+    return len(self._row_indexes)
+
+  def get_by_index(self, column_index, row_index):
+    return self._source.get_by_index(self._source_columns[column_index],
+                                     self._row_indexes[row_index])
+
+  def get_block(self, first_column, first_row, num_columns, num_rows):
+    row_indexes = self._row_indexes[first_row:first_row + num_rows]
+    column_indexes = self._source_columns[first_column:
+                                          first_column + num_columns]
+    if isinstance(row_indexes, range) and row_indexes.step == 1 and \
+          column_indexes and _is_consecutive(column_indexes):
+      # A block of the view is also a block of the source.
+      return self._source.get_block(column_indexes[0], row_indexes.start,
+                                    len(column_indexes), len(row_indexes))
+    return self._source.get_rows(row_indexes, column_indexes)
+
+  def get_rows(self, row_indexes, column_indexes):
+    return self._source.get_rows(
+        [self._row_indexes[row_index] for row_index in row_indexes],
+        [self._source_columns[column_index]
+         for column_index in column_indexes])
+
+  @property
+  def _read_once(self):
+    return self._source._read_once
+
+  def _iter_rows(self):
+    # The rows of the view are gathered from the source, a block at a time.
+    num_rows = self.num_rows
+    for first_row in range(0, num_rows, _BLOCK_ROWS):
+      for row in self.get_block(0, first_row, self.num_columns,
+                                min(_BLOCK_ROWS, num_rows - first_row)):
+        yield row
+
+  def _view(self, row_indexes, column_indexes):
+    if row_indexes is None:
+      row_indexes = self._row_indexes
+    elif isinstance(row_indexes, range):
+      # A slice of a range is a range, and of an array an array.
+      row_indexes = self._row_indexes[row_indexes.start:row_indexes.stop:
+                                      row_indexes.step]
+    else:
+      row_indexes = array.array('q', map(self._row_indexes.__getitem__,
+                                         row_indexes))
+    if column_indexes is None:
+      column_indexes = self._source_columns
+    else:
+      column_indexes = [self._source_columns[column_index]
+                        for column_index in column_indexes]
+    return TableView(self._source, row_indexes, column_indexes)
+
+
+def _is_consecutive(indexes):
+  """Whether a non empty list of indexes are consecutive and increasing."""
+  first_index = indexes[0]
+  return all(index == first_index + offset
+             for (offset, index) in enumerate(indexes))
+
+
+class _CategoryColumn(object):
+  """A column of strings, stored as codes into a list of distinct values.
+
+  It has the methods of an array which are used by ColumnarTable. The values
+  can be strings or None.
+  """
+
+  def __init__(self):
+    self.values = []
+    self.codes = array.array('I')
+    self._value_codes = {}
+
+  def _code(self, value):
+    code = self._value_codes.get(value)
+    if code is None:
+      if value is not None and not isinstance(value, str):
+        raise TypeError('Only strings can be stored in a category column')
+      code = len(self.values)
+      self.values.append(value)
+      self._value_codes[value] = code
+    return code
+
+  def append(self, value):
+    self.codes.append(self._code(value))
+
+  def pop(self):
+    return self.values[self.codes.pop()]
+
+  def __len__(self):
+    return len(self.codes)
+
+  def __iter__(self):
+    return map(self.values.__getitem__, self.codes)
+
+  def __getitem__(self, index):
+    values = self.values
+    if isinstance(index, slice):
+      return [values[code] for code in self.codes[index]]
+    return values[self.codes[index]]
+
+  def __setitem__(self, index, value):
+    self.codes[index] = self._code(value)
+
+
+class StreamingTable(Table):
+  """A table which reads its rows from an iterator, as they are needed.
+
+  The rows are not kept in memory, so they can only be read once and in
+  order, as TableLayout and the renderers do. Reading a row before the last
+  one read raises a ValueError. The number of rows has to be known in advance,
+  because it determines the size of the layouts.
+
+  For the same reason, the table and its views can't be filtered or sorted.
+  """
+
+  def __init__(self, name, column_names, rows, num_rows, cell_types=None):
+    super(StreamingTable, self).__init__(name, column_names, cell_types)
+    if num_rows is None or num_rows < 0:
+      raise ValueError('Please give the number of rows of the table.')
+
+    self._rows = None
+    self._row_iterator = iter(rows)
+    self._num_rows = num_rows
+    self._row_index = -1
+    self._current_row = None
+
+  @classmethod
+  def from_cursor(cls, name, cursor, num_rows, batch_size=1000,
+                  cell_types=None):
+    """Builds a table with the result of a query in a DB-API cursor.
+
+    The column names are taken from the cursor description, and the rows are
+    fetched in batches of batch_size rows.
+    """
+    column_names = [column[0] for column in cursor.description]
+    return cls(name, column_names, _fetch_rows(cursor, batch_size), num_rows,
+               cell_types)
+
+  @classmethod
+  def from_query(cls, name, connection, query, parameters=(),
+                 batch_size=1000, cell_types=None):
+    """Builds a table with the result of a query in a DB-API connection.
+
+    The number of rows is counted by the database before running the query.
+    The query must be valid as a subquery, and use the parameter style of the
+    database, for example '?' in sqlite3.
+    """
+    cursor = connection.cursor()
+    # MySQL and PostgreSQL before 16 need an alias for the subquery.
+    cursor.execute('SELECT COUNT(*) FROM (%s) AS _counted_rows' % query,
+                   parameters)
+    num_rows = cursor.fetchone()[0]
+    cursor.execute(query, parameters)
+    return cls.from_cursor(name, cursor, num_rows, batch_size, cell_types)
+
+  _read_once = True
+
+  def add_row(self, row):
+    raise ValueError('Rows can not be added to a StreamingTable.')
+
+  def set_row(self, row_index, row):
+    raise ValueError('Rows can not be changed in a StreamingTable.')
+
+  @property
+  def num_rows(self):
+    return self._num_rows
+
+  def get_by_index(self, column_index, row_index):
+    if row_index != self._row_index:
+      self._advance_to(row_index)
+    return self._current_row[column_index]
+
+  def get_block(self, first_column, first_row, num_columns, num_rows):
+    last_column = first_column + num_columns
+    rows = []
+    for row_index in range(first_row, first_row + num_rows):
+      if row_index != self._row_index:
+        self._advance_to(row_index)
+      rows.append(list(self._current_row[first_column:last_column]))
+    return rows
+
+  def get_rows(self, row_indexes, column_indexes):
+    rows = []
+    for row_index in row_indexes:
+      if row_index != self._row_index:
+        self._advance_to(row_index)
+      row = self._current_row
+      rows.append([row[column_index] for column_index in column_indexes])
+    return rows
+
+  def _advance_to(self, row_index):
+    if row_index < self._row_index:
+      raise ValueError(
+          'The rows of a StreamingTable can only be read once and in order. '
+          'Row %d was requested after row %d.' % (row_index, self._row_index))
+    if row_index >= self._num_rows:
+      raise IndexError('Row index out of range')
+
+    while self._row_index < row_index:
+      try:
+        row = next(self._row_iterator)
+      except StopIteration:
+        raise ValueError('The table %s has %d rows instead of %d.' %
+                         (self._name, self._row_index + 1, self._num_rows))
+      self._check_row(row)
+      self._current_row = row
+      self._row_index += 1
+
+
+def _is_number(value):
+  # The sheets can't store NaN or the infinities as numbers.
+  if isinstance(value, decimal.Decimal):
+    return value.is_finite()
+  if isinstance(value, numbers.Integral):
+    return not isinstance(value, bool)
+  return isinstance(value, numbers.Real) and math.isfinite(value)
+
+
+def _is_string(value):
+  return isinstance(value, str)
+
+
+def _is_date(value):
+  return isinstance(value, (datetime.date, datetime.time, datetime.timedelta))
+
+
+def _is_boolean(value):
+  return isinstance(value, bool)
+
+
+def _is_formula(value):
+  return isinstance(value, str) and value.startswith('=')
+
+
+# The check of the values of each cell type.
+_CELL_TYPE_CHECKS = {
+    xls.NUMBER: _is_number,
+    xls.STRING: _is_string,
+    xls.DATE: _is_date,
+    xls.BOOLEAN: _is_boolean,
+    xls.FORMULA: _is_formula,
+}
+
+
+def _fetch_rows(cursor, batch_size):
+  """Yields the rows of a DB-API cursor, fetching them in batches."""
+  while True:
+    rows = cursor.fetchmany(batch_size)
+    if not rows:
+      break
+    for row in rows:
+      yield row
@@ -4,10 +4,25 @@ __author__ = 'jt@javiertordable.com'
 __copyright__ = "Copyright (C) 2014 Javier Tordable"
 
 
-from table import Table
+from table import CATEGORY, ColumnarTable, StreamingTable, Table
+import xls
+
+import decimal
+import pickle
+import sqlite3
 import unittest
 
 
+class Observer(object):
+  """An observer which counts the number of times it was invalidated."""
+
+  def __init__(self):
+    self.num_invalidations = 0
+
+  def invalidate(self):
+    self.num_invalidations += 1
+
+
 class TableTest(unittest.TestCase):
   """Tests for Table."""
 
@@ -30,6 +45,13 @@ class TableTest(unittest.TestCase):
     self.assertEquals('d', self.table.get('Column1', 2))
     self.assertEquals(2, self.table.get('Column2', 2))
 
+  def test_add_observer(self):
+    observer = Observer()
+    self.table.add_observer(observer)
+    self.table.add_row(['d', 2])
+    self.table.add_row(['e', 3])
+    self.assertEqual(2, observer.num_invalidations)
+
   def test_num_rows(self):
     self.assertEquals(2, self.table.num_rows)
 
@@ -44,9 +66,94 @@ class TableTest(unittest.TestCase):
   def test_get_invalid_column(self):
     self.assertRaises(ValueError, self.table.get, 'InvalidColumn', 0)
 
+  def test_get_block(self):
+    self.assertEqual([['a', 'b']], self.table.get_block(0, 0, 2, 1))
+    self.assertEqual([['b'], [1]], self.table.get_block(1, 0, 1, 2))
+
+  def test_set_row(self):
+    self.table.set_row(0, ['x', 'y'])
+    self.assertEqual('y', self.table.get('Column2', 0))
+    self.assertRaises(ValueError, self.table.set_row, 0, ['x'])
+
+  def test_version(self):
+    observer = Observer()
+    self.table.add_observer(observer)
+    version = self.table.version
+    self.table.set_row(1, ['d', 2])
+    self.assertEqual(version + 1, self.table.version)
+    # The size of the table doesn't change.
+    self.assertEqual(0, observer.num_invalidations)
+    self.table.add_row(['e', 3])
+    self.assertEqual(version + 2, self.table.version)
+    self.assertEqual(1, observer.num_invalidations)
+
+  def test_pickle(self):
+    observer = Observer()
+    self.table.add_observer(observer)
+    table = pickle.loads(pickle.dumps(self.table))
+    self.assertEqual(str(self.table), str(table))
+    self.assertEqual(self.table.version, table.version)
+    # The observers are not pickled.
+    table.add_row(['e', 3])
+    self.assertEqual(0, observer.num_invalidations)
+    self.table.add_row(['e', 3])
+    self.assertEqual(1, observer.num_invalidations)
+
+    columnar_table = ColumnarTable('Columnar', ['Name', 'Count'],
+                                   [CATEGORY, 'q'], [xls.STRING, xls.NUMBER])
+    columnar_table.add_row(['a', 1])
+    columnar_table.add_row(['a', 2])
+    view = pickle.loads(pickle.dumps(columnar_table.filter(
+        lambda row: row[1] > 1)))
+    self.assertEqual('Name,Count\na,2', str(view))
+    self.assertEqual((['a'], [0, 0]),
+                     tuple(list(values) for values in
+                           view.source.get_categories(0)))
+
+  def test_dirty_rows(self):
+    self.table.clear_dirty_rows()
+    version = self.table.version
+    self.assertIsNone(self.table.dirty_rows)
+    self.assertIsNone(self.table.changed_rows(version))
+
+    self.table.add_row(['e', 2])
+    self.table.set_row(1, ['d', 3])
+    self.assertEqual((1, 2), self.table.dirty_rows)
+    self.assertEqual((1, 2), self.table.changed_rows(version))
+    self.assertIsNone(self.table.changed_rows(self.table.version))
+
+    # After clearing, the older versions see the whole table as changed.
+    self.table.clear_dirty_rows()
+    self.table.set_row(2, ['e', 4])
+    self.assertEqual((2, 2), self.table.dirty_rows)
+    self.assertEqual((0, 2), self.table.changed_rows(version))
+
   def test_get_invalid_row(self):
     self.assertRaises(IndexError, self.table.get, 'Column1', 5)
 
+  def test_cell_types(self):
+    self.assertIsNone(self.table.cell_types)
+    table = Table('Table', ['Name', 'Count', 'Done'],
+                  [xls.STRING, xls.NUMBER, None])
+    self.assertEqual([xls.STRING, xls.NUMBER, None], table.cell_types)
+    table.add_row(['a', 1.5, 'yes'])
+    table.add_row([None, 2, None])
+    self.assertRaises(ValueError, table.add_row, ['a', 'b', 'c'])
+    self.assertRaises(ValueError, table.add_row, ['a', True, 'c'])
+    self.assertRaises(ValueError, table.add_row, ['a', 1j, 'c'])
+    self.assertRaises(ValueError, table.add_row, ['a', float('nan'), 'c'])
+    self.assertRaises(ValueError, table.add_row, ['a', float('-inf'), 'c'])
+    self.assertRaises(ValueError, table.add_row,
+                      ['a', decimal.Decimal('Infinity'), 'c'])
+    table.add_row(['b', decimal.Decimal('2.5'), 'c'])
+    table.add_row(['b', 2 ** 80, 'c'])
+    self.assertRaises(ValueError, table.set_row, 0, [1, 1, 'c'])
+    self.assertEqual(4, table.num_rows)
+
+  def test_invalid_cell_types(self):
+    self.assertRaises(ValueError, Table, 'Table', ['A', 'B'], [xls.NUMBER])
+    self.assertRaises(ValueError, Table, 'Table', ['A'], ['integer'])
+
   def test_str(self):
     self.assertEquals('Column1,Column2\n' +
                       'a,b\n' +
@@ -54,5 +161,254 @@ class TableTest(unittest.TestCase):
                       str(self.table))
 
 
+class ColumnarTableTest(unittest.TestCase):
+  """Tests for ColumnarTable."""
+
+  def setUp(self):
+    self.table = ColumnarTable('Table', ['Name', 'Count', 'Price'],
+                               [None, 'q', 'd'])
+    self.table.add_row(['a', 1, 1.5])
+    self.table.add_row(['b', 2, 2.5])
+
+  def test_columns(self):
+    self.assertEqual('Table', self.table.name)
+    self.assertEqual(['Name', 'Count', 'Price'], self.table.column_names)
+    self.assertEqual([None, 'q', 'd'], self.table.column_types)
+    self.assertEqual(3, self.table.num_columns)
+    self.assertEqual(2, self.table.column_index('Price'))
+
+  def test_invalid_column_types(self):
+    self.assertRaises(ValueError, ColumnarTable, 'Table', ['A', 'B'], ['d'])
+
+  def test_add_rows(self):
+    self.table.add_row(['c', 3, 3.5])
+    self.assertEqual(3, self.table.num_rows)
+    self.assertEqual('c', self.table.get('Name', 2))
+    self.assertEqual(3, self.table.get('Count', 2))
+    self.assertEqual(3.5, self.table.get('Price', 2))
+
+  def test_add_invalid_row(self):
+    self.assertRaises(ValueError, self.table.add_row, ['c', 3])
+    self.assertRaises(ValueError, self.table.add_row, ['c', 3, 'x'])
+    self.assertRaises(ValueError, self.table.add_row, ['c', 'x', 3.5])
+    self.assertEqual(2, self.table.num_rows)
+    self.assertEqual(2, len(self.table.get_column(0)))
+    self.assertEqual(2, len(self.table.get_column(1)))
+
+  def test_typed_storage(self):
+    self.assertEqual(8, self.table.get_column(1).itemsize)
+    self.assertEqual(8, self.table.get_column(2).itemsize)
+    self.assertEqual([1.5, 2.5], list(self.table.get_column(2)))
+
+  def test_get_by_index(self):
+    self.assertEqual('b', self.table.get_by_index(0, 1))
+    self.assertEqual(1, self.table.get_by_index(1, 0))
+    self.assertRaises(IndexError, self.table.get_by_index, 2, 2)
+
+  def test_set_row(self):
+    self.table.set_row(1, ['c', 3, 3.5])
+    self.assertEqual(3, self.table.get('Count', 1))
+    self.assertEqual((0, 1), self.table.dirty_rows)
+    self.assertRaises(ValueError, self.table.set_row, 0, ['x', 5, 'y'])
+    self.assertEqual('a', self.table.get('Name', 0))
+    self.assertEqual(1, self.table.get('Count', 0))
+
+  def test_get_block(self):
+    self.assertEqual([[1, 1.5], [2, 2.5]], self.table.get_block(1, 0, 2, 2))
+    self.assertEqual([['b']], self.table.get_block(0, 1, 1, 1))
+
+  def test_get_invalid_column(self):
+    self.assertRaises(ValueError, self.table.get, 'InvalidColumn', 0)
+
+  def test_add_observer(self):
+    observer = Observer()
+    self.table.add_observer(observer)
+    self.table.add_row(['c', 3, 3.5])
+    self.assertEqual(1, observer.num_invalidations)
+
+  def test_category_column(self):
+    table = ColumnarTable('Table', ['Country', 'Count'], [CATEGORY, 'q'])
+    for (country, count) in [('US', 1), ('ES', 2), ('US', 3), (None, 4)]:
+      table.add_row([country, count])
+    (values, codes) = table.get_categories(0)
+    self.assertEqual(['US', 'ES', None], values)
+    self.assertEqual([0, 1, 0, 2], list(codes))
+    self.assertEqual('ES', table.get('Country', 1))
+    self.assertEqual([['US', 3], [None, 4]], table.get_block(0, 2, 2, 2))
+    self.assertRaises(ValueError, table.get_categories, 1)
+
+    table.set_row(3, ['FR', 4])
+    self.assertEqual(['US', 'ES', None, 'FR'], values)
+    self.assertEqual([0, 1, 0, 3], list(codes))
+    self.assertRaises(ValueError, table.add_row, [1, 5])
+    self.assertRaises(ValueError, table.add_row, ['US', 'a'])
+    self.assertEqual(4, table.num_rows)
+    self.assertEqual(4, len(table.get_column(0)))
+
+  def test_str(self):
+    self.assertEqual('Name,Count,Price\n' +
+                     'a,1,1.5\n' +
+                     'b,2,2.5',
+                     str(self.table))
+
+
+class TableViewTest(unittest.TestCase):
+  """Tests for TableView, and the methods of the tables which build them."""
+
+  def setUp(self):
+    self.table = Table('Table', ['Name', 'Count', 'Price'],
+                       [xls.STRING, xls.NUMBER, xls.NUMBER])
+    for (name, count, price) in [('a', 3, 1.5), ('b', 1, None), ('c', 2, 0.5),
+                                 ('d', 1, 2.5), ('e', 5, 1.0)]:
+      self.table.add_row([name, count, price])
+
+  def test_slice(self):
+    view = self.table.slice(1, 3)
+    self.assertEqual('Table', view.name)
+    self.assertEqual(3, view.num_rows)
+    self.assertEqual(range(1, 4), view.row_indexes)
+    self.assertEqual('b', view.get_by_index(0, 0))
+    self.assertEqual([['c', 2], ['d', 1]], view.get_block(0, 1, 2, 2))
+    self.assertEqual(range(3, 5), self.table.slice(3).row_indexes)
+
+  def test_project(self):
+    view = self.table.project(['Price', 'Name'])
+    self.assertEqual(['Price', 'Name'], view.column_names)
+    self.assertEqual([xls.NUMBER, xls.STRING], view.cell_types)
+    self.assertEqual(1, view.column_index('Name'))
+    self.assertEqual([[1.5, 'a'], [None, 'b']], view.get_block(0, 0, 2, 2))
+    self.assertEqual([['a'], ['b']], view.get_block(1, 0, 1, 2))
+
+  def test_filter(self):
+    view = self.table.filter(lambda row: row[1] < 3)
+    self.assertEqual([1, 2, 3], list(view.row_indexes))
+    self.assertEqual([['b'], ['c'], ['d']], view.get_block(0, 0, 1, 3))
+
+  def test_sort(self):
+    view = self.table.sort(['Count'])
+    self.assertEqual(['b', 'd', 'c', 'a', 'e'],
+                     [row[0] for row in view.get_block(0, 0, 1, 5)])
+    view = self.table.sort(['Price'], reverse=True)
+    self.assertEqual(['b', 'd', 'a', 'e', 'c'],
+                     [row[0] for row in view.get_block(0, 0, 1, 5)])
+
+  def test_compose(self):
+    view = self.table.sort(['Count']).slice(1, 3).project(['Name', 'Count'])
+    view = view.filter(lambda row: row[0] != 'c').slice(1)
+    self.assertIs(self.table, view.source)
+    self.assertEqual([0], list(view.row_indexes))
+    self.assertEqual([0, 1], view.column_indexes)
+    self.assertEqual([['a', 3]], view.get_block(0, 0, 2, 1))
+
+    # Slices of slices are still ranges.
+    view = self.table.slice(1).slice(1, 2).project(['Count'])
+    self.assertEqual(range(2, 4), view.row_indexes)
+    self.assertEqual([[2], [1]], view.get_block(0, 0, 1, 2))
+
+  def test_source_changes(self):
+    view = self.table.slice(0, 2)
+    observer = Observer()
+    view.add_observer(observer)
+    version = view.version
+    self.table.set_row(1, ['x', 0, 0.0])
+    self.assertEqual('x', view.get('Name', 1))
+    self.assertEqual(0, observer.num_invalidations)
+    self.assertEqual((0, 1), view.changed_rows(version))
+    self.assertIsNone(view.changed_rows(view.version))
+    self.table.add_row(['f', 1, 1.0])
+    self.assertEqual(1, observer.num_invalidations)
+    self.assertRaises(ValueError, view.add_row, ['f', 1, 1.0])
+    self.assertRaises(ValueError, view.set_row, 0, ['f', 1, 1.0])
+
+  def test_columnar_table(self):
+    table = ColumnarTable('Table', ['Name', 'Count'], [CATEGORY, 'q'])
+    for row_index in range(10):
+      table.add_row(['n%d' % (row_index % 3), row_index])
+    view = table.filter(lambda row: row[0] == 'n1').sort(['Count'],
+                                                         reverse=True)
+    self.assertEqual([['n1', 7], ['n1', 4], ['n1', 1]],
+                     view.get_block(0, 0, 2, 3))
+    self.assertEqual('Name,Count\nn1,7\nn1,4\nn1,1', str(view))
+
+
+class StreamingTableTest(unittest.TestCase):
+  """Tests for StreamingTable."""
+
+  def setUp(self):
+    rows = (['r%d' % i, i] for i in range(5))
+    self.table = StreamingTable('Table', ['Name', 'Value'], rows, 5)
+
+    self.connection = sqlite3.connect(':memory:')
+    self.connection.execute('CREATE TABLE Data (Name TEXT, Value INTEGER)')
+    self.connection.executemany('INSERT INTO Data VALUES (?, ?)',
+                                [('a', 1), ('b', 2), ('c', 3)])
+
+  def tearDown(self):
+    self.connection.close()
+
+  def test_columns(self):
+    self.assertEqual(['Name', 'Value'], self.table.column_names)
+    self.assertEqual(2, self.table.num_columns)
+    self.assertEqual(5, self.table.num_rows)
+
+  def test_invalid_num_rows(self):
+    self.assertRaises(ValueError, StreamingTable, 'Table', ['Name'], [], None)
+
+  def test_read_in_order(self):
+    self.assertEqual('r0', self.table.get_by_index(0, 0))
+    self.assertEqual(0, self.table.get('Value', 0))
+    self.assertEqual('r2', self.table.get_by_index(0, 2))
+    self.assertEqual(2, self.table.get_by_index(1, 2))
+    self.assertEqual(4, self.table.get_by_index(1, 4))
+    self.assertRaises(IndexError, self.table.get_by_index, 0, 5)
+
+  def test_get_block(self):
+    self.assertEqual([['r0', 0], ['r1', 1]], self.table.get_block(0, 0, 2, 2))
+    self.assertEqual([[2]], self.table.get_block(1, 2, 1, 1))
+    self.assertRaises(ValueError, self.table.get_block, 0, 0, 1, 1)
+
+  def test_read_backwards(self):
+    self.table.get_by_index(0, 2)
+    self.assertRaises(ValueError, self.table.get_by_index, 0, 1)
+
+  def test_too_few_rows(self):
+    table = StreamingTable('Table', ['Name'], [['a']], 2)
+    self.assertEqual('a', table.get_by_index(0, 0))
+    self.assertRaises(ValueError, table.get_by_index, 0, 1)
+
+  def test_invalid_row(self):
+    table = StreamingTable('Table', ['Name'], [['a', 'b']], 1)
+    self.assertRaises(ValueError, table.get_by_index, 0, 0)
+
+  def test_filter_and_sort(self):
+    self.assertRaises(ValueError, self.table.filter, lambda row: row[1] > 2)
+    self.assertRaises(ValueError, self.table.sort, ['Value'])
+    view = self.table.slice(1, 3)
+    self.assertRaises(ValueError, view.filter, lambda row: row[1] > 2)
+    self.assertRaises(ValueError, view.sort, ['Value'])
+    # Nothing was read.
+    self.assertEqual('r0', self.table.get_by_index(0, 0))
+
+  def test_add_row(self):
+    self.assertRaises(ValueError, self.table.add_row, ['r5', 5])
+    self.assertRaises(ValueError, self.table.set_row, 0, ['r5', 5])
+
+  def test_from_cursor(self):
+    cursor = self.connection.cursor()
+    cursor.execute('SELECT Name, Value FROM Data ORDER BY Name')
+    table = StreamingTable.from_cursor('Data', cursor, 3, batch_size=2)
+    self.assertEqual(['Name', 'Value'], table.column_names)
+    self.assertEqual('Name,Value\na,1\nb,2\nc,3', str(table))
+
+  def test_from_query(self):
+    table = StreamingTable.from_query(
+        'Data', self.connection,
+        'SELECT Value, Name FROM Data WHERE Value > ? ORDER BY Value', (1,))
+    self.assertEqual(['Value', 'Name'], table.column_names)
+    self.assertEqual(2, table.num_rows)
+    self.assertEqual('b', table.get('Name', 0))
+    self.assertEqual(3, table.get('Value', 1))
+
+
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,287 @@
+"""Compilation of layout trees into reusable render programs.
+
+A report which is generated many times with the same layouts and styles, but
+different data in the tables, can be compiled once into a RenderProgram. The
+program is a flat list of the layouts in the tree, with the content and format
+of the layouts which fill all their cells with the same values, and slots for
+the tables. It doesn't reference the layouts, styles or tables, so it can be
+pickled and sent to worker processes.
+
+The program is executed with the tables to draw, identified by their names:
+
+  program = template.compile_layout(layout, (0, 0))
+  for tables in nightly_tables:
+    workbook = xls.new_workbook(filename)
+    program.execute(workbook, workbook.add_worksheet('Report'), tables)
+    workbook.close()
+
+If a table has a different size than the table used to compile the program,
+only the sizes and positions of the layouts which contain it are computed
+again.
+"""
+
+__author__ = 'jt@javiertordable.com'
+__copyright__ = "Copyright (C) 2014 Javier Tordable"
+
+
+from layout import ColumnLayout
+from layout import FixedSizeLayout
+from layout import HideOutsideLayout
+from layout import MAX_BLOCK_ROWS
+from layout import MAX_EXCEL_COLUMN
+from layout import PaddingLayout
+from layout import RowLayout
+from layout import TableLayout
+from layout import _write_row
+from style import TableStyle
+from style import Uniform
+
+
+# The kind of program node of each layout class which can be compiled.
+_KINDS = {
+    ColumnLayout: 'column',
+    FixedSizeLayout: 'fixed',
+    HideOutsideLayout: 'hide_outside',
+    PaddingLayout: 'padding',
+    RowLayout: 'row',
+    TableLayout: 'table',
+}
+
+
+def compile_layout(layout, start_position=(0, 0)):
+  """Compiles a layout tree into a RenderProgram.
+
+  The tree can only have the layouts defined in the layout module. The
+  TableLayouts must use a TableStyle, not a subclass, and the other layouts a
+  style which gives the same content and format to all the cells, like a
+  FixedStyle.
+
+  Raises a ValueError if the layout can't be compiled.
+  """
+  nodes = []
+  parents = []
+  sizes = []
+  table_names = []
+  tables_by_name = {}
+
+  def compile_node(node, node_position, parent_index):
+    kind = _KINDS.get(type(node))
+    if kind is None:
+      raise ValueError('The layout %s can not be compiled' %
+                       type(node).__name__)
+    (width, height) = node.size()
+    (column, row) = node_position
+    if kind == 'table':
+      # The program only keeps the format and rules of the table style, so
+      # the subclasses would be drawn as a plain TableStyle.
+      if type(node.style) is not TableStyle:
+        raise ValueError('The table style %s can not be compiled' %
+                         type(node.style).__name__)
+      # The table styles take the position of the cells in the table.
+      (column, row) = (0, 0)
+    cell_formats = node.style.get_cell_formats(column, row, width, height)
+    if not isinstance(cell_formats, Uniform):
+      raise ValueError('The style %s has different formats in its cells' %
+                       type(node.style).__name__)
+    format_key = _format_key(cell_formats.value)
+
+    if kind == 'table':
+      table = node.table
+      if tables_by_name.setdefault(table.name, table) is not table:
+        raise ValueError('There are two tables named %s' % table.name)
+      if table.name not in table_names:
+        table_names.append(table.name)
+      parameters = table.name
+      value = tuple(node.style.rules)
+    else:
+      cell_values = node.style.get_cell_contents(column, row, width, height)
+      if not isinstance(cell_values, Uniform):
+        raise ValueError('The style %s has different contents in its cells' %
+                         type(node.style).__name__)
+      value = cell_values.value
+      if kind == 'fixed':
+        parameters = (width, height)
+      elif kind == 'padding':
+        parameters = (node.top, node.right, node.bottom, node.left)
+      else:
+        parameters = None
+
+    node_index = len(nodes)
+    nodes.append(None)
+    parents.append(parent_index)
+    sizes.append((width, height))
+    children = []
+    for (child_layout, child_position) in node.child_positions(node_position):
+      children.append(compile_node(child_layout, child_position, node_index))
+    nodes[node_index] = (kind, parameters, tuple(children), value, format_key)
+    return node_index
+
+  compile_node(layout, start_position, None)
+  return RenderProgram(start_position, nodes, parents, sizes, table_names)
+
+
+def _format_key(format):
+  """The properties of a format, as a key which can be pickled."""
+  return tuple(sorted(format.properties.items()))
+
+
+class RenderProgram(object):
+  """A compiled layout tree, which can be drawn with different tables.
+
+  The program has a node for each layout, in drawing order. Each node is a
+  tuple (kind, parameters, children, value, format_key), where the kind is the
+  type of layout, the parameters are its table name, its size or its padding,
+  children are the indexes of the child nodes, value is the content of all its
+  cells, or the conditional rules of the style of a table, and format_key are
+  the properties of the format of its cells.
+  """
+
+  def __init__(self, start_position, nodes, parents, sizes, table_names):
+    self.start_position = start_position
+    self.nodes = tuple(nodes)
+    self.table_names = tuple(table_names)
+    self._parents = tuple(parents)
+    self._sizes = tuple(sizes)
+    self._offsets = self._compute_offsets(self._sizes, range(len(self.nodes)))
+
+  def _compute_offsets(self, sizes, node_indexes, offsets=None):
+    """Returns the (column, row) offset of each node from its parent.
+
+    Only the offsets of the children of the given nodes are computed, the
+    others are copied from the given offsets.
+    """
+    if offsets is None:
+      offsets = [(0, 0)] * len(self.nodes)
+    else:
+      offsets = list(offsets)
+    for node_index in node_indexes:
+      (kind, parameters, children, _, _) = self.nodes[node_index]
+      (column, row) = (0, 0)
+      if kind == 'padding':
+        (top, _, _, left) = parameters
+        (column, row) = (left, top)
+      for child_index in children:
+        offsets[child_index] = (column, row)
+        (child_width, child_height) = sizes[child_index]
+        if kind == 'row':
+          column += child_width
+        elif kind == 'column':
+          row += child_height
+    return offsets
+
+  def compute_layout(self, tables):
+    """Computes the sizes and absolute positions of the nodes for the tables.
+
+    Only the nodes which contain tables with a different size than when the
+    program was compiled are laid out again. Returns a tuple (sizes,
+    positions) with a (width, height) and a (column, row) for each node.
+    """
+    sizes = list(self._sizes)
+    changed = set()
+    for (node_index, node) in enumerate(self.nodes):
+      if node[0] == 'table':
+        table = tables[node[1]]
+        size = (table.num_columns, table.num_rows + 1)
+        if size != sizes[node_index]:
+          sizes[node_index] = size
+          changed.add(node_index)
+
+    offsets = self._offsets
+    if changed:
+      # Mark the ancestors of the changed tables, and compute their sizes from
+      # the bottom up. The children always come after their parents.
+      for node_index in list(changed):
+        parent_index = self._parents[node_index]
+        while parent_index is not None and parent_index not in changed:
+          changed.add(parent_index)
+          parent_index = self._parents[parent_index]
+      changed = sorted(changed)
+      for node_index in reversed(changed):
+        if self.nodes[node_index][0] != 'table':
+          sizes[node_index] = self._node_size(node_index, sizes)
+      offsets = self._compute_offsets(sizes, changed, offsets)
+
+    positions = [None] * len(self.nodes)
+    for (node_index, parent_index) in enumerate(self._parents):
+      if parent_index is None:
+        positions[node_index] = self.start_position
+      else:
+        (parent_column, parent_row) = positions[parent_index]
+        (column, row) = offsets[node_index]
+        positions[node_index] = (parent_column + column, parent_row + row)
+    return (sizes, positions)
+
+  def _node_size(self, node_index, sizes):
+    """The size of a container node, given the sizes of its children."""
+    (kind, parameters, children, _, _) = self.nodes[node_index]
+    child_sizes = [sizes[child_index] for child_index in children]
+    if kind == 'row':
+      return (sum(width for (width, _) in child_sizes),
+              max(height for (_, height) in child_sizes))
+    if kind == 'column':
+      return (max(width for (width, _) in child_sizes),
+              sum(height for (_, height) in child_sizes))
+    if kind == 'padding':
+      (top, right, bottom, left) = parameters
+      (child_width, child_height) = child_sizes[0]
+      return (child_width + left + right, child_height + top + bottom)
+    if kind == 'hide_outside':
+      return child_sizes[0]
+    return sizes[node_index]
+
+  def execute(self, workbook, output_sheet, tables):
+    """Draws the program on a sheet, with the given tables.
+
+    The tables are given as a dict, or any other mapping, from the table names
+    to the tables. The result is the same as drawing the compiled layout tree
+    with these tables.
+    """
+    missing_names = [name for name in self.table_names if name not in tables]
+    if missing_names:
+      raise ValueError('Missing tables: %s' % ', '.join(missing_names))
+
+    (sizes, positions) = self.compute_layout(tables)
+    formats = {}
+    for (node_index, node) in enumerate(self.nodes):
+      (kind, parameters, _, value, format_key) = node
+      if format_key not in formats:
+        formats[format_key] = workbook.get_format(dict(format_key))
+      cell_format = formats[format_key]
+      (start_column, start_row) = positions[node_index]
+      (width, height) = sizes[node_index]
+
+      if kind == 'hide_outside':
+        if (start_column, start_row) != (0, 0):
+          raise ValueError('The start position for this layout must be (0, 0)')
+        output_sheet.set_default_row(hide_unused_rows=True)
+        output_sheet.set_column(first_col=width, last_col=MAX_EXCEL_COLUMN,
+                                width=None, format=None,
+                                options={'hidden': True})
+
+      if kind == 'table':
+        table_style = TableStyle(workbook, tables[parameters], value)
+        for (first_row, first_column, last_row, last_column,
+             options) in table_style.get_conditional_formats(
+                 (start_column, start_row)):
+          output_sheet.conditional_format(first_row, first_column, last_row,
+                                          last_column, options)
+        _write_table(output_sheet, start_column, start_row, table_style,
+                     cell_format)
+      else:
+        output_sheet.fill_range(start_row, start_column,
+                                start_row + height - 1,
+                                start_column + width - 1, value, cell_format)
+
+
+def _write_table(output_sheet, start_column, start_row, table_style,
+                 cell_format):
+  """Writes the header and rows of a table, in blocks of rows."""
+  width = table_style.table.num_columns
+  height = table_style.table.num_rows + 1
+  for first_row in range(0, height, MAX_BLOCK_ROWS):
+    num_rows = min(MAX_BLOCK_ROWS, height - first_row)
+    rows = table_style.get_cell_contents(0, first_row, width, num_rows)
+    for (row_index, cell_values) in enumerate(rows):
+      _write_row(output_sheet, start_row + first_row + row_index, start_column,
+                 cell_values, Uniform(cell_format),
+                 table_style.get_cell_types(0, first_row + row_index, width))
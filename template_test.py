@@ -0,0 +1,155 @@
+"""Tests for template.py"""
+
+__author__ = 'jt@javiertordable.com'
+__copyright__ = "Copyright (C) 2014 Javier Tordable"
+
+
+from layout import ColumnLayout
+from layout import FixedSizeLayout
+from layout import HideOutsideLayout
+from layout import PaddingLayout
+from layout import RowLayout
+from layout import TableLayout
+import render
+from style import BandedRows, ColorScale
+from style import EmptyStyle, FixedStyle, MarkedRowsStyle, Style, TableStyle
+from table import Table
+import template
+from xls import MockWorkbook
+
+import pickle
+import unittest
+
+
+GREEN = '#00FF00'
+BLUE = '#0000FF'
+
+
+class CustomLayout(FixedSizeLayout):
+  """A layout of a class which can't be compiled."""
+  pass
+
+
+def build_table(name, num_columns, num_rows):
+  table = Table(name, ['%s%d' % (name, i) for i in range(num_columns)])
+  for row_index in range(num_rows):
+    table.add_row([row_index * num_columns + i for i in range(num_columns)])
+  return table
+
+
+def build_layout(workbook, tables):
+  """Two tables side by side, below a title and inside a padding."""
+  green_style = FixedStyle(workbook, 'Green', GREEN)
+  column_layout = ColumnLayout(EmptyStyle(workbook), [
+      FixedSizeLayout(green_style, 3, 1),
+      RowLayout(EmptyStyle(workbook), [
+          TableLayout(TableStyle(workbook, tables['A'],
+                                 [BandedRows({'bg_color': BLUE}),
+                                  ColorScale('A1', BLUE, GREEN)]),
+                      tables['A']),
+          PaddingLayout(green_style,
+                        TableLayout(TableStyle(workbook, tables['B']),
+                                    tables['B']),
+                        0, 1, 0, 1)]),
+      FixedSizeLayout(green_style, 2, 2)])
+  padding_layout = PaddingLayout(FixedStyle(workbook, None, BLUE),
+                                 column_layout, 1, 1, 1, 1)
+  return HideOutsideLayout(EmptyStyle(workbook), padding_layout)
+
+
+def _properties(options):
+  """The options of a conditional format, with the properties of the format.
+  """
+  options = dict(options)
+  if 'format' in options:
+    options['format'] = options['format'].properties
+  return options
+
+
+class RenderProgramTest(unittest.TestCase):
+  """Tests for compile_layout and RenderProgram."""
+
+  def setUp(self):
+    self.tables = {'A': build_table('A', 2, 3), 'B': build_table('B', 1, 1)}
+    self.program = template.compile_layout(
+        build_layout(MockWorkbook(), self.tables))
+
+  def assertSameAsDraw(self, program, tables):
+    expected_workbook = MockWorkbook()
+    expected_sheet = expected_workbook.add_worksheet('Expected')
+    build_layout(expected_workbook, tables).draw(expected_sheet, (0, 0))
+
+    workbook = MockWorkbook()
+    sheet = workbook.add_worksheet('Actual')
+    program.execute(workbook, sheet, tables)
+
+    self.assertEqual(expected_sheet.cell_contents, sheet.cell_contents)
+    self.assertEqual(expected_sheet.properties, sheet.properties)
+    self.assertEqual(len(expected_sheet.conditional_formats),
+                     len(sheet.conditional_formats))
+    for (expected, actual) in zip(expected_sheet.conditional_formats,
+                                  sheet.conditional_formats):
+      self.assertEqual(expected[:4], actual[:4])
+      self.assertEqual(_properties(expected[4]), _properties(actual[4]))
+    for (position, expected_format) in expected_sheet.cell_formats.items():
+      self.assertEqual(expected_format.properties,
+                       sheet.cell_formats[position].properties)
+
+  def test_nodes(self):
+    self.assertEqual(('A', 'B'), self.program.table_names)
+    self.assertEqual(9, len(self.program.nodes))
+    self.assertEqual(('fixed', (3, 1), (), 'Green', (('bg_color', GREEN),)),
+                     self.program.nodes[3])
+    self.assertEqual('table', self.program.nodes[5][0])
+
+  def test_execute(self):
+    self.assertSameAsDraw(self.program, self.tables)
+
+  def test_execute_new_data(self):
+    self.assertSameAsDraw(self.program, {'A': build_table('A', 2, 3),
+                                         'B': build_table('B', 1, 1)})
+
+  def test_execute_new_sizes(self):
+    self.assertSameAsDraw(self.program, {'A': build_table('A', 4, 1),
+                                         'B': build_table('B', 2, 6)})
+    # The program isn't changed by the new sizes.
+    self.assertSameAsDraw(self.program, self.tables)
+
+  def test_compute_layout(self):
+    tables = {'A': self.tables['A'], 'B': build_table('B', 2, 6)}
+    layout = build_layout(MockWorkbook(), tables)
+    # The nodes of the program are in the same order as the walk.
+    nodes = render.walk(layout, (0, 0))
+    (sizes, positions) = self.program.compute_layout(tables)
+    self.assertEqual([position for (_, position) in nodes], positions)
+    self.assertEqual([node.size() for (node, _) in nodes], sizes)
+    self.assertEqual((8, 12), sizes[0])
+
+  def test_pickle(self):
+    program = pickle.loads(pickle.dumps(self.program))
+    self.assertSameAsDraw(program, self.tables)
+
+  def test_missing_table(self):
+    workbook = MockWorkbook()
+    self.assertRaises(ValueError, self.program.execute, workbook,
+                      workbook.add_worksheet('A'), {'A': self.tables['A']})
+
+  def test_invalid_layouts(self):
+    workbook = MockWorkbook()
+    self.assertRaises(ValueError, template.compile_layout,
+                      CustomLayout(EmptyStyle(workbook), 1, 1))
+    self.assertRaises(ValueError, template.compile_layout,
+                      FixedSizeLayout(Style(workbook), 1, 1))
+
+  def test_table_style_subclass(self):
+    # The marked rows would be drawn with the format of the other rows.
+    workbook = MockWorkbook()
+    table = self.tables['A']
+    style = MarkedRowsStyle(workbook, table, [1], {'bold': True})
+    layout = PaddingLayout(EmptyStyle(workbook), TableLayout(style, table),
+                           1, 0, 0, 1)
+    self.assertRaises(ValueError, template.compile_layout, layout)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -8,16 +8,74 @@ __author__ = 'jt@javiertordable.com'
 __copyright__ = "Copyright (C) 2014 Javier Tordable"
 
 
+import array
+import csv
+import os
+
 import xlsxwriter
 
 
-def new_workbook(filename):
-  return _WorkbookImpl(filename)
+# The types of the values in the cells, which can be given to write_row so the
+# sheet doesn't have to find out the type of each value.
+NUMBER = 'number'
+STRING = 'string'
+DATE = 'date'
+BOOLEAN = 'bool'
+FORMULA = 'formula'
+CELL_TYPES = [NUMBER, STRING, DATE, BOOLEAN, FORMULA]
+
+# The XlsxWriter method which writes each cell type.
+_XLSX_WRITERS = {
+    NUMBER: 'write_number',
+    STRING: 'write_string',
+    DATE: 'write_datetime',
+    BOOLEAN: 'write_boolean',
+    FORMULA: 'write_formula',
+    None: 'write',
+}
+
+
+# The size in bytes of the chunks given by iter_chunks.
+CHUNK_SIZE = 64 * 1024
+
+
+def new_workbook(output, constant_memory=False):
+  """Returns a new workbook which will be saved in the given output.
+
+  The output is a filename, or a writable binary file object, like a BytesIO
+  or the body of a HTTP response, which doesn't have to be seekable. When the
+  output is a file object the workbook is assembled in memory, without
+  temporary files, unless it's in constant memory mode.
+
+  In constant memory mode each row is flushed to disk as soon as a later row
+  is written, so the memory use doesn't grow with the number of rows. The
+  cells must be written in row-major order, for example with render.draw_rows,
+  and writing to a row before the last one raises a ValueError.
+  """
+  in_memory = not _is_filename(output) and not constant_memory
+  return _WorkbookImpl(output, constant_memory, in_memory)
+
+
+def iter_chunks(output, chunk_size=CHUNK_SIZE):
+  """Yields the bytes of a workbook saved in a BytesIO, in chunks.
+
+  The workbook must be closed. The chunks are copied one at a time from the
+  buffer of the BytesIO, so the whole file is never copied at once.
+  """
+  with output.getbuffer() as buffer:
+    for start in range(0, len(buffer), chunk_size):
+      yield bytes(buffer[start:start + chunk_size])
+
+
+def _is_filename(output):
+  return isinstance(output, (str, os.PathLike))
 
 
 class Workbook(object):
   """A XLS workbook."""
 
+  _format_registry = None
+
   def add_worksheet(self, name):
     """Adds a new sheet to the workbook and returns it."""
     pass
@@ -26,35 +84,109 @@ class Workbook(object):
     """Returns a worksheet with the given index."""
     pass
 
-  def add_format(self):
-    """Returns a new format."""
+  def add_format(self, properties=None):
+    """Returns a new format, with the given dict of properties if any."""
     pass
 
+  def add_chart(self, options):
+    """Returns a new chart, to be inserted in a sheet with insert_chart.
+
+    The options are a dict with the options of the add_chart method of
+    XlsxWriter, like {'type': 'column'}.
+    """
+    pass
+
+  def get_format(self, properties=None):
+    """Returns a shared format with the given dict of properties.
+
+    All the requests with the same properties return the same format, which
+    can't be changed. See FormatRegistry.
+    """
+    return self.format_registry.get(properties)
+
+  @property
+  def format_registry(self):
+    """The FormatRegistry used by get_format."""
+    if self._format_registry is None:
+      self._format_registry = FormatRegistry(self)
+    return self._format_registry
+
   def close(self):
     """Closes the workbook after all editing is complete."""
     pass
 
 
+class FormatRegistry(object):
+  """A registry of the formats shared by the cells of a workbook.
+
+  The registry creates a single format for each distinct set of properties,
+  and returns it for all the requests with those properties. The shared
+  formats are frozen, so they can't be changed by one of their users.
+  """
+
+  def __init__(self, workbook):
+    self._workbook = workbook
+    self._formats = {}
+    self.num_requested = 0
+
+  def get(self, properties=None):
+    """Returns the format with the given dict of properties."""
+    self.num_requested += 1
+    if properties is None:
+      properties = {}
+    key = tuple(sorted(properties.items()))
+    fmt = self._formats.get(key)
+    if fmt is None:
+      fmt = self._workbook.add_format(dict(properties))
+      fmt.freeze()
+      self._formats[key] = fmt
+    return fmt
+
+  @property
+  def num_created(self):
+    """The number of formats actually created by the registry."""
+    return len(self._formats)
+
+  def __str__(self):
+    return '%d formats created for %d requests' % (self.num_created,
+                                                   self.num_requested)
+
+
 class MockWorkbook(Workbook):
   """A mock implementation of the Workbook."""
 
-  def __init__(self):
+  def __init__(self, constant_memory=False, compact=False):
+    """Builds a MockWorkbook.
+
+    @param compact: Whether to use CompactMockSheets, for large reports.
+    """
     self.sheets = []
     self.formats = []
+    self.charts = []
+    self.constant_memory = constant_memory
+    self.compact = compact
 
   def add_worksheet(self, name):
-    sheet = MockSheet(name)
+    if self.compact:
+      sheet = CompactMockSheet(name, self.constant_memory)
+    else:
+      sheet = MockSheet(name, self.constant_memory)
     self.sheets.append(sheet)
     return sheet
 
   def get_worksheet(self, index):
     return self.sheets[index]
 
-  def add_format(self):
-    fmt = MockFormat()
+  def add_format(self, properties=None):
+    fmt = MockFormat(properties)
     self.formats.append(fmt)
     return fmt
 
+  def add_chart(self, options):
+    chart = MockChart(options)
+    self.charts.append(chart)
+    return chart
+
   def close(self):
     pass
 
@@ -62,36 +194,63 @@ class MockWorkbook(Workbook):
 class _WorkbookImpl(Workbook):
   """Implementation of a workbook using the XlsxWriter library."""
 
-  def __init__(self, filename):
-    self._wb = xlsxwriter.Workbook(filename)
+  def __init__(self, output, constant_memory=False, in_memory=False):
+    self._wb = xlsxwriter.Workbook(output,
+                                   {'constant_memory': constant_memory,
+                                    'in_memory': in_memory})
+    self._constant_memory = constant_memory
+    # XlsxWriter ignores the blank cells without a format, so the cells are
+    # cleared with a format with the default properties.
+    self._blank_format = self._wb.add_format()
+    self._sheets = []
 
   def add_worksheet(self, name):
-    sheet = self._wb.add_worksheet(name)
-    return _SheetImpl(sheet)
+    sheet = _SheetImpl(self._wb.add_worksheet(name), self._constant_memory,
+                       self._blank_format)
+    self._sheets.append(sheet)
+    return sheet
 
   def get_worksheet(self, index):
-    sheet = _wb.worksheets()[index]
-    return _SheetImpl(sheet)
+    return self._sheets[index]
 
-  def add_format(self):
-    return _FormatImpl(self._wb)
+  def add_format(self, properties=None):
+    return _FormatImpl(self._wb, properties)
+
+  def add_chart(self, options):
+    chart = self._wb.add_chart(dict(options))
+    if chart is None:
+      # XlsxWriter only warns about invalid options.
+      raise ValueError('Invalid chart options: %s' % options)
+    return _ChartImpl(chart)
 
   def close(self):
+    for sheet in self._sheets:
+      sheet._add_sheet_properties()
     self._wb.close()
 
 
 class Format(object):
   """A format used in a workbook to determine cell appearance."""
-  pass
+
+  _frozen = False
+
+  def freeze(self):
+    """Prevents any further changes to the format."""
+    self._frozen = True
+
+  def _check_not_frozen(self):
+    if self._frozen:
+      raise ValueError('The format is shared and can not be changed')
 
 
 class MockFormat(Format):
   """A mock implementation of the Format."""
 
-  def __init__(self):
-    self.properties = {}
+  def __init__(self, properties=None):
+    self.properties = dict(properties or {})
 
   def set_bg_color(self, bg_color):
+    self._check_not_frozen()
     self.properties['bg_color'] = bg_color
 
   def num_properties(self):
@@ -104,13 +263,73 @@ class MockFormat(Format):
 class _FormatImpl(Format):
   """Implementation of a format using the XlsxWriter library."""
 
-  def __init__(self, workbook):
-    self._fmt = workbook.add_format()
+  def __init__(self, workbook, properties=None):
+    self.properties = dict(properties or {})
+    self._fmt = workbook.add_format(self.properties)
 
   def set_bg_color(self, bg_color):
+    self._check_not_frozen()
+    self.properties['bg_color'] = bg_color
     self._fmt.set_bg_color(bg_color)
 
 
+class Chart(object):
+  """A chart in a workbook, which shows the values in ranges of cells."""
+
+  def add_series(self, options):
+    """Adds a series to the chart.
+
+    The options are a dict with the options of the add_series method of
+    XlsxWriter. The ranges of cells are given as lists [sheet_name, first_row,
+    first_column, last_row, last_column], like {'values': ['Sheet1', 1, 2, 10,
+    2]}.
+    """
+    pass
+
+  def set_title(self, options):
+    """Sets the title of the chart, with options like {'name': 'Sales'}."""
+    pass
+
+  def set_size(self, options):
+    """Sets the size of the chart in pixels, like {'width': 480}."""
+    pass
+
+
+class MockChart(Chart):
+  """A mock implementation of the Chart."""
+
+  def __init__(self, options):
+    self.options = dict(options)
+    self.series = []
+    self.title = None
+    self.size = None
+
+  def add_series(self, options):
+    self.series.append(dict(options))
+
+  def set_title(self, options):
+    self.title = dict(options)
+
+  def set_size(self, options):
+    self.size = dict(options)
+
+
+class _ChartImpl(Chart):
+  """Implementation of a chart using the XlsxWriter library."""
+
+  def __init__(self, chart):
+    self._chart = chart
+
+  def add_series(self, options):
+    self._chart.add_series(options)
+
+  def set_title(self, options):
+    self._chart.set_title(options)
+
+  def set_size(self, options):
+    self._chart.set_size(options)
+
+
 class Sheet(object):
   """A sheet in a XLS report."""
 
@@ -127,20 +346,115 @@ class Sheet(object):
     """Sets properties of the column."""
     pass
 
+  def conditional_format(self, first_row, first_column, last_row, last_column,
+                         options):
+    """Adds a conditional format to a range of cells.
+
+    The options are a dict with the options of the conditional_format method
+    of XlsxWriter, like {'type': 'cell', 'criteria': '>', 'value': 10,
+    'format': format}. The first and last rows and columns are included in the
+    range.
+    """
+    pass
+
+  def remove_conditional_format(self, first_row, first_column, last_row,
+                                last_column, options):
+    """Removes a conditional format added with the same arguments.
+
+    The renderers which draw a layout again use it to replace the conditional
+    formats of the tables which changed size.
+    """
+    pass
+
+  def insert_chart(self, row, column, chart, options=None):
+    """Inserts a chart of the workbook with its top left corner in a cell.
+
+    The options are a dict with the options of the insert_chart method of
+    XlsxWriter, like {'x_offset': 10}.
+    """
+    pass
+
+  def remove_chart(self, row, column, chart):
+    """Removes a chart inserted in a cell.
+
+    The renderers which draw a layout again use it to replace the charts of
+    the tables which changed size.
+    """
+    pass
+
   def write(self, row, column, value, format=None):
     """Writes a value in the given row and column cell using the given format.
+
+    Writing None without a format clears the cell.
     """
     pass
 
+  def write_row(self, row, column, values, format=None, cell_types=None):
+    """Writes a list of values in a row, starting at the given column.
+
+    All the cells use the same format. By default each value is written with
+    write, but implementations may write all the values at once.
+
+    @param cell_types: An optional list with the type of each value, one of
+    CELL_TYPES or None if unknown. The values can also be None, for blank
+    cells. The types let the sheet write the values without checking them.
+    """
+    for (index, value) in enumerate(values):
+      self.write(row, column + index, value, format)
+
+  def write_column(self, row, column, values, format=None):
+    """Writes a list of values in a column, starting at the given row.
+
+    All the cells use the same format. By default each value is written with
+    write, but implementations may write all the values at once.
+    """
+    for (index, value) in enumerate(values):
+      self.write(row + index, column, value, format)
+
+  def fill_range(self, first_row, first_column, last_row, last_column, value,
+                 format=None):
+    """Writes the same value and format in all the cells of a range.
+
+    The first and last rows and columns are included in the range. By default
+    each row is written with write_row, but implementations may fill the whole
+    range at once.
+    """
+    values = [value] * (last_column - first_column + 1)
+    for row in range(first_row, last_row + 1):
+      self.write_row(row, first_column, values, format)
+
+
+def _check_row_order(sheet, row):
+  """Checks that rows are written in order in a constant memory sheet."""
+  if row < sheet._last_row:
+    raise ValueError(
+        'Row %d written after row %d in the constant memory sheet %s. Rows '
+        'must be written in order, use render.draw_rows to draw the layout.' %
+        (row, sheet._last_row, sheet.get_name()))
+  sheet._last_row = row
 
-class MockSheet(Sheet):
-  """A mock implementation of the Sheet."""
 
-  def __init__(self, name):
+class _BaseMockSheet(Sheet):
+  """The sheet properties, conditional formats and charts of the mock sheets.
+
+  The subclasses store the cells.
+  """
+
+  def __init__(self, name, constant_memory=False):
     self.name = name
-    self.cell_contents = {}
-    self.cell_formats = {}
     self.properties = {}
+    # The ranges given to fill_range, as (first_row, first_column, last_row,
+    # last_column, value, format).
+    self.filled_ranges = []
+    # The conditional formats, as (first_row, first_column, last_row,
+    # last_column, options).
+    self.conditional_formats = []
+    # The inserted charts, as (row, column, chart, options).
+    self.charts = []
+    # The widths given to set_column, by column.
+    self.column_widths = {}
+    self.constant_memory = constant_memory
+    self._last_row = 0
 
   def get_name(self):
     return self.name
@@ -150,14 +464,54 @@ class MockSheet(Sheet):
 
   def set_column(self, first_col, last_col, width=None, format=None,
                  options=None):
-    # TODO(tordable): Consider storing per-column attributes.
     self.properties['column_options'] = \
         [first_col, last_col, width, format, str(options)]
+    if width is not None:
+      for column in range(first_col, last_col + 1):
+        self.column_widths[column] = width
 
   def get_property(self, property_name):
     return self.properties[property_name]
 
+  def conditional_format(self, first_row, first_column, last_row, last_column,
+                         options):
+    self.conditional_formats.append((first_row, first_column, last_row,
+                                     last_column, options))
+
+  def remove_conditional_format(self, first_row, first_column, last_row,
+                                last_column, options):
+    self.conditional_formats.remove((first_row, first_column, last_row,
+                                     last_column, options))
+
+  def insert_chart(self, row, column, chart, options=None):
+    self.charts.append((row, column, chart, options))
+
+  def remove_chart(self, row, column, chart):
+    for (index, inserted_chart) in enumerate(self.charts):
+      if inserted_chart[:3] == (row, column, chart):
+        del self.charts[index]
+        return
+    raise ValueError('The chart was not inserted in the sheet')
+
+  def fill_range(self, first_row, first_column, last_row, last_column, value,
+                 format=None):
+    self.filled_ranges.append((first_row, first_column, last_row, last_column,
+                               value, format))
+    super(_BaseMockSheet, self).fill_range(first_row, first_column, last_row,
+                                           last_column, value, format)
+
+
+class MockSheet(_BaseMockSheet):
+  """A mock implementation of the Sheet."""
+
+  def __init__(self, name, constant_memory=False):
+    super(MockSheet, self).__init__(name, constant_memory)
+    self.cell_contents = {}
+    self.cell_formats = {}
+
   def write(self, row, column, value, format=None):
+    if self.constant_memory:
+      _check_row_order(self, row)
     position = (row, column)
     self.cell_contents[position] = value
     self.cell_formats[position] = format
@@ -174,18 +528,218 @@ class MockSheet(Sheet):
       return None
 
   def __str__(self):
-    ret = ''
-    for position, value in self.cell_contents.items():
-      ret += '(' + str(position[0]) + ',' + str(position[1]) + ') = '
-      ret += str(value) + '\n'
-    return ret
+    return ''.join('(%d,%d) = %s\n' % (position[0], position[1], value)
+                   for (position, value) in self.cell_contents.items())
+
+
+# The format id of the cells of a CompactMockSheet which haven't been written.
+_UNWRITTEN = 0
+
+
+class _Unwritten(object):
+  """The format key of the cells which haven't been written."""
+
+  def __repr__(self):
+    return 'UNWRITTEN'
+
+
+_UNWRITTEN_KEY = _Unwritten()
+
+
+def _format_key(format):
+  """A key which is the same for all formats with the same properties."""
+  if format is None:
+    return None
+  return tuple(sorted(format.properties.items()))
+
+
+class CompactMockSheet(_BaseMockSheet):
+  """A mock implementation of the Sheet, which stores the cells compactly.
+
+  The cells of each row are stored in a list of values and an array of format
+  ids, indexed by column. Each distinct format is stored once. It uses a small
+  fraction of the memory of a MockSheet, so it can be used to test very large
+  reports. The cells are read with read and read_format instead of the
+  cell_contents and cell_formats dicts of a MockSheet.
+  """
+
+  def __init__(self, name, constant_memory=False):
+    super(CompactMockSheet, self).__init__(name, constant_memory)
+    # For each row, a tuple (values, format_ids).
+    self._rows = {}
+    # The formats by format id, and the ids of the formats.
+    self._formats = [_UNWRITTEN_KEY, None]
+    self._format_ids = {None: 1}
+
+  def _format_id(self, format):
+    format_id = self._format_ids.get(format)
+    if format_id is None:
+      format_id = len(self._formats)
+      self._formats.append(format)
+      self._format_ids[format] = format_id
+    return format_id
+
+  def _row(self, row, last_column):
+    """The values and format ids of a row, with cells up to last_column."""
+    row_cells = self._rows.get(row)
+    if row_cells is None:
+      row_cells = ([], array.array('i'))
+      self._rows[row] = row_cells
+    (values, format_ids) = row_cells
+    num_missing = last_column + 1 - len(values)
+    if num_missing > 0:
+      values.extend([None] * num_missing)
+      format_ids.extend(array.array('i', [_UNWRITTEN]) * num_missing)
+    return row_cells
+
+  def write(self, row, column, value, format=None):
+    if self.constant_memory:
+      _check_row_order(self, row)
+    (row_values, format_ids) = self._row(row, column)
+    row_values[column] = value
+    format_ids[column] = self._format_id(format)
+
+  def write_row(self, row, column, values, format=None, cell_types=None):
+    if self.constant_memory:
+      _check_row_order(self, row)
+    values = list(values)
+    last_column = column + len(values) - 1
+    (row_values, format_ids) = self._row(row, last_column)
+    row_values[column:last_column + 1] = values
+    format_ids[column:last_column + 1] = \
+        array.array('i', [self._format_id(format)]) * len(values)
+
+  def read(self, row, column):
+    """Reads a value in the cell.
+
+    This method is not in the Sheet interface.
+    """
+    row_cells = self._rows.get(row)
+    if row_cells is None or column >= len(row_cells[0]):
+      return None
+    return row_cells[0][column]
+
+  def read_format(self, row, column):
+    """Reads the format of the cell, which is None if it wasn't written.
+
+    This method is not in the Sheet interface.
+    """
+    row_cells = self._rows.get(row)
+    if row_cells is None or column >= len(row_cells[1]):
+      return None
+    format_id = row_cells[1][column]
+    if format_id == _UNWRITTEN:
+      return None
+    return self._formats[format_id]
+
+  @property
+  def num_cells(self):
+    """The number of cells written."""
+    return sum(len(format_ids) - format_ids.count(_UNWRITTEN)
+               for (_, format_ids) in self._rows.values())
+
+  def cells(self):
+    """Yields (row, column, value, format) for the written cells, in order."""
+    formats = self._formats
+    for row in sorted(self._rows):
+      (row_values, format_ids) = self._rows[row]
+      for (column, format_id) in enumerate(format_ids):
+        if format_id != _UNWRITTEN:
+          yield (row, column, row_values[column], formats[format_id])
+
+  def write_csv(self, output_file):
+    """Writes the cells in a canonical CSV form, one cell per line.
+
+    Each line has the row, column, value and format properties of a cell, in
+    row-major order. Formats with the same properties give the same text.
+    """
+    format_texts = []
+    for format_key in self._format_keys():
+      if format_key is None or format_key is _UNWRITTEN_KEY:
+        format_texts.append('')
+      else:
+        format_texts.append(';'.join('%s=%s' % item for item in format_key))
+
+    writer = csv.writer(output_file, lineterminator='\n')
+    for row in sorted(self._rows):
+      (row_values, format_ids) = self._rows[row]
+      writer.writerows(
+          (row, column, row_values[column], format_texts[format_id])
+          for (column, format_id) in enumerate(format_ids)
+          if format_id != _UNWRITTEN)
+
+  def _format_keys(self):
+    """The format keys of the formats, by format id."""
+    return [format if format is _UNWRITTEN_KEY else _format_key(format)
+            for format in self._formats]
+
+  def diff(self, other, max_differences=100):
+    """Returns the cells which are different in another CompactMockSheet.
+
+    Returns a list of up to max_differences tuples (row, column, cell,
+    other_cell), in row-major order, where each cell is (value, format) or
+    None if it wasn't written. Formats with the same properties are equal.
+    The rows which are the same in both sheets are compared at once.
+    """
+    keys = self._format_keys()
+    other_keys = other._format_keys()
+    same_keys = keys == other_keys
+    empty_row = ([], array.array('i'))
+    differences = []
+    for row in sorted(set(self._rows) | set(other._rows)):
+      (row_values, format_ids) = self._rows.get(row, empty_row)
+      (other_values, other_format_ids) = other._rows.get(row, empty_row)
+      if row_values == other_values:
+        if same_keys and format_ids == other_format_ids:
+          continue
+        if [keys[i] for i in format_ids] == \
+              [other_keys[i] for i in other_format_ids]:
+          continue
+      for column in range(max(len(format_ids), len(other_format_ids))):
+        cell = _compact_cell(row_values, format_ids, self._formats, column)
+        other_cell = _compact_cell(other_values, other_format_ids,
+                                   other._formats, column)
+        if _cell_key(cell) != _cell_key(other_cell):
+          differences.append((row, column, cell, other_cell))
+          if len(differences) == max_differences:
+            return differences
+    return differences
+
+  def __str__(self):
+    return ''.join('(%d,%d) = %s\n' % (row, column, value)
+                   for (row, column, value, _) in self.cells())
+
+
+def _compact_cell(row_values, format_ids, formats, column):
+  """The (value, format) of a cell of a CompactMockSheet, or None."""
+  if column >= len(format_ids) or format_ids[column] == _UNWRITTEN:
+    return None
+  return (row_values[column], formats[format_ids[column]])
+
+
+def _cell_key(cell):
+  if cell is None:
+    return None
+  return (cell[0], _format_key(cell[1]))
 
 
 class _SheetImpl(Sheet):
   """Implementation of a sheet using the XlsxWriter library."""
 
-  def __init__(self, sheet):
+  def __init__(self, sheet, constant_memory=False, blank_format=None):
     self._sh = sheet
+    self._blank_format = blank_format
+    self._constant_memory = constant_memory
+    self._last_row = 0
+    # The XlsxWriter methods for each list of cell types given to write_row.
+    self._writers = {}
+    # The conditional formats, as (first_row, first_column, last_row,
+    # last_column, options). XlsxWriter can't remove them, so they are only
+    # added to its sheet when the workbook is closed.
+    self._conditional_formats = []
+    # The inserted charts, as (row, column, chart, options), which are also
+    # inserted in the XlsxWriter sheet when the workbook is closed.
+    self._charts = []
 
   def get_name(self):
     return self._sh.get_name()
@@ -195,14 +749,50 @@ class _SheetImpl(Sheet):
 
   def set_column(self, first_col, last_col, width=None, format=None,
                  options=None):
-    if format is not None:
-      column_format = format._fmt
-    else:
-      column_format = None
-    self._sh.set_column(first_col, last_col, width, column_format, options)
+    self._sh.set_column(first_col, last_col, width, _xlsx_format(format),
+                        options)
+
+  def conditional_format(self, first_row, first_column, last_row, last_column,
+                         options):
+    self._conditional_formats.append((first_row, first_column, last_row,
+                                      last_column, options))
+
+  def remove_conditional_format(self, first_row, first_column, last_row,
+                                last_column, options):
+    self._conditional_formats.remove((first_row, first_column, last_row,
+                                      last_column, options))
+
+  def insert_chart(self, row, column, chart, options=None):
+    self._charts.append((row, column, chart, options))
+
+  def remove_chart(self, row, column, chart):
+    for (index, inserted_chart) in enumerate(self._charts):
+      if inserted_chart[:3] == (row, column, chart):
+        del self._charts[index]
+        return
+    raise ValueError('The chart was not inserted in the sheet')
+
+  def _add_sheet_properties(self):
+    """Adds the conditional formats and charts to the XlsxWriter sheet.
+
+    XlsxWriter doesn't write the charts which are not inserted in any sheet,
+    like the ones removed by a renderer.
+    """
+    for (first_row, first_column, last_row, last_column,
+         options) in self._conditional_formats:
+      options = dict(options)
+      if 'format' in options:
+        options['format'] = _xlsx_format(options['format'])
+      self._sh.conditional_format(first_row, first_column, last_row,
+                                  last_column, options)
+    for (row, column, chart, options) in self._charts:
+      self._sh.insert_chart(row, column, chart._chart, options)
 
   def write(self, row, column, value, format=None):
-    # TODO(tordable): Use the proper type if possible.
+    if self._constant_memory:
+      # XlsxWriter silently ignores the cells in rows already flushed.
+      _check_row_order(self, row)
+    # The typed writes are in write_row, for the cells of typed tables.
     if value is not None and format is not None:
       # The actual format passed to the XlsxWriter library is the inner format
       # of the _FormatImpl.
@@ -210,4 +800,53 @@ class _SheetImpl(Sheet):
     elif value is not None and format is None:
       self._sh.write(row, column, value)
     else:
-      self._sh.write_blank(row, column, None)
+      # A blank cell without a format clears the cell.
+      self._sh.write_blank(row, column, None,
+                           _xlsx_format(format) or self._blank_format)
+
+  def write_row(self, row, column, values, format=None, cell_types=None):
+    if self._constant_memory:
+      _check_row_order(self, row)
+    if cell_types is None:
+      self._sh.write_row(row, column, values, _xlsx_format(format))
+      return
+
+    writers = self._typed_writers(cell_types)
+    xlsx_format = _xlsx_format(format)
+    write_blank = getattr(self._sh, '_write_blank', self._sh.write_blank)
+    for (index, value) in enumerate(values):
+      if value is None:
+        write_blank(row, column + index, None, xlsx_format)
+      else:
+        writers[index](row, column + index, value, xlsx_format)
+
+  def _typed_writers(self, cell_types):
+    """The XlsxWriter methods to write each of the cell types."""
+    key = tuple(cell_types)
+    writers = self._writers.get(key)
+    if writers is None:
+      # The public methods of XlsxWriter convert the arguments of every call,
+      # so the methods behind them are used when they are available.
+      methods = {}
+      for (cell_type, method_name) in _XLSX_WRITERS.items():
+        methods[cell_type] = getattr(self._sh, '_' + method_name,
+                                     getattr(self._sh, method_name))
+      writers = [methods[cell_type] for cell_type in cell_types]
+      self._writers[key] = writers
+    return writers
+
+  def write_column(self, row, column, values, format=None):
+    if not values:
+      return
+    if self._constant_memory:
+      _check_row_order(self, row)
+      _check_row_order(self, row + len(values) - 1)
+    self._sh.write_column(row, column, values, _xlsx_format(format))
+
+
+def _xlsx_format(format):
+  """The XlsxWriter format inside of a _FormatImpl, which may be None."""
+  if format is not None:
+    return format._fmt
+  else:
+    return None
@@ -4,9 +4,16 @@ __author__ = 'jt@javiertordable.com'
 __copyright__ = "Copyright (C) 2014 Javier Tordable"
 
 
-from xls import MockFormat, MockSheet, MockWorkbook
+from xls import CompactMockSheet, MockFormat, MockSheet, MockWorkbook
+import xls
 
+import datetime
+import io
+import os
+import shutil
+import tempfile
 import unittest
+import zipfile
 
 
 class MockWorkbookTest(unittest.TestCase):
@@ -19,6 +26,51 @@ class MockWorkbookTest(unittest.TestCase):
     self.assertEquals('A', wb.get_worksheet(0).get_name())
     self.assertEquals('B', wb.get_worksheet(1).get_name())
 
+  def test_add_format(self):
+    wb = MockWorkbook()
+    fmt = wb.add_format({'bg_color': '#0000FF'})
+    self.assertEqual('#0000FF', fmt.get_property('bg_color'))
+    self.assertEqual([fmt], wb.formats)
+
+  def test_add_chart(self):
+    wb = MockWorkbook()
+    chart = wb.add_chart({'type': 'line'})
+    chart.add_series({'values': ['A', 1, 0, 5, 0]})
+    chart.set_title({'name': 'Title'})
+    self.assertEqual([chart], wb.charts)
+    self.assertEqual({'type': 'line'}, chart.options)
+    self.assertEqual([{'values': ['A', 1, 0, 5, 0]}], chart.series)
+    self.assertEqual({'name': 'Title'}, chart.title)
+
+
+class FormatRegistryTest(unittest.TestCase):
+  """Tests for FormatRegistry."""
+
+  def setUp(self):
+    self.wb = MockWorkbook()
+
+  def test_shared_formats(self):
+    blue = self.wb.get_format({'bg_color': '#0000FF'})
+    self.assertIs(blue, self.wb.get_format({'bg_color': '#0000FF'}))
+    self.assertIsNot(blue, self.wb.get_format({'bg_color': '#00FF00'}))
+    self.assertIs(self.wb.get_format(), self.wb.get_format({}))
+    self.assertEqual('#0000FF', blue.get_property('bg_color'))
+
+  def test_counts(self):
+    for _ in range(50):
+      self.wb.get_format({'bg_color': '#0000FF'})
+    self.wb.get_format()
+    registry = self.wb.format_registry
+    self.assertEqual(51, registry.num_requested)
+    self.assertEqual(2, registry.num_created)
+    self.assertEqual(2, len(self.wb.formats))
+    self.assertEqual('2 formats created for 51 requests', str(registry))
+
+  def test_frozen(self):
+    fmt = self.wb.get_format({'bg_color': '#0000FF'})
+    self.assertRaises(ValueError, fmt.set_bg_color, '#00FF00')
+    self.assertEqual('#0000FF', fmt.get_property('bg_color'))
+
 
 class MockFormatTest(unittest.TestCase):
   """Tests for MockFormat."""
@@ -48,6 +100,64 @@ class MockSheetTest(unittest.TestCase):
     self.assertEquals('b', sheet.read(0, 1))
     self.assertEquals('c', sheet.read(3, 3))
 
+  def test_write_row(self):
+    sheet = MockSheet('A')
+    cell_format = MockFormat()
+    sheet.write_row(1, 2, ['a', 'b', None], cell_format)
+    self.assertEqual('a', sheet.read(1, 2))
+    self.assertEqual('b', sheet.read(1, 3))
+    self.assertIsNone(sheet.read(1, 4))
+    self.assertIs(cell_format, sheet.cell_formats[(1, 4)])
+    self.assertIsNone(sheet.read(2, 2))
+
+  def test_write_column(self):
+    sheet = MockSheet('A')
+    sheet.write_column(1, 2, ['a', 'b'])
+    self.assertEqual('a', sheet.read(1, 2))
+    self.assertEqual('b', sheet.read(2, 2))
+    self.assertIsNone(sheet.read(1, 3))
+
+  def test_fill_range(self):
+    sheet = MockSheet('A')
+    cell_format = MockFormat()
+    sheet.fill_range(1, 2, 3, 4, 'a', cell_format)
+    self.assertEqual([(1, 2, 3, 4, 'a', cell_format)], sheet.filled_ranges)
+    self.assertEqual(9, len(sheet.cell_contents))
+    self.assertEqual('a', sheet.read(3, 4))
+    self.assertIs(cell_format, sheet.cell_formats[(1, 2)])
+    self.assertIsNone(sheet.read(4, 4))
+
+  def test_write_constant_memory(self):
+    sheet = MockSheet('A', constant_memory=True)
+    sheet.write(0, 1, 'a')
+    sheet.write(0, 0, 'b')
+    sheet.write(2, 0, 'c')
+    self.assertRaises(ValueError, sheet.write, 1, 0, 'd')
+    self.assertRaises(ValueError, sheet.write_row, 1, 0, ['d'])
+    self.assertRaises(ValueError, sheet.write_column, 1, 0, ['d', 'e'])
+    sheet.write_column(2, 1, ['d', 'e'])
+    self.assertEqual('c', sheet.read(2, 0))
+    self.assertEqual('e', sheet.read(3, 1))
+
+  def test_conditional_format(self):
+    sheet = MockSheet('Sheet')
+    options = {'type': 'data_bar'}
+    sheet.conditional_format(1, 0, 10, 0, options)
+    self.assertEqual([(1, 0, 10, 0, options)], sheet.conditional_formats)
+    sheet.remove_conditional_format(1, 0, 10, 0, options)
+    self.assertEqual([], sheet.conditional_formats)
+    self.assertRaises(ValueError, sheet.remove_conditional_format, 1, 0, 10, 0,
+                      options)
+
+  def test_insert_chart(self):
+    chart = MockWorkbook().add_chart({'type': 'pie'})
+    sheet = MockSheet('Sheet')
+    sheet.insert_chart(2, 3, chart)
+    self.assertEqual([(2, 3, chart, None)], sheet.charts)
+    sheet.remove_chart(2, 3, chart)
+    self.assertEqual([], sheet.charts)
+    self.assertRaises(ValueError, sheet.remove_chart, 2, 3, chart)
+
   def test_set_default_row(self):
     sheet = MockSheet('B')
     sheet.set_default_row(hide_unused_rows=False)
@@ -62,6 +172,235 @@ class MockSheetTest(unittest.TestCase):
     sheet.set_column(1, 2, 123.0, cell_format, options)
     self.assertEquals([1, 2, 123.0, cell_format, "{'hidden': False}"],
                       sheet.get_property('column_options'))
+    sheet.set_column(2, 3, 10)
+    sheet.set_column(4, 5, None, None, {'hidden': True})
+    self.assertEqual({1: 123.0, 2: 10, 3: 10}, sheet.column_widths)
+
+
+class CompactMockSheetTest(unittest.TestCase):
+  """Tests for CompactMockSheet."""
+
+  def setUp(self):
+    self.blue = MockFormat({'bg_color': '#0000FF'})
+    self.green = MockFormat({'bg_color': '#00FF00'})
+    self.sheet = CompactMockSheet('A')
+    self.sheet.write(0, 1, 'a', self.blue)
+    self.sheet.write_row(2, 0, ['b', 1, None], self.green)
+
+  def test_read(self):
+    self.assertEqual('a', self.sheet.read(0, 1))
+    self.assertIs(self.blue, self.sheet.read_format(0, 1))
+    self.assertEqual(1, self.sheet.read(2, 1))
+    self.assertIs(self.green, self.sheet.read_format(2, 2))
+    self.assertIsNone(self.sheet.read(0, 0))
+    self.assertIsNone(self.sheet.read_format(0, 0))
+    self.assertIsNone(self.sheet.read(1, 0))
+    self.assertIsNone(self.sheet.read(2, 3))
+    self.assertEqual(4, self.sheet.num_cells)
+
+  def test_overwrite(self):
+    self.sheet.write(2, 1, 'c')
+    self.sheet.write_row(0, 0, ['d', 'e'], self.green)
+    self.assertEqual([(0, 0, 'd', self.green), (0, 1, 'e', self.green),
+                      (2, 0, 'b', self.green), (2, 1, 'c', None),
+                      (2, 2, None, self.green)],
+                     list(self.sheet.cells()))
+
+  def test_fill_range(self):
+    self.sheet.fill_range(3, 1, 4, 2, 'f', self.blue)
+    self.assertEqual([(3, 1, 4, 2, 'f', self.blue)], self.sheet.filled_ranges)
+    self.assertEqual('f', self.sheet.read(4, 2))
+    self.assertEqual(8, self.sheet.num_cells)
+
+  def test_write_constant_memory(self):
+    sheet = CompactMockSheet('A', constant_memory=True)
+    sheet.write(1, 0, 'a')
+    self.assertRaises(ValueError, sheet.write, 0, 0, 'b')
+    self.assertRaises(ValueError, sheet.write_row, 0, 0, ['b'])
+
+  def test_str(self):
+    self.assertEqual('(0,1) = a\n(2,0) = b\n(2,1) = 1\n(2,2) = None\n',
+                     str(self.sheet))
+
+  def test_write_csv(self):
+    output_file = io.StringIO()
+    self.sheet.write_csv(output_file)
+    self.assertEqual('0,1,a,bg_color=#0000FF\n'
+                     '2,0,b,bg_color=#00FF00\n'
+                     '2,1,1,bg_color=#00FF00\n'
+                     '2,2,,bg_color=#00FF00\n',
+                     output_file.getvalue())
+
+  def test_diff(self):
+    # The same cells, with the formats created in a different order.
+    other = CompactMockSheet('B')
+    other.write_row(2, 0, ['b', 1, None], MockFormat({'bg_color': '#00FF00'}))
+    other.write(0, 1, 'a', MockFormat({'bg_color': '#0000FF'}))
+    self.assertEqual([], self.sheet.diff(other))
+
+    other.write(2, 1, 2, self.green)
+    other.write(0, 1, 'a', self.green)
+    other.write(3, 0, 'c')
+    self.assertEqual([(0, 1, ('a', self.blue), ('a', self.green)),
+                      (2, 1, (1, self.green), (2, self.green)),
+                      (3, 0, None, ('c', None))],
+                     self.sheet.diff(other))
+    self.assertEqual(1, len(self.sheet.diff(other, max_differences=1)))
+
+  def test_same_as_mock_sheet(self):
+    workbook = MockWorkbook(compact=True)
+    sheet = workbook.add_worksheet('A')
+    self.assertIsInstance(sheet, CompactMockSheet)
+    mock_sheet = MockSheet('B')
+    for output_sheet in [sheet, mock_sheet]:
+      output_sheet.write_row(1, 1, ['a', 'b'], self.blue)
+      output_sheet.fill_range(2, 0, 3, 3, None, self.green)
+      output_sheet.write_column(0, 3, [1, 2])
+    self.assertEqual(sorted(mock_sheet.cell_contents.items()),
+                     [((row, column), value) for (row, column, value, _)
+                      in sheet.cells()])
+
+
+class WorkbookImplTest(unittest.TestCase):
+  """Tests for the XlsxWriter implementation of the Workbook."""
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.filename = os.path.join(self.directory, 'test.xlsx')
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def test_constant_memory(self):
+    wb = xls.new_workbook(self.filename, constant_memory=True)
+    sheet = wb.add_worksheet('A')
+    sheet.write(0, 0, 'a')
+    sheet.write(1, 0, 'b')
+    self.assertRaises(ValueError, sheet.write, 0, 1, 'c')
+    self.assertRaises(ValueError, sheet.write_row, 0, 1, ['c', 'd'])
+    sheet.write_row(1, 1, ['c', 'd'])
+    # Empty columns don't write any row.
+    sheet.write_column(1, 3, [])
+    sheet.write_column(5, 3, [])
+    sheet.write(2, 0, 'e')
+    wb.close()
+    self.assertTrue(os.path.exists(self.filename))
+
+  def test_write_ranges(self):
+    wb = xls.new_workbook(self.filename)
+    cell_format = wb.get_format({'bg_color': '#0000FF'})
+    sheet = wb.add_worksheet('A')
+    sheet.write_row(0, 0, ['a', 1, None], cell_format)
+    sheet.write_column(1, 0, [2, 'b'])
+    sheet.fill_range(3, 0, 5, 2, None, cell_format)
+    sheet.conditional_format(1, 0, 5, 2, {'type': 'cell', 'criteria': '>',
+                                          'value': 1, 'format': cell_format})
+    sheet.conditional_format(1, 0, 5, 0, {'type': 'data_bar'})
+    wb.close()
+    self.assertTrue(os.path.exists(self.filename))
+
+  def test_insert_chart(self):
+    wb = xls.new_workbook(self.filename, constant_memory=True)
+    sheet = wb.add_worksheet('A b')
+    sheet.write_column(0, 0, ['Units', 1, 2, 3])
+    chart = wb.add_chart({'type': 'column'})
+    chart.add_series({'name': ['A b', 0, 0],
+                      'values': ['A b', 1, 0, 3, 0]})
+    chart.set_title({'name': 'Units'})
+    chart.set_size({'width': 320, 'height': 200})
+    sheet.insert_chart(0, 2, chart)
+    self.assertRaises(ValueError, wb.add_chart, {'type': 'invalid'})
+    removed_chart = wb.add_chart({'type': 'pie'})
+    removed_chart.add_series({'values': ['A b', 1, 0, 3, 0]})
+    sheet.insert_chart(5, 2, removed_chart)
+    sheet.remove_chart(5, 2, removed_chart)
+    self.assertRaises(ValueError, sheet.remove_chart, 5, 2, removed_chart)
+    wb.close()
+    with zipfile.ZipFile(self.filename) as xlsx:
+      names = xlsx.namelist()
+    self.assertIn('xl/charts/chart1.xml', names)
+    self.assertNotIn('xl/charts/chart2.xml', names)
+
+  def test_clear_cell(self):
+    wb = xls.new_workbook(self.filename)
+    sheet = wb.add_worksheet('A')
+    sheet.write(0, 0, 'stale')
+    sheet.write(0, 1, 'kept')
+    sheet.write(0, 0, None, None)
+    wb.close()
+    with zipfile.ZipFile(self.filename) as xlsx:
+      sheet_xml = xlsx.read('xl/worksheets/sheet1.xml').decode('utf-8')
+    # The cleared cell is blank, with the default properties.
+    self.assertRegex(sheet_xml, '<c r="A1" s="[0-9]+"/>')
+    self.assertIn('<c r="B1" t="s">', sheet_xml)
+
+  def test_remove_conditional_format(self):
+    wb = xls.new_workbook(self.filename)
+    cell_format = wb.get_format({'bold': True})
+    sheet = wb.add_worksheet('A')
+    options = {'type': 'cell', 'criteria': '>', 'value': 1,
+               'format': cell_format}
+    sheet.conditional_format(1, 0, 5, 0, options)
+    sheet.conditional_format(1, 0, 5, 0, {'type': 'data_bar'})
+    sheet.conditional_format(1, 0, 9, 0, options)
+    # XlsxWriter would reject these options, but they can still be removed.
+    sheet.conditional_format(1, 0, 9, 0, {'type': 'invalid'})
+    sheet.remove_conditional_format(1, 0, 9, 0, {'type': 'invalid'})
+    sheet.remove_conditional_format(1, 0, 5, 0, options)
+    sheet.remove_conditional_format(1, 0, 9, 0, options)
+    self.assertRaises(ValueError, sheet.remove_conditional_format, 1, 0, 9, 0,
+                      options)
+    wb.close()
+    with zipfile.ZipFile(self.filename) as xlsx:
+      sheet_xml = xlsx.read('xl/worksheets/sheet1.xml').decode('utf-8')
+    self.assertEqual(1, sheet_xml.count('<conditionalFormatting '))
+    self.assertIn('type="dataBar"', sheet_xml)
+    self.assertNotIn('cellIs', sheet_xml)
+
+  def test_stream_output(self):
+    output = io.BytesIO()
+    wb = xls.new_workbook(output)
+    sheet = wb.add_worksheet('A')
+    sheet.write_row(0, 0, ['a', 1])
+    wb.close()
+    self.assertEqual([], os.listdir(self.directory))
+    data = output.getvalue()
+    self.assertEqual(b'PK', data[:2])
+
+    chunks = list(xls.iter_chunks(output, 1000))
+    self.assertEqual(data, b''.join(chunks))
+    self.assertEqual(1000, len(chunks[0]))
+    self.assertEqual((len(data) + 999) // 1000, len(chunks))
+
+  def test_unseekable_output(self):
+    class Output(io.RawIOBase):
+      def __init__(self):
+        self.chunks = []
+      def writable(self):
+        return True
+      def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    output = Output()
+    wb = xls.new_workbook(output, constant_memory=True)
+    wb.add_worksheet('A').write(0, 0, 'a')
+    wb.close()
+    self.assertEqual(b'PK', output.chunks[0][:2])
+
+  def test_write_typed_row(self):
+    wb = xls.new_workbook(self.filename, constant_memory=True)
+    sheet = wb.add_worksheet('A')
+    cell_types = [xls.NUMBER, xls.STRING, xls.DATE, xls.BOOLEAN, xls.FORMULA,
+                  None]
+    sheet.write_row(0, 0, [1.5, '=not a formula', datetime.date(2014, 1, 2),
+                           True, '=A1*2', 'any'], cell_types=cell_types)
+    sheet.write_row(1, 0, [None, None, None, None, None, None],
+                    cell_types=cell_types)
+    self.assertRaises(ValueError, sheet.write_row, 0, 0, [1],
+                      cell_types=[xls.NUMBER])
+    wb.close()
+    self.assertTrue(os.path.exists(self.filename))
 
 
 if __name__ == '__main__':